@@ -0,0 +1,270 @@
+# bench.py｜良級懸賞 POS 系統 — 效能基準測試（不開視窗，結果輸出為 JSON 以便比較各版本）
+# 用法：python bench.py [--scales 1000,10000,100000,1000000] [--repeat 3] [--storage json|sqlite] [--out bench.json]
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+import platform
+import tempfile
+import subprocess
+import statistics
+from collections import Counter
+from types import SimpleNamespace
+from datetime import datetime
+
+SCALES = (1000, 10000, 100000)
+END_DAY = '2025-06-30'   # 測試資料的最後一天（固定日期與 seed，每次產生相同資料）
+
+class FakeVar:
+    # 取代 tk.StringVar / Entry：只需要 get/set
+    def __init__(self, value=''):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class FakeTree:
+    # 取代 VirtualTree：記下 set_rows 的內容，不建立任何元件
+    def __init__(self):
+        self.rows = []
+        self.values = {}
+        self.pos = {}
+        self.selected = set()
+
+    def set_rows(self, rows):
+        self.rows = list(rows)
+        self.values = dict(self.rows)
+        self.pos = {iid: i for i, (iid, _) in enumerate(self.rows)}
+        self.selected = set()
+
+    def insert_row(self, iid, values, index='end'):
+        self.rows.append((iid, values))
+        self.values[iid] = values
+        self.pos[iid] = len(self.rows) - 1
+
+    def update_row(self, iid, values):
+        pass
+
+    def delete_rows(self, iids):
+        pass
+
+    def selection(self):
+        return self.selected
+
+    def row_values(self, iid):
+        return self.values.get(iid)
+
+    def row_index(self, iid):
+        return self.pos.get(iid)
+
+    def row_ids(self, start, stop):
+        return [iid for iid, _ in self.rows[start:stop]]
+
+    def identify_row(self, y):
+        # 以 y 當作列位置
+        return self.rows[y][0] if 0 <= y < len(self.rows) else ''
+
+    def selection_set(self, iid):
+        self.selected = {iid}
+
+    def selection_add(self, iids):
+        self.selected.update(iids)
+
+    def selection_remove(self, iids):
+        self.selected.difference_update(iids)
+
+    def set(self, item, column=None, value=None):
+        return ''
+
+def _timed(results, name, fn, repeat=1, setup=None):
+    times, out = [], None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t)
+    results[name] = {'min': round(min(times), 6), 'median': round(statistics.median(times), 6),
+                     'repeat': repeat}
+    if isinstance(out, int):
+        results[name]['rows'] = out
+    return out
+
+def run_scale(scale, repeat, seed=1):
+    # 子行程內執行（POS_HOME 已指向暫存目錄）
+    import storage
+    import datagen
+    import logs
+    import receive
+    import inventory
+    import report
+    import export
+    import importer
+    import pricing
+    import members
+    from repository import Repository
+    from totals import DayTotals, SelectionSum
+
+    results = {}
+    store = storage.get_backend()
+    data = datagen.generate(scale, end=END_DAY, seed=seed)
+    datagen.write_dataset(data, store)
+    results['dataset'] = {t: len(data[t]) for t in ('inventory', 'logs', 'receive')}
+    hot_member = Counter(r['member'] for r in data['logs']).most_common(1)[0][0]
+    del data
+    today = END_DAY
+    month_start = today[:8] + '01'
+
+    # 最後單價：背景整份重建、冷啟動（只讀索引檔）與 1000 次查詢
+    def rebuild_price_index():
+        logs.rebuild_price_index()
+        logs._price_thread.join()
+        logs._price_writer.flush()
+        return len(logs._price_index)
+    pids = [item['id'] for item in store.load('inventory')[:1000]]
+    def lookup(holes):
+        for pid in pids:
+            for hole in holes:
+                logs.get_last_unit_price(pid, hole)
+        return len(pids) * len(holes)
+    _timed(results, 'price_index.rebuild', rebuild_price_index)
+    _timed(results, 'get_last_unit_price.cold', lambda: lookup((20,)) and None, 1,
+           lambda: setattr(logs, '_price_index', None))
+    _timed(results, 'get_last_unit_price.lookups', lambda: lookup((None,) + pricing.HOLES), repeat)
+
+    # 庫存分頁：載入與搜尋（InventoryApp.refresh_table，以假的 Tk 元件執行）
+    app = inventory.InventoryApp.__new__(inventory.InventoryApp)
+    app.repo = Repository(store)
+    app.store = store
+    app.cols = ['廠商','關鍵字IP','編碼','商品名稱','數量','成本','點數價',
+                '20洞價格','40洞價格','60洞價格','80洞價格','備註','商品連結']
+    app.tree = FakeTree()
+    _timed(results, 'inventory.load_data', lambda: app.load_data() or len(app.data))
+    app.search_var = FakeVar('鬼滅 一番')
+    _timed(results, 'inventory.refresh_table.search.cold', lambda: app.refresh_table() or len(app.tree.rows),
+           1, lambda: setattr(app, 'search_index', None))
+    _timed(results, 'inventory.refresh_table.search', lambda: app.refresh_table() or len(app.tree.rows), repeat)
+    app.search_var = FakeVar('')
+    _timed(results, 'inventory.refresh_table.all', lambda: app.refresh_table() or len(app.tree.rows), repeat)
+
+    # 交易紀錄分頁
+    frame = logs.LogsFrame.__new__(logs.LogsFrame)
+    frame.repo, frame.store, frame.tree = app.repo, store, FakeTree()
+    frame.logs, frame.sum_var, frame.member_var = [], FakeVar(), FakeVar('')
+    frame.live = store.watch('logs')
+    frame.selected, frame.totals, frame.range_var = SelectionSum(), None, FakeVar()
+    frame._drag, frame._mouse_select = None, False
+    _timed(results, 'logs.load_all', lambda: len(store.load('logs')), repeat)
+    for name, start in (('day', today), ('month', month_start)):
+        frame.start_var, frame.end_var = FakeVar(start), FakeVar(today)
+        _timed(results, f'logs.refresh_logs.{name}', lambda: frame.refresh_logs() or len(frame.logs), repeat)
+
+    # 拖曳選取整個月的交易後再拖回一半：每次移動只加減進出範圍的列，放開時比對一次整份選取
+    def drag_select():
+        n = len(frame.tree.rows)
+        frame.on_tree_click(SimpleNamespace(y=0))
+        for y in list(range(1, n)) + list(range(n - 2, n // 2 - 1, -1)):
+            frame.on_tree_drag(SimpleNamespace(y=y))
+        frame.on_tree_release(None)
+        return n
+    _timed(results, 'logs.update_sum.drag_month', drag_select, 1)
+
+    # 每日合計：取得（背景執行緒的工作量，不讀全部紀錄）與任意日期區間查詢
+    day_totals = _timed(results, 'logs.totals.build', lambda: DayTotals.from_days(store.day_totals('logs')), repeat)
+    _timed(results, 'logs.totals.range', lambda: [day_totals.range(s, today) for s in (today, month_start, '2000-01-01')] and 3, repeat)
+
+    # 商品領取紀錄分頁
+    rframe = receive.ReceiveFrame.__new__(receive.ReceiveFrame)
+    rframe.repo, rframe.store, rframe.tree = app.repo, store, FakeTree()
+    rframe.data, rframe.return_person_options, rframe.member_entry = [], [], FakeVar('')
+    rframe.live = store.watch('receive')
+    _timed(results, 'receive.load_all', lambda: len(store.load('receive')), repeat)
+    for name, start in (('day', today), ('month', month_start)):
+        rframe.start_entry, rframe.end_entry = FakeVar(start), FakeVar(today)
+        _timed(results, f'receive.refresh.{name}', lambda: rframe.refresh() or len(rframe.tree.rows), repeat)
+
+    # 會員紀錄：最常來的會員（紀錄最多）
+    _timed(results, 'members.history.hot', lambda: len(members.history(store, hot_member)['logs']), repeat)
+
+    # Excel 匯入（需要 openpyxl）：第一次全部新增，第二次內容相同全部略過
+    try:
+        path = os.path.join(storage.ROOT_DIR, 'bench_import.xlsx')
+        datagen.write_workbook(path, min(scale, 50000), seed, prefix='XL')
+        def do_import():
+            result = importer.import_workbook(path, store, app.data)
+            app.repo.adopt_products(result['inserted'])
+            storage.flush()
+            return len(result['inserted']) + len(result['updated']) + result['skipped']
+        _timed(results, 'batch_import.insert', do_import)
+        _timed(results, 'batch_import.unchanged', do_import)
+    except ImportError:
+        results['batch_import'] = {'skipped': 'openpyxl 未安裝'}
+
+    # 關班：今日報表與 CSV
+    closing_dir = os.path.join(storage.ROOT_DIR, 'closing')
+    def close_shift():
+        result = report.closing_report(today, 0, store)
+        report.write_closing_csvs(result, closing_dir)
+        return len(result['logs'])
+    _timed(results, 'on_close_shift', close_shift, repeat)
+
+    # 匯出：當月全部分店的交易（逐月讀取、串流寫檔）
+    for fmt in ('csv', 'json'):
+        path = os.path.join(storage.ROOT_DIR, f'bench_export.{fmt}')
+        _timed(results, f'export.month.{fmt}', lambda: export.write_records(
+            path, export.iter_query(store, 'logs', month_start, today), report.LOG_COLUMNS), repeat)
+
+    try:
+        import resource
+        results['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='良級懸賞 POS 效能基準測試')
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)), help='逗號分隔的資料量，例如 1000,10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--out', help='輸出 JSON 檔（預設印到標準輸出）')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--child-out', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        with open(args.child_out, 'w', encoding='utf-8') as f:
+            json.dump(run_scale(args.child, args.repeat, args.seed), f, ensure_ascii=False)
+        return
+
+    # 每個資料量在獨立子行程與暫存資料目錄執行，互不影響（記憶體、快取）
+    out = {
+        'meta': {'at': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'storage': args.storage, 'repeat': args.repeat, 'seed': args.seed,
+                 'numpy': importlib.util.find_spec('numpy') is not None},
+        'results': {},
+    }
+    for scale in (int(s) for s in args.scales.split(',') if s.strip()):
+        with tempfile.TemporaryDirectory(prefix='pos-bench-') as home:
+            env = dict(os.environ, POS_HOME=home, POS_STORAGE=args.storage)
+            child_out = os.path.join(home, 'result.json')
+            print(f'[bench] {scale} …', file=sys.stderr)
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(scale),
+                            '--repeat', str(args.repeat), '--seed', str(args.seed), '--child-out', child_out],
+                           env=env, check=True, stdout=subprocess.DEVNULL)
+            with open(child_out, 'r', encoding='utf-8') as f:
+                out['results'][str(scale)] = json.load(f)
+    text = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,28 @@
 # checkout.py｜良級懸賞 POS 系統 — 抽賞結帳（三步驟折點流程）
-import os
-import json
 import re
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from datetime import datetime
-
-# 新增：從 logs.py 取得最近一次單抽價
+import storage
+import events
+import records
+import pricing
+from repository import Repository
+from profiling import timed
+
+# 新增：從 logs.py 取得最近一次單抽價（由索引查詢，不掃描日誌）
 from logs import get_last_unit_price
 
-BASE_DIR       = os.path.dirname(__file__)
-SESSION_FILE   = os.path.join(BASE_DIR, "session.json")
-INVENTORY_FILE = os.path.join(BASE_DIR, "logs", "inventory.json")
-LOG_FILE       = os.path.join(BASE_DIR, "logs", "logs.json")
-RECEIVE_FILE   = os.path.join(BASE_DIR, "logs", "receive.json")
-REASON_FILE    = os.path.join(BASE_DIR, "logs", "reasons.json")
-
 class CheckoutApp:
-    def __init__(self, master, idx):
+    @timed('checkout.open')
+    def __init__(self, master, pid, repo=None):
         self.master = master
-        self.idx    = idx
+        self.pid    = pid
         master.title("良級懸賞 POS 系統 — 抽賞結帳")
         master.geometry("400x580")
         master.attributes('-topmost', True)
+        self.repo   = repo or Repository()
+        self.store  = self.repo.store
 
         # 共用變數
         self.branch         = tk.StringVar()
@@ -50,31 +50,21 @@ class CheckoutApp:
         self.clear()
         self.step1_ui()
 
+    # 以下皆由共用快取取得，資料未變動時不讀檔
     def load_session(self):
-        try:
-            with open(SESSION_FILE, "r", encoding="utf-8") as f:
-                sess = json.load(f)
-            self.branch.set(sess.get("selected_branch", ""))
-            self.staff.set(sess.get("selected_staff", ""))
-        except:
-            pass
+        sess = self.repo.session()
+        self.branch.set(sess.get("selected_branch", ""))
+        self.staff.set(sess.get("selected_staff", ""))
 
     def load_inventory(self):
-        with open(INVENTORY_FILE, "r", encoding="utf-8") as f:
-            inv = json.load(f)
-        self.item       = inv[self.idx]
+        self.item       = self.repo.product(self.pid)
         self.base_price = int(self.item.get("點數價", 0))
 
     def load_reasons(self):
-        if os.path.exists(REASON_FILE):
-            with open(REASON_FILE, "r", encoding="utf-8") as f:
-                self.reasons = json.load(f)
-        else:
-            self.reasons = []
+        self.reasons = self.repo.reasons()
 
     def save_reasons(self):
-        with open(REASON_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.reasons, f, ensure_ascii=False, indent=2)
+        self.repo.save_reasons(self.reasons)
 
     def clear(self):
         for w in self.master.winfo_children():
@@ -125,16 +115,8 @@ class CheckoutApp:
         cb_hole.grid(row=4, column=1, sticky="w", pady=5)
         cb_hole.bind("<<ComboboxSelected>>", lambda e: self.on_count_change())
 
-        # 單抽價（優先從 logs 取最後一次價格，無則回預設）
+        # 單抽價（優先從 logs 取最後一次價格，無則回預設；由 on_count_change 計算）
         ttk.Label(frm, text="單抽價：").grid(row=5, column=0, sticky="e")
-        try:
-            last_price = get_last_unit_price(self.idx, self.hole_var.get())
-            if last_price is not None:
-                self.unit_price_var.set(int(last_price))
-            else:
-                self.unit_price_var.set(int(self.item.get("20洞價格", self.base_price)))
-        except:
-            self.unit_price_var.set(int(self.item.get("20洞價格", self.base_price)))
         ttk.Label(frm, textvariable=self.unit_price_var).grid(row=5, column=1, sticky="w")
 
         # 大賞 / 小賞
@@ -167,40 +149,34 @@ class CheckoutApp:
         # 初次計算
         self.on_count_change()
 
+    def current_order(self):
+        # 目前畫面上的輸入組成訂單；所有金額計算都在 pricing.Order
+        return pricing.Order(
+            pid=self.pid, item=self.item.get("商品名稱",""),
+            hole=self.hole_var.get(), unit_price=self.unit_price_var.get(),
+            base_price=self.base_price,
+            big=self.num_big.get(), small=self.num_small.get(), free=self.free_var.get(),
+            dis_big_cnt=self.dis_big_cnt.get(), dis_small_cnt=self.dis_small_cnt.get(),
+            extra_dis=self.extra_dis.get(), reason=self.reason_var.get(),
+            cash=self.pay_cash.get(), transfer=self.pay_transfer.get(), points=self.pay_points.get())
+
     def on_count_change(self):
-        big   = max(0, min(self.num_big.get(), 1))
-        hole  = self.hole_var.get()
-        small = max(0, min(self.num_small.get(), hole - big))
-        self.num_big.set(big)
-        self.num_small.set(small)
-
-        # 嘗試從 logs 取最後一次單抽價
-        price = None
+        order = self.current_order().clamp_counts()
         try:
-            last = get_last_unit_price(self.idx, hole)
-            if last is not None:
-                price = int(last)
-        except:
-            price = None
-
-        if price is None:
-            price = int(self.item.get(f"{hole}洞價格", self.base_price))
-
-        self.unit_price_var.set(price)
-        self.total_amt.set(0 if self.free_var.get() else (big + small) * price)
-
-        if big == 1 and small == hole - 1:
-            self.chk_free.state(["!disabled"])
-        else:
-            self.free_var.set(False)
-            self.chk_free.state(["disabled"])
+            last = get_last_unit_price(self.pid, order.hole)
+        except Exception:
+            last = None
+        order.unit_price = pricing.unit_price(self.item, order.hole, last)
+
+        self.num_big.set(order.big)
+        self.num_small.set(order.small)
+        self.free_var.set(order.free)
+        self.unit_price_var.set(order.unit_price)
+        self.total_amt.set(order.total)
+        self.chk_free.state(["!disabled"] if order.free_allowed else ["disabled"])
 
     def get_list(self, key):
-        try:
-            with open(SESSION_FILE, 'r', encoding="utf-8") as f:
-                return json.load(f).get(key, [])
-        except:
-            return []
+        return self.repo.session().get(key, [])
 
     def goto_step1(self):
         self.clear(); self.step1_ui()
@@ -224,8 +200,9 @@ class CheckoutApp:
         ttk.Label(frm, text=f"此單總金額：{self.total_amt.get()}")\
             .grid(row=0, column=0, columnspan=2, pady=5)
 
-        self.max_big   = self.num_big.get()
-        self.max_small = 0 if self.free_var.get() else self.num_small.get()
+        order = self.current_order()
+        self.max_big   = order.max_dis_big
+        self.max_small = order.max_dis_small
 
         # 大賞折點
         ttk.Label(frm, text="大賞折點數量：").grid(row=1, column=0, sticky="e")
@@ -312,11 +289,9 @@ class CheckoutApp:
             btn.pack(side='left', padx=2)
 
     def update_due(self):
-        db = self.dis_big_cnt.get()
-        ds = self.dis_small_cnt.get()
-        ed = self.extra_dis.get()
-        self.discount.set(db*self.base_price + ds*20 + ed)
-        self.due_amt.set(self.total_amt.get() - self.discount.get())
+        order = self.current_order()
+        self.discount.set(order.discount)
+        self.due_amt.set(order.due)
 
     # --- Step 3 ---
     def step3_ui(self):
@@ -347,10 +322,10 @@ class CheckoutApp:
         ttk.Button(frm, text="確認結帳", command=self.do_confirm).grid(row=4, column=1, pady=15)
 
     def do_confirm(self):
-        paid = self.pay_cash.get() + self.pay_transfer.get() + self.pay_points.get()
-        if paid != self.due_amt.get():
+        order = self.current_order()
+        if order.paid != order.due:
             messagebox.showwarning("支付錯誤",
-                f"支付總和需等於應收 {self.due_amt.get()}！", parent=self.master)
+                f"支付總和需等於應收 {order.due}！", parent=self.master)
             return
         self.post_confirm()
 
@@ -363,61 +338,36 @@ class CheckoutApp:
                 break
             messagebox.showwarning("格式錯誤", "必須輸入4~5位數ID或10位手機號碼", parent=self.master)
 
-        big   = self.num_big.get()
-        small = self.num_small.get()
-        draws = big + small
-
-        rec = {
-            "idx":            self.idx,
-            "time":           datetime.now().isoformat(),
-            "branch":         self.branch.get(),
-            "staff":          self.staff.get(),
-            "member":         member,
-            "item":           self.item.get("商品名稱",""),
-            "hole":           self.hole_var.get(),
-            "抽數":           draws,
-            "大賞":           big,
-            "小賞":           small,
-            "free":           self.free_var.get(),
-            "inventory_qty":  big if self.free_var.get() else draws,
-            "total":          self.total_amt.get(),
-            "dis_big_cnt":    self.dis_big_cnt.get(),   # 新增：大賞折點
-            "dis_small_cnt":  self.dis_small_cnt.get(), # 新增：小賞折點
-            "extra_dis":      self.extra_dis.get(),     # 新增：額外折點
-            "discount":       self.discount.get(),
-            "reason":         self.reason_var.get(),
-            "due":            self.due_amt.get(),
-            "cash":           self.pay_cash.get(),
-            "transfer":       self.pay_transfer.get(),
-            "points":         self.pay_points.get(),
-            "unit_price":     self.unit_price_var.get() # 新增：單抽價
-        }
+        self.save_order(member)
+        messagebox.showinfo("完成", "已完成結帳並儲存紀錄")
+        self.master.destroy()
 
-        try:
-            from logs import add_transaction
-            add_transaction(rec)
-        except ImportError:
-            with open(LOG_FILE, "a", encoding="utf-8") as f:
-                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    @timed('checkout.save_order')
+    def save_order(self, member):
+        rec = self.current_order().to_record(
+            time=datetime.now().isoformat(),
+            branch=self.branch.get(),
+            staff=self.staff.get(),
+            member=member,
+        )
 
+        self.store.insert('logs', rec)   # 最後單價索引由 storage 的異動通知更新
+
+        # 領取紀錄另有自己的 id，以 txn_id 對應交易；金額等欄位只留在交易紀錄
         rec2 = {
-            **rec,
+            **{k: rec[k] for k in records.RECEIVE_FROM_TXN if k in rec},
+            "txn_id": rec["id"],
             "日期":  datetime.now().strftime('%Y-%m-%d'),
             "qty":   rec["inventory_qty"],
             "expire":datetime.now().date().isoformat()
         }
-        with open(RECEIVE_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(rec2, ensure_ascii=False) + "\n")
-
-        try:
-            self.master.master.event_generate('<<TransactionDone>>')
-        except:
-            pass
+        self.store.insert('receive', rec2)
 
-        messagebox.showinfo("完成", "已完成結帳並儲存紀錄")
-        self.master.destroy()
+        # 通知各分頁只加入這兩筆新紀錄
+        events.publish(events.TRANSACTION_ADDED, rec)
+        events.publish(events.RECEIVE_ADDED, rec2)
 
 if __name__ == "__main__":
     root = tk.Tk()
-    CheckoutApp(root, idx=0)
+    CheckoutApp(root, pid=storage.get_backend().load('inventory')[0]['id'])
     root.mainloop()
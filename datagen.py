@@ -0,0 +1,210 @@
+# datagen.py｜良級懸賞 POS 系統 — 產生測試資料（欄位同結帳與 Excel 匯入寫入的格式；固定 seed 可重現）
+# 用法：python datagen.py --home /tmp/pos --logs 100000 [--items N] [--members N] [--days 365]
+#       [--end 2025-06-30] [--skew 2.0] [--seed 1] [--legacy]
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta
+import pricing
+import records
+import importer
+
+VENDORS   = ('良級懸賞', '良級懸賞', '良級懸賞', '萬代', '壽屋', '海洋堂')
+IPS       = ('鬼滅之刃', '海賊王', '咒術迴戰', 'SPYxFAMILY', '進擊的巨人', '七龍珠', '寶可夢', '排球少年', '鏈鋸人', '葬送的芙莉蓮')
+KINDS     = ('一番賞', '景品', '公仔', '吊飾', '色紙', '毛巾')
+BRANCHES  = ('新莊店', '板橋店', '台中店')
+STAFF     = ('TING', '小明', '小華', '阿美', 'KEVIN')
+REASONS   = ('回城', '轉轉樂', '生日優惠', '補償')
+RETURNERS = ('TING', '阿美', '倉庫')
+OPEN_HOUR, CLOSE_HOUR = 11, 22
+
+def _skewed(rnd, n, skew):
+    # skew=1 為均勻；越大越集中在前面的索引（熱門商品、常客）
+    return min(n - 1, int(n * rnd.random() ** skew))
+
+def _id(rnd, ts):
+    # 格式同 storage.new_id（時間 14 碼 + 8 碼十六進位），但由 rnd 產生以便重現
+    return ts.strftime('%Y%m%d%H%M%S') + f'{rnd.getrandbits(32):08x}'
+
+def sheet_rows(n, seed=1, prefix='SKU'):
+    # 廠商 Excel 的資料列：A 編碼、B 名稱、C 連結、D 關鍵字、I/J 成本、L 數量
+    rnd = random.Random(seed)
+    for i in range(n):
+        ip = rnd.choice(IPS)
+        cost = rnd.randrange(300, 30000, 10)
+        yield (f'{prefix}{i:07d}', f'{ip} {rnd.choice(KINDS)} 第{i % 50 + 1}彈',
+               f'https://example.com/p/{i}' if rnd.random() < 0.3 else None,
+               f'{ip} 動漫', None, None, None, None, cost, None, None, rnd.randint(0, 80))
+
+def write_workbook(path, n, seed=1, prefix='SKU'):
+    # 產生可由「批次匯入」讀取的 xlsx（前兩列為標題，同廠商檔案）
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['編碼', '商品名稱', '連結', '關鍵字'])
+    ws.append(['', '', '', ''])
+    for row in sheet_rows(n, seed, prefix):
+        ws.append(row)
+    wb.save(path)
+    return path
+
+def make_items(rnd, n, start):
+    # 經由 importer.parse_row 產生，欄位與批次匯入寫入的完全相同；部分改為其他廠商
+    items = []
+    for row in sheet_rows(n, rnd.getrandbits(32)):
+        item = importer.parse_row(row)
+        item['廠商'] = rnd.choice(VENDORS)
+        item['id'] = _id(rnd, start)
+        items.append(item)
+    return items
+
+def make_members(rnd, n):
+    # 會員ID 為 4~5 位數或 10 位手機號碼（同結帳時的格式檢查）
+    members = set()
+    while len(members) < n:
+        if rnd.random() < 0.7:
+            members.add(str(rnd.randint(1000, 99999)))
+        else:
+            members.add('09' + f'{rnd.randrange(10 ** 8):08d}')
+    members = sorted(members)
+    rnd.shuffle(members)
+    return members
+
+def _timestamps(rnd, count, end, days):
+    # 營業時間內隨機分布，依時間排序
+    first = datetime.combine(end - timedelta(days=days - 1), datetime.min.time())
+    span = (CLOSE_HOUR - OPEN_HOUR) * 3600
+    stamps = sorted(rnd.randrange(days) * 86400 + OPEN_HOUR * 3600 + rnd.randrange(span) for _ in range(count))
+    return [first + timedelta(seconds=s) for s in stamps]
+
+def make_order(rnd, item):
+    hole = rnd.choice(pricing.HOLES)
+    order = pricing.Order(pid=item['id'], item=item['商品名稱'], hole=hole,
+                          unit_price=int(item[f'{hole}洞價格']), base_price=int(item['點數價']))
+    if rnd.random() < 0.03:
+        # 整組抽完且只中 1 個大賞，其中一半為非洲人免單
+        order.big, order.small = 1, hole - 1
+        order.free = rnd.random() < 0.5
+    else:
+        order.big = 1 if rnd.random() < 0.08 else 0
+        order.small = rnd.randint(1, min(10, hole - order.big))
+    order.clamp_counts()
+    if order.max_dis_big and rnd.random() < 0.3:
+        order.dis_big_cnt = order.max_dis_big
+    if order.max_dis_small and rnd.random() < 0.2:
+        order.dis_small_cnt = rnd.randint(1, order.max_dis_small)
+    if rnd.random() < 0.05:
+        order.extra_dis, order.reason = rnd.randrange(10, 200, 10), rnd.choice(REASONS)
+    # 付款：現金、轉帳、點數折抵，少數以負點數記錄（多收的現金轉為點數）
+    due, r = order.due, rnd.random()
+    if due <= 0 or r < 0.55:
+        order.cash = due
+    elif r < 0.75:
+        order.transfer = due
+    elif r < 0.92:
+        order.points = rnd.randint(0, due)
+        order.cash = due - order.points
+    else:
+        change = rnd.randrange(10, 500, 10)
+        order.cash, order.points = due + change, -change
+    return order.validate()
+
+def make_receive(rnd, rec, ts, end, vendor):
+    # 欄位同 CheckoutApp.post_confirm；越舊的紀錄越可能已領取或已處理
+    item = {k: rec[k] for k in records.RECEIVE_FROM_TXN if k in rec}
+    day = ts.strftime('%Y-%m-%d')
+    item.update({'txn_id': rec['id'], '日期': day, 'qty': rec['inventory_qty'], 'expire': day,
+                 'id': _id(rnd, ts)})
+    age = (end - ts.date()).days
+    if rnd.random() < min(0.95, age / 30):
+        item['vendor'] = vendor
+        item['status'] = '已領取'
+        item['receive_method'] = rnd.choice(records.RECEIVE_METHODS)
+        item['picked_sent_date'] = (ts.date() + timedelta(days=min(age, rnd.randint(0, 20)))).isoformat()
+    elif rnd.random() < 0.4:
+        item['vendor'] = vendor
+        item['status'] = rnd.choice(records.RECEIVE_STATUSES[1:])
+        if item['status'] in ('需回盒', '已回盒'):
+            item['return_person'] = rnd.choice(RETURNERS)
+            if item['status'] == '已回盒':
+                item['return_date'] = (ts.date() + timedelta(days=min(age, 3))).isoformat()
+        if rnd.random() < 0.1:
+            item['notes'] = '客人來電詢問'
+    return item
+
+def generate(logs=10000, items=None, members=None, days=365, end=None, skew=2.0, seed=1):
+    # 回傳 {'inventory', 'logs', 'receive', 'reasons', 'session'}；相同參數與 seed 產生相同資料
+    rnd = random.Random(seed)
+    end = end or datetime.now().date()
+    if isinstance(end, str):
+        end = datetime.strptime(end, '%Y-%m-%d').date()
+    start = datetime.combine(end - timedelta(days=days - 1), datetime.min.time())
+    products = make_items(rnd, items or max(100, logs // 20), start)
+    people = make_members(rnd, members or max(50, logs // 10))
+    staff = {b: rnd.sample(STAFF, 3) for b in BRANCHES}
+
+    logs_rows, recv_rows = [], []
+    for ts in _timestamps(rnd, logs, end, days):
+        item = products[_skewed(rnd, len(products), skew)]
+        branch = rnd.choice(BRANCHES)
+        rec = make_order(rnd, item).to_record(
+            time=ts.isoformat(), branch=branch, staff=rnd.choice(staff[branch]),
+            member=people[_skewed(rnd, len(people), skew)])
+        rec['id'] = _id(rnd, ts)
+        logs_rows.append(rec)
+        recv_rows.append(make_receive(rnd, rec, ts, end, item['廠商']))
+
+    session = {
+        'branch_list': list(BRANCHES), 'staff_list': list(STAFF),
+        'selected_branch': BRANCHES[0], 'selected_staff': STAFF[0],
+        'start_cash': 10000, 'start_datetime': f'{end.isoformat()} {OPEN_HOUR:02d}:00:00',
+    }
+    return {'inventory': products, 'logs': logs_rows, 'receive': recv_rows,
+            'reasons': list(REASONS), 'session': session}
+
+def write_dataset(data, store=None, legacy=False):
+    # 寫入 POS_HOME（storage 於匯入時決定路徑，因此在這裡才載入）
+    # legacy=True 時寫成舊版單檔（inventory/reasons 為陣列、logs/receive 為 JSONL），下次啟動由儲存層轉換
+    import storage
+    os.makedirs(storage.DATA_DIR, exist_ok=True)
+    with open(storage.SESSION_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data['session'], f, ensure_ascii=False, indent=2)
+    if legacy:
+        for table in ('inventory', 'reasons'):
+            with open(storage.JsonBackend.FILES[table], 'w', encoding='utf-8') as f:
+                json.dump(data[table], f, ensure_ascii=False, indent=2)
+        for table in ('logs', 'receive'):
+            with open(storage.JsonBackend.FILES[table], 'w', encoding='utf-8') as f:
+                for rec in data[table]:
+                    f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+        return
+    store = store or storage.get_backend()
+    for table in storage.TABLES:
+        store.save_all(table, data[table])
+    storage.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='良級懸賞 POS 測試資料產生器')
+    parser.add_argument('--home', required=True, help='資料目錄（同 POS_HOME）')
+    parser.add_argument('--logs', type=int, default=10000, help='交易筆數（每筆另有一筆領取紀錄）')
+    parser.add_argument('--items', type=int, help='商品數（預設為交易筆數 / 20，至少 100）')
+    parser.add_argument('--members', type=int, help='會員數（預設為交易筆數 / 10，至少 50）')
+    parser.add_argument('--days', type=int, default=365, help='資料涵蓋的天數')
+    parser.add_argument('--end', help='最後一天 YYYY-MM-DD（預設今天）')
+    parser.add_argument('--skew', type=float, default=2.0, help='熱門商品與常客的集中程度（1 為均勻）')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--legacy', action='store_true', help='寫成舊版單檔格式')
+    args = parser.parse_args(argv)
+
+    home = os.path.abspath(args.home)
+    if os.path.exists(os.path.join(home, 'logs')) and os.listdir(os.path.join(home, 'logs')):
+        sys.exit(f'{home}/logs 已有資料，請指定空的目錄')
+    os.environ['POS_HOME'] = home
+    data = generate(args.logs, args.items, args.members, args.days, args.end, args.skew, args.seed)
+    write_dataset(data, legacy=args.legacy)
+    print(f"{home}：商品 {len(data['inventory'])}、交易 {len(data['logs'])}、領取 {len(data['receive'])}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# datepicker.py｜良級懸賞 POS 系統 — 日期欄位（第一次建立時才載入 tkcalendar）
+from datetime import datetime
+from tkinter import ttk
+
+_entry_class = None
+
+class PlainDateEntry(ttk.Entry):
+    # 未安裝 tkcalendar 時的替代：一般輸入框，介面與 tkcalendar.DateEntry 相容（get / set_date）
+    def __init__(self, master=None, date_pattern=None, **kw):
+        super().__init__(master, **kw)
+        if not self.get():
+            self.insert(0, datetime.now().strftime('%Y-%m-%d'))
+        self.bind('<Return>', lambda e: self.event_generate('<<DateEntrySelected>>'))
+
+    def set_date(self, date):
+        self.delete(0, 'end')
+        self.insert(0, date.strftime('%Y-%m-%d'))
+
+def date_entry(master=None, **kw):
+    # tkcalendar 連帶載入 babel，較慢；延到真的顯示日期欄位時才匯入，且不在執行時安裝套件
+    global _entry_class
+    if _entry_class is None:
+        try:
+            from tkcalendar import DateEntry
+        except ImportError:
+            DateEntry = PlainDateEntry
+        _entry_class = DateEntry
+    return _entry_class(master, **kw)
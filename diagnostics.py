@@ -0,0 +1,80 @@
+# diagnostics.py｜良級懸賞 POS 系統 — 效能診斷分頁（隱藏分頁，Ctrl+Shift+D 開關；顯示 profiling 紀錄並可匯出）
+import tkinter as tk
+from tkinter import ttk, messagebox
+import profiling
+
+REFRESH_MS = 1000   # 分頁顯示中時自動更新的間隔
+
+class DiagnosticsFrame(ttk.Frame):
+    def __init__(self, master):
+        super().__init__(master)
+        self.slow_only = tk.BooleanVar(value=False)
+        self.build_ui()
+        self.refresh()
+        self.after(REFRESH_MS, self.auto_refresh)
+
+    def build_ui(self):
+        top = ttk.Frame(self)
+        top.pack(fill='x', padx=10, pady=5)
+        ttk.Button(top, text='重新整理', command=self.refresh).pack(side='left', padx=5)
+        ttk.Checkbutton(top, text=f'只顯示超過 {profiling.SLOW_MS}ms', variable=self.slow_only,
+                        command=self.refresh).pack(side='left', padx=5)
+        ttk.Button(top, text='清除', command=self.clear).pack(side='right', padx=5)
+        ttk.Button(top, text='匯出檔案', command=self.dump).pack(side='right', padx=5)
+
+        pane = ttk.PanedWindow(self, orient='vertical')
+        pane.pack(fill='both', expand=True, padx=10, pady=5)
+
+        cols = ('name', 'count', 'total_ms', 'max_ms', 'last_ms', 'slow')
+        heads = ('項目', '次數', '總計(ms)', '最長(ms)', '最近(ms)', '慢')
+        self.summary_tree = self._tree(pane, cols, heads, (260, 60, 90, 90, 90, 50))
+        pane.add(self.summary_tree.master, weight=1)
+
+        cols = ('at', 'name', 'ms', 'rows', 'thread')
+        heads = ('時間', '項目', '耗時(ms)', '筆數', '執行緒')
+        self.entry_tree = self._tree(pane, cols, heads, (170, 260, 90, 70, 110))
+        self.entry_tree.tag_configure('slow', foreground='red')
+        pane.add(self.entry_tree.master, weight=2)
+
+    def _tree(self, pane, cols, heads, widths):
+        frame = ttk.Frame(pane)
+        tree = ttk.Treeview(frame, columns=cols, show='headings')
+        for c, h, w in zip(cols, heads, widths):
+            tree.heading(c, text=h)
+            tree.column(c, width=w, anchor='w' if c in ('name', 'at', 'thread') else 'e')
+        sb = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side='left', fill='both', expand=True)
+        sb.pack(side='right', fill='y')
+        return tree
+
+    def refresh(self):
+        self.summary_tree.delete(*self.summary_tree.get_children())
+        for s in profiling.summary():
+            self.summary_tree.insert('', 'end', values=(s['name'], s['count'], s['total_ms'],
+                                                        s['max_ms'], s['last_ms'], s['slow'] or ''))
+        self.entry_tree.delete(*self.entry_tree.get_children())
+        entries = profiling.entries()
+        if self.slow_only.get():
+            entries = [e for e in entries if e.get('slow')]
+        # 最新的在最上面
+        for e in reversed(entries[-500:]):
+            self.entry_tree.insert('', 'end', values=(e['at'][11:], e['name'], e['ms'], e.get('rows', ''), e['thread']),
+                                   tags=('slow',) if e.get('slow') else ())
+
+    def auto_refresh(self):
+        if self.winfo_ismapped():
+            self.refresh()
+        self.after(REFRESH_MS, self.auto_refresh)
+
+    def clear(self):
+        profiling.clear()
+        self.refresh()
+
+    def dump(self):
+        try:
+            path = profiling.dump()
+        except OSError as e:
+            messagebox.showerror('匯出失敗', str(e), parent=self)
+            return
+        messagebox.showinfo('匯出完成', f'已匯出診斷紀錄到 {path}', parent=self)
@@ -0,0 +1,21 @@
+# events.py｜良級懸賞 POS 系統 — 程序內事件匯流排（各分頁只套用異動部分）
+from collections import defaultdict
+
+# 主題
+TRANSACTION_ADDED = 'transaction_added'   # payload：新增的交易紀錄
+RECEIVE_ADDED     = 'receive_added'       # payload：新增的領取紀錄
+
+_subscribers = defaultdict(list)
+
+def subscribe(topic, fn):
+    # 回傳取消訂閱的函式
+    _subscribers[topic].append(fn)
+    return lambda: _subscribers[topic].remove(fn) if fn in _subscribers[topic] else None
+
+def publish(topic, payload=None):
+    # 同步呼叫（皆在 Tk 主執行緒），單一訂閱者出錯不影響其他分頁
+    for fn in list(_subscribers[topic]):
+        try:
+            fn(payload)
+        except Exception as e:
+            print(f'[events] {topic} 處理失敗：{e}')
@@ -0,0 +1,216 @@
+# export.py｜良級懸賞 POS 系統 — 背景匯出（CSV / XLSX / JSON 逐列串流寫檔，進度經佇列回報，可取消）
+# 寫檔在工作執行緒執行；Tk 主執行緒只由 run_with_progress 定時讀取佇列更新進度。openpyxl 只在匯出 XLSX 時才載入
+import os
+import csv
+import json
+import queue
+import threading
+from datetime import date, timedelta
+from profiling import span
+
+PROGRESS_EVERY = 500   # 每寫這麼多列回報一次進度並檢查是否取消
+POLL_MS        = 100   # 進度視窗讀取佇列的間隔
+FILETYPES      = [('CSV', '*.csv'), ('Excel', '*.xlsx'), ('JSON', '*.json')]
+
+class Cancelled(Exception):
+    pass
+
+class Job:
+    # 在背景執行緒執行 fn(job)；fn 以 job.progress(done, total, text) 回報進度，
+    # 以 job.check() 在取消時中斷。結果/例外以 ('done'|'error'|'cancelled', 值) 放入佇列
+    def __init__(self, fn, name='export'):
+        self.fn = fn
+        self.name = name
+        self.queue = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name=self.name, daemon=True).start()
+        return self
+
+    def _run(self):
+        try:
+            self.queue.put(('done', self.fn(self)))
+        except Cancelled:
+            self.queue.put(('cancelled', None))
+        except Exception as e:
+            self.queue.put(('error', e))
+
+    def progress(self, done=None, total=None, text=''):
+        self.queue.put(('progress', (done, total, text)))
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def cancel(self):
+        self.cancelled.set()
+
+def _tick(job, done, total, text):
+    if job is not None:
+        job.check()
+        job.progress(done, total, text)
+
+def format_of(path):
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext not in ('csv', 'xlsx', 'json'):
+        raise ValueError(f'不支援的匯出格式：{ext or "（無副檔名）"}')
+    return ext
+
+def _replace(tmp, path, ok):
+    # 完成才換上正式檔名；取消或失敗時刪除暫存檔，不留下寫一半的檔案
+    if ok:
+        os.replace(tmp, path)
+    elif os.path.exists(tmp):
+        os.remove(tmp)
+
+def _cell(v):
+    # XLSX 儲存格不接受 dict/list；空字串留白（不寫出儲存格，檔案較小也較快）
+    if v == '':
+        return None
+    return json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+
+def _discard(ws):
+    # 取消/失敗時結束 write-only 工作表並刪除 openpyxl 的暫存檔
+    try:
+        ws.close()
+        os.remove(ws._writer.out)
+    except Exception:
+        pass
+
+def write_table(path, header, rows, job=None, total=None, sheet='Sheet1'):
+    # rows：可迭代的列（list/tuple），依副檔名寫成 CSV 或 XLSX；回傳寫入列數
+    fmt = format_of(path)
+    tmp, n, ok = path + '.tmp', 0, False
+    label = os.path.basename(path)
+    try:
+        with span(f'export.{fmt}') as s:
+            if fmt == 'xlsx':
+                from openpyxl import Workbook   # 未安裝時由呼叫端顯示 ImportError
+                wb = Workbook(write_only=True)
+                ws = wb.create_sheet(sheet)
+                try:
+                    ws.append(list(header))
+                    for row in rows:
+                        ws.append([_cell(v) for v in row])
+                        n += 1
+                        if n % PROGRESS_EVERY == 0:
+                            _tick(job, n, total, label)
+                except BaseException:
+                    _discard(ws)
+                    raise
+                wb.save(tmp)
+            elif fmt == 'csv':
+                with open(tmp, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(header)
+                    for row in rows:
+                        writer.writerow(row)
+                        n += 1
+                        if n % PROGRESS_EVERY == 0:
+                            _tick(job, n, total, label)
+            else:
+                raise ValueError('JSON 請用 write_json')
+            s.rows = n
+        _tick(job, n, total, label)
+        ok = True
+    finally:
+        _replace(tmp, path, ok)
+    return n
+
+def write_json(path, records, job=None, total=None):
+    # 逐筆寫成 JSON 陣列（每筆一行），不先組成整份字串
+    tmp, n, ok = path + '.tmp', 0, False
+    label = os.path.basename(path)
+    try:
+        with span('export.json') as s, open(tmp, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for rec in records:
+                f.write(',\n' if n else '\n')
+                f.write(json.dumps(rec, ensure_ascii=False))
+                n += 1
+                if n % PROGRESS_EVERY == 0:
+                    _tick(job, n, total, label)
+            f.write('\n]\n')
+            s.rows = n
+        _tick(job, n, total, label)
+        ok = True
+    finally:
+        _replace(tmp, path, ok)
+    return n
+
+def write_records(path, records, columns, job=None, total=None, sheet='Sheet1'):
+    # 依副檔名匯出紀錄：JSON 保留完整欄位，CSV/XLSX 只輸出 columns
+    if format_of(path) == 'json':
+        return write_json(path, records, job, total)
+    return write_table(path, columns, ([rec.get(c, '') for c in columns] for rec in records),
+                       job, total, sheet)
+
+def month_ranges(start, end):
+    # 將 [start, end]（YYYY-MM-DD）切成逐月的區段
+    d, last = date.fromisoformat(start), date.fromisoformat(end)
+    while d <= last:
+        nxt = (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield d.isoformat(), min(nxt - timedelta(days=1), last).isoformat()
+        d = nxt
+
+def iter_query(store, table, start, end, job=None, **kw):
+    # 逐月查詢，記憶體中只保留一個月的紀錄；每月之間檢查是否取消
+    for s, e in month_ranges(start, end):
+        if job is not None:
+            job.check()
+        yield from store.query(table, s, e, **kw)
+
+def run_with_progress(master, title, fn, on_done=None):
+    # 開啟進度視窗並在背景執行 fn(job)；完成後於 Tk 主執行緒呼叫 on_done(result)
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+    job = Job(fn, name=f'export:{title}')
+    dlg = tk.Toplevel(master)
+    dlg.title(title)
+    dlg.resizable(False, False)
+    dlg.transient(master.winfo_toplevel())
+    text = tk.StringVar(value='準備中…')
+    ttk.Label(dlg, textvariable=text, width=48).pack(padx=15, pady=(15, 5))
+    bar = ttk.Progressbar(dlg, length=320, mode='indeterminate')
+    bar.pack(padx=15, pady=5)
+    bar.start(15)
+    cancel = ttk.Button(dlg, text='取消', command=lambda: (job.cancel(), text.set('取消中…')))
+    cancel.pack(pady=(5, 15))
+    dlg.protocol('WM_DELETE_WINDOW', cancel.invoke)
+    dlg.grab_set()
+
+    def poll():
+        try:
+            while True:
+                kind, value = job.queue.get_nowait()
+                if kind == 'progress':
+                    done, total, label = value
+                    if total:
+                        if str(bar['mode']) != 'determinate':
+                            bar.stop()
+                        bar.configure(mode='determinate', maximum=total, value=min(done or 0, total))
+                        text.set(f'{label}　{done:,} / {total:,}')
+                    else:
+                        text.set(f'{label}　{done:,}' if done else label)
+                    continue
+                dlg.grab_release()
+                dlg.destroy()
+                if kind == 'done':
+                    if on_done:
+                        on_done(value)
+                elif kind == 'error':
+                    if isinstance(value, ImportError):
+                        messagebox.showerror('缺少套件', '讀寫 Excel 需要 openpyxl，請先執行：pip install openpyxl', parent=master)
+                    else:
+                        messagebox.showerror(title, f'{title}失敗：{value}', parent=master)
+                else:
+                    messagebox.showinfo(title, f'已取消{title}', parent=master)
+                return
+        except queue.Empty:
+            pass
+        dlg.after(POLL_MS, poll)
+
+    job.start()
+    dlg.after(POLL_MS, poll)
+    return job
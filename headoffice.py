@@ -0,0 +1,69 @@
+# headoffice.py｜良級懸賞 POS 系統 — 總部彙整：同步各分店異動後依分店合計（資料來自 sync.Consolidated）
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import datetime
+import sync
+import export
+from datepicker import date_entry
+
+class HeadOfficeView(tk.Toplevel):
+    def __init__(self, master, store, session=None):
+        super().__init__(master)
+        self.title('分店彙整')
+        self.geometry('720x420')
+        self.transient(master.winfo_toplevel())
+        self.store = store
+        self.session = session or {}
+        self.consolidated = sync.get_consolidated()
+        month_start = datetime.now().strftime('%Y-%m-01')
+        self.start_var = tk.StringVar(value=month_start)
+        self.end_var = tk.StringVar(value=datetime.now().strftime('%Y-%m-%d'))
+        self.status_var = tk.StringVar()
+        self.build_ui()
+        self.refresh()
+
+    def build_ui(self):
+        top = ttk.Frame(self)
+        top.pack(fill='x', padx=10, pady=5)
+        ttk.Label(top, text='起始：').pack(side='left')
+        date_entry(top, textvariable=self.start_var, date_pattern='yyyy-MM-dd', width=12).pack(side='left', padx=5)
+        ttk.Label(top, text='結束：').pack(side='left')
+        date_entry(top, textvariable=self.end_var, date_pattern='yyyy-MM-dd', width=12).pack(side='left', padx=5)
+        ttk.Button(top, text='查詢', command=self.refresh).pack(side='left', padx=10)
+        ttk.Button(top, text='立即同步', command=self.sync).pack(side='right')
+
+        cols = ('branch', 'count', 'due', 'cash', 'transfer', 'points')
+        heads = ('分店', '筆數', '應收', '現金', '匯款', '點數')
+        self.tree = ttk.Treeview(self, columns=cols, show='headings')
+        for c, h in zip(cols, heads):
+            self.tree.heading(c, text=h)
+            self.tree.column(c, width=150 if c == 'branch' else 100, anchor='w' if c == 'branch' else 'e')
+        self.tree.pack(fill='both', expand=True, padx=10, pady=5)
+        ttk.Label(self, textvariable=self.status_var).pack(anchor='w', padx=10, pady=(0, 8))
+
+    def refresh(self):
+        totals = sync.branch_totals(self.consolidated, self.start_var.get(), self.end_var.get())
+        self.tree.delete(*self.tree.get_children())
+        grand = dict.fromkeys(('count',) + sync.AMOUNTS, 0)
+        for branch, t in sorted(totals.items()):
+            self.tree.insert('', 'end', values=(branch, t['count'], t['due'], t['cash'], t['transfer'], t['points']))
+            for k in grand:
+                grand[k] += t[k]
+        self.tree.insert('', 'end', values=('合計', grand['count'], grand['due'], grand['cash'],
+                                            grand['transfer'], grand['points']))
+        seen = self.store.get_meta('sync:seen') or {}
+        pushed = self.store.get_meta('sync:pushed') or {}
+        self.status_var.set(f"已合併 {len(seen)} 個來源；本機最後送出 #{pushed.get('seq', 0)}"
+                            f"（{(pushed.get('at') or '尚未同步')[:16].replace('T', ' ')}）")
+
+    def sync(self):
+        shared = sync.shared_dir(self.session)
+        if not shared:
+            messagebox.showwarning('同步', '請先在 session.json 設定 "sync_dir"（共用資料夾）', parent=self)
+            return
+        def done(result):
+            p, q = result['push'], result['pull']
+            self.refresh()
+            messagebox.showinfo('同步完成', f"送出 {p['events']} 筆異動（{p['bytes']:,} bytes）\n"
+                                f"合併 {q['files']} 個檔、{q['events']} 筆異動，衝突 {q['conflicts']} 筆", parent=self)
+        export.run_with_progress(self, '同步', lambda job: sync.sync_now(self.store, shared, self.session, job, self.consolidated), done)
@@ -0,0 +1,95 @@
+# importer.py｜良級懸賞 POS 系統 — 廠商 Excel 串流匯入（依編碼新增/更新）
+# openpyxl 只在真的匯入 Excel 時才載入（見 import_workbook）
+import os
+import zipfile
+import pricing
+from export import PROGRESS_EVERY
+
+BATCH_SIZE = 2000
+# 以試算表內容覆寫的欄位；備註、廠商等店內自行維護的欄位不動
+SHEET_FIELDS = ('關鍵字IP', '商品名稱', '數量', '成本', '點數價',
+                '20洞價格', '40洞價格', '60洞價格', '80洞價格', '商品連結')
+
+def parse_row(row, rule=pricing.DEFAULT_RULE):
+    # 試算表欄位：A 編碼、B 名稱、C 連結、D 關鍵字、I/J 成本、L 數量
+    row = tuple(row) + (None,) * (12 - len(row))
+    code = str(row[0] or '').strip()
+    name = row[1] or ''
+    link = row[2] or ''
+    kw = str(row[3]).split()[0] if row[3] and str(row[3]).split() else ''
+    cost_val = row[9] or row[8] or 0
+    cost = int(cost_val)
+    prices = rule.prices(cost)
+    raw_qty = row[11]
+    qty = str(int(raw_qty)) if isinstance(raw_qty, (int, float)) else str(raw_qty or '')
+    return {
+        '廠商':'良級懸賞','關鍵字IP':kw,'編碼':code,'商品名稱':name,
+        '數量':qty,'成本':str(cost),
+        **{f: str(v) for f, v in prices.items()},
+        '備註':'','商品連結':link
+    }
+
+def _open(path):
+    from openpyxl import load_workbook   # 未安裝時由呼叫端顯示 ImportError
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        return load_workbook(path, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError) as e:
+        raise ValueError(f'無法讀取 {os.path.basename(path)}，請確認是 Excel（.xlsx）檔：{e}') from e
+
+def import_workbook(path, store, existing, batch_size=BATCH_SIZE, rule=pricing.DEFAULT_RULE, job=None):
+    # 以唯讀模式逐列讀取；existing 為目前商品清單（更新時直接修改其中的 dict）
+    # job：export.Job，每 PROGRESS_EVERY 列回報進度；取消時寫入已暫存的這一批後停止（result['cancelled']）
+    # 回傳 {'inserted': [...], 'updated': [...], 'skipped': n, 'errors': [(列號, 訊息)], 'cancelled': bool}
+    by_code = {item.get('編碼'): item for item in existing if item.get('編碼')}
+    result = {'inserted': [], 'updated': [], 'skipped': 0, 'errors': [], 'cancelled': False}
+    to_insert, to_update, updated = [], {}, {}
+
+    def commit():
+        if to_insert:
+            result['inserted'].extend(store.insert_many('inventory', to_insert))
+            to_insert.clear()
+        if to_update:
+            store.update_many('inventory', list(to_update.values()))
+            to_update.clear()
+
+    wb = _open(path)
+    try:
+        ws = wb.active
+        total = max((ws.max_row or 0) - 2, 0) or None   # 試算表有記錄範圍時才有總列數
+        label = os.path.basename(path)
+        for row_no, row in enumerate(ws.iter_rows(min_row=3, values_only=True), start=3):
+            if job is not None and (row_no - 2) % PROGRESS_EVERY == 0:
+                if job.cancelled.is_set():
+                    result['cancelled'] = True
+                    break
+                job.progress(row_no - 2, total, label)
+            if not any(v not in (None, '') for v in row):
+                continue  # 空白列
+            try:
+                item = parse_row(row, rule)
+            except (TypeError, ValueError) as e:
+                result['errors'].append((row_no, f'成本格式錯誤：{e}'))
+                continue
+            if not item['編碼']:
+                result['errors'].append((row_no, '缺少編碼'))
+                continue
+            old = by_code.get(item['編碼'])
+            if old is None:
+                by_code[item['編碼']] = item
+                to_insert.append(item)
+            elif all(old.get(f) == item[f] for f in SHEET_FIELDS):
+                result['skipped'] += 1
+            else:
+                for f in SHEET_FIELDS:
+                    old[f] = item[f]
+                if 'id' in old:  # 同一份檔案內尚未寫入的新商品不需另外更新
+                    to_update[old['id']] = updated[old['id']] = old
+            if len(to_insert) + len(to_update) >= batch_size:
+                commit()
+        # 取消時也寫入已改過的這一批：existing 內的商品已就地更新，與檔案保持一致
+        commit()
+    finally:
+        wb.close()
+    result['updated'] = list(updated.values())
+    return result
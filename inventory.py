@@ -1,22 +1,28 @@
 # inventory.py｜良級懸賞 POS 系統 — 庫存管理功能
-import os, sys, subprocess, json, tkinter as tk, csv
+import os, tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import webbrowser
 from datetime import datetime
 import logs
 import receive
-
-# 確保 openpyxl 安裝
-try:
-    from openpyxl import load_workbook
-except ImportError:
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'openpyxl'])
-    from openpyxl import load_workbook
+import storage
+import products
+from repository import Repository
+from table import VirtualTree
+from search_index import SearchIndex
+import importer
+import pricing
+import repricing
+import report
+import export
+import sync
+import diagnostics
+from profiling import timed, span
+from tail import POLL_MS
 
 # 資料儲存路徑
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'logs')
-os.makedirs(DATA_DIR, exist_ok=True)
-INVENTORY_FILE = os.path.join(DATA_DIR, 'inventory.json')
+DATA_DIR = storage.DATA_DIR
+INVENTORY_FILE = storage.INVENTORY_FILE
 
 class InventoryApp:
     def __init__(self, root):
@@ -24,7 +30,15 @@ class InventoryApp:
         self.root.title('良級懸賞 POS 系統')
         self.root.geometry('1000x600')
         self.data = []
+        # 共用資料快取：傳給結帳視窗與交易/領取分頁
+        self.repo = Repository()
+        self.store = self.repo.store
+        # 有設定同步資料夾時開始記錄交易/領取異動，供「分店彙整」送出
+        sync.enable(self.repo.session())
         self.load_data()
+        # 舊交易紀錄以清單位置 idx 參照商品，一次性改寫為穩定的 pid
+        if products.migrate_product_refs(self.store, self.data) is not None:
+            logs.rebuild_price_index()
 
         # inline edit 狀態
         self.editing = False
@@ -34,17 +48,13 @@ class InventoryApp:
 
         self.build_ui()
         self.refresh_table()
+        self.root.after(POLL_MS, self.poll_write_errors)
 
+    @timed('inventory.load_data', rows=lambda result, self: len(self.data))
     def load_data(self):
-        if os.path.exists(INVENTORY_FILE):
-            with open(INVENTORY_FILE, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-        else:
-            self.data = []
-
-    def save_data(self):
-        with open(INVENTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        self.data = self.repo.inventory()
+        self.by_id = self.repo.products()
+        self.search_index = None   # 第一次搜尋時才建立
 
     def build_ui(self):
         # 建立 Notebook 分頁
@@ -65,18 +75,23 @@ class InventoryApp:
         entry.bind('<FocusIn>', lambda e: self.search_var.set('') if self.search_var.get()=='搜尋' else None)
         entry.bind('<FocusOut>', lambda e: self.search_var.set('搜尋') if not self.search_var.get() else None)
         entry.bind('<Return>', lambda e: self.refresh_table())
+        entry.bind('<KeyRelease>', self.on_search_typed)
+        self._search_job = None
         ttk.Button(top, text='搜尋',   command=self.refresh_table).pack(side='left', padx=5)
         ttk.Button(top, text='新增商品', command=self.open_add_dialog).pack(side='left', padx=5)
         ttk.Button(top, text='批次匯入', command=self.batch_import).pack(side='left', padx=5)
+        ttk.Button(top, text='批次調價', command=self.open_reprice_dialog).pack(side='left', padx=5)
         ttk.Button(top, text='匯出',   command=self.export_data).pack(side='left', padx=5)
         ttk.Button(top, text='關班',   command=self.on_close_shift).pack(side='left', padx=5)
+        if sync.shared_dir(self.repo.session()):
+            ttk.Button(top, text='分店彙整', command=self.open_head_office).pack(side='left', padx=5)
 
         # 欄位設定
         self.cols = [
             '廠商','關鍵字IP','編碼','商品名稱','數量','成本','點數價',
             '20洞價格','40洞價格','60洞價格','80洞價格','備註','商品連結'
         ]
-        self.tree = ttk.Treeview(
+        self.tree = VirtualTree(
             frame1, columns=self.cols, show='headings', selectmode='extended'
         )
         for c in self.cols:
@@ -107,23 +122,44 @@ class InventoryApp:
         self.menu.add_command(label='刪除',    command=self.delete_item)
         self.menu.add_command(label='抽賞結帳', command=self.checkout_item)
 
-        # —— 分頁 2：交易紀錄
+        # —— 分頁 2：交易紀錄、分頁 3：商品領取紀錄（第一次切換到該分頁時才建立）
+        self.notebook = notebook
+        self.logs_frame = self.receive_frame = None
         frame2 = ttk.Frame(notebook)
         notebook.add(frame2, text='交易紀錄')
-        self.logs_frame = logs.LogsFrame(frame2)
-        self.logs_frame.pack(fill='both', expand=True)
-
-        # —— 分頁 3：商品領取紀錄
         frame3 = ttk.Frame(notebook)
         notebook.add(frame3, text='商品領取紀錄')
-        self.receive_frame = receive.ReceiveFrame(frame3)
-        self.receive_frame.pack(fill='both', expand=True)
+        self.lazy_tabs = {
+            str(frame2): lambda: self._build_logs_tab(frame2),
+            str(frame3): lambda: self._build_receive_tab(frame3),
+        }
+        notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+
+        # 隱藏的效能診斷分頁
+        self.diag_frame = None
+        self.root.bind('<Control-Shift-D>', self.toggle_diagnostics)
+
+    def on_tab_changed(self, event):
+        build = self.lazy_tabs.pop(self.notebook.select(), None)
+        if build:
+            build()
+
+    def toggle_diagnostics(self, event=None):
+        if self.diag_frame is None:
+            self.diag_frame = diagnostics.DiagnosticsFrame(self.notebook)
+        if str(self.diag_frame) in self.notebook.tabs() and self.notebook.tab(self.diag_frame, 'state') != 'hidden':
+            self.notebook.hide(self.diag_frame)
+        else:
+            self.notebook.add(self.diag_frame, text='效能診斷')
+            self.notebook.select(self.diag_frame)
 
-        # 綁定結帳完成事件，自動刷新領取紀錄
-        self.root.bind('<<TransactionDone>>', lambda e: (
-            self.receive_frame.load_data(),
-            self.receive_frame.refresh()
-        ))
+    def _build_logs_tab(self, frame):
+        self.logs_frame = logs.LogsFrame(frame, self.repo)
+        self.logs_frame.pack(fill='both', expand=True)
+
+    def _build_receive_tab(self, frame):
+        self.receive_frame = receive.ReceiveFrame(frame, self.repo)
+        self.receive_frame.pack(fill='both', expand=True)
 
     def on_drag_select(self, event):
         row = self.tree.identify_row(event.y)
@@ -133,12 +169,29 @@ class InventoryApp:
     def refresh_table(self):
         kw = self.search_var.get().strip()
         if kw == '搜尋': kw = ''
-        self.tree.delete(*self.tree.get_children())
-        for idx, item in enumerate(self.data):
-            text = json.dumps(item, ensure_ascii=False)
-            if kw.lower() in text.lower():
-                vals = [item.get(c,'') for c in self.cols]
-                self.tree.insert('', 'end', iid=str(idx), values=vals)
+        with span('inventory.refresh_table') as s:
+            if kw:
+                if self.search_index is None:
+                    with span('inventory.search_index'):
+                        self.search_index = SearchIndex(self.data)
+                items = [self.by_id[pid] for pid in self.search_index.search(kw)]
+            else:
+                items = self.data
+            self.tree.set_rows((item['id'], self._row_values(item)) for item in items)
+            s.rows = len(items)
+
+    def on_search_typed(self, event=None):
+        # 邊打邊搜：停止輸入 150ms 後才查詢
+        if self._search_job:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(150, self.refresh_table)
+
+    def _reindex(self, items):
+        if self.search_index is not None:
+            for item in items:
+                self.search_index.update(item)
+    def _row_values(self, item):
+        return [item.get(c,'') for c in self.cols]
 
     def show_context_menu(self, event):
         iid = self.tree.identify_row(event.y)
@@ -173,14 +226,14 @@ class InventoryApp:
         if not self.editing:
             return
         self.finish_inline_edit()
-        row = int(self.current_row)
+        row = self.current_row
         col = self.current_col
         if direction == 'Left':  col = max(0, col-1)
         if direction == 'Right': col = min(len(self.cols)-1, col+1)
-        if direction == 'Up':    row = max(0, row-1)
-        if direction == 'Down':  row = min(len(self.data)-1, row+1)
+        if direction == 'Up':    row = self.tree.prev(row) or row
+        if direction == 'Down':  row = self.tree.next(row) or row
         self.current_col = col
-        self.start_inline_edit(str(row), f"#{col+1}")
+        self.start_inline_edit(row, f"#{col+1}")
 
     def start_inline_edit(self, row, col):
         x, y, w, h = self.tree.bbox(row, col)
@@ -210,8 +263,10 @@ class InventoryApp:
         self.inline_entry = None
         self.editing = False
         self.tree.set(row, col, new)
-        self.data[int(row)][self.cols[self.current_col]] = new
-        self.save_data()
+        item = self.by_id[row]
+        item[self.cols[self.current_col]] = new
+        self.repo.save_products([item])
+        self._reindex([item])
 
     def open_add_dialog(self):
         dlg = tk.Toplevel(self.root)
@@ -223,27 +278,23 @@ class InventoryApp:
             ent.grid(row=i, column=1, padx=5, pady=2)
             entries[c] = ent
 
+        rules = repricing.load_rules(self.store)
         def calc(e=None):
             try:
                 cost = float(entries['成本'].get())
-                dot  = int(cost * 1.2)
-                entries['點數價'].delete(0,'end'); entries['點數價'].insert(0,str(dot))
-                p20 = int(cost / 7)
-                entries['20洞價格'].delete(0,'end'); entries['20洞價格'].insert(0,str(p20))
-                for col_name, div in [('40洞價格',2),('60洞價格',3),('80洞價格',4)]:
-                    val = int((p20+100)/div)
-                    entries[col_name].delete(0,'end'); entries[col_name].insert(0,str(val))
-            except:
-                pass
+            except ValueError:
+                return
+            rule = pricing.rule_for(rules, entries['廠商'].get().strip())
+            for col_name, val in rule.prices(cost).items():
+                entries[col_name].delete(0,'end'); entries[col_name].insert(0,str(val))
 
         entries['成本'].bind('<FocusOut>', calc)
         btn = ttk.Button(dlg, text='確定', command=lambda: self._add_and_close(entries, dlg))
         btn.grid(row=len(self.cols), column=0, columnspan=2, pady=10)
 
     def _add_and_close(self, entries, dlg):
-        item = {c: entries[c].get().strip() for c in self.cols}
-        self.data.append(item)
-        self.save_data()
+        item, = self.repo.add_products([{c: entries[c].get().strip() for c in self.cols}])
+        self._reindex([item])
         self.refresh_table()
         dlg.destroy()
 
@@ -251,8 +302,7 @@ class InventoryApp:
         sel = self.tree.selection()
         if not sel:
             return
-        idx = int(sel[0])
-        item = self.data[idx]
+        item = self.by_id[sel[0]]
         dlg = tk.Toplevel(self.root)
         dlg.title('編輯商品')
         entries = {}
@@ -263,25 +313,23 @@ class InventoryApp:
             ent.grid(row=i, column=1, padx=5, pady=2)
             entries[c] = ent
 
-        btn = ttk.Button(dlg, text='儲存', command=lambda: self._save_and_close(idx, entries, dlg))
+        btn = ttk.Button(dlg, text='儲存', command=lambda: self._save_and_close(item, entries, dlg))
         btn.grid(row=len(self.cols), column=0, columnspan=2, pady=10)
 
-    def _save_and_close(self, idx, entries, dlg):
+    def _save_and_close(self, item, entries, dlg):
         for c in self.cols:
-            self.data[idx][c] = entries[c].get().strip()
-        self.save_data()
-        self.refresh_table()
+            item[c] = entries[c].get().strip()
+        self.repo.save_products([item])
+        self._reindex([item])
+        self.tree.update_row(item['id'], self._row_values(item))
         dlg.destroy()
 
     def delete_item(self):
         sels = self.tree.selection()
         if not sels:
             return
-        idx = int(sels[0])
         if messagebox.askyesno('刪除商品', '確定要刪除此商品？'):
-            self.data.pop(idx)
-            self.save_data()
-            self.refresh_table()
+            self._remove_items([sels[0]])
 
     def delete_selected(self, event=None):
         sels = self.tree.selection()
@@ -290,29 +338,26 @@ class InventoryApp:
         count = len(sels)
         if not messagebox.askyesno('刪除商品', f'確定要刪除選取的 {count} 筆商品？'):
             return
-        for i in sorted([int(x) for x in sels], reverse=True):
-            self.data.pop(i)
-        self.save_data()
-        self.refresh_table()
+        self._remove_items(sels)
+
+    def _remove_items(self, pids):
+        pids = set(pids)
+        self.repo.remove_products(pids)   # self.data / self.by_id 為同一份快取，就地更新
+        if self.search_index is not None:
+            for pid in pids:
+                self.search_index.remove(pid)
+        self.tree.delete_rows(pids)
 
     def checkout_item(self):
         # 取消自動填“已被抽走”，保留原有結帳流程
         sels = self.tree.selection()
         if not sels:
             return
-        idx = int(sels[0])
         popup = tk.Toplevel(self.root)
         import checkout
-        checkout.CheckoutApp(popup, idx)
+        checkout.CheckoutApp(popup, sels[0], self.repo)
         popup.wait_window()
-
-        # 結帳完成後，重新載入所有
-        self.load_data()
-        self.refresh_table()
-        self.logs_frame.load_all_logs()
-        self.logs_frame.refresh_logs()
-        self.receive_frame.load_data()
-        self.receive_frame.refresh()
+        # 新紀錄已由 events 發布給交易/領取分頁，各自只加入新增的那一筆
 
     def batch_import(self):
         path = filedialog.askopenfilename(
@@ -320,105 +365,171 @@ class InventoryApp:
         )
         if not path:
             return
-        wb = load_workbook(path, data_only=True)
-        ws = wb.active
-        imported = 0
-        for row in ws.iter_rows(min_row=3, values_only=True):
-            code = row[0] or ''
-            name = row[1] or ''
-            link = row[2] or ''
-            kw = (row[3] or '').split()[0] if row[3] else ''
-            cost_val = row[9] or row[8] or 0
-            cost = int(cost_val)
-            dot = int(cost * 1.2)
-            p20 = int(cost / 7)
-            p40 = int((p20+100)/2)
-            p60 = int((p20+100)/3)
-            p80 = int((p20+100)/4)
-            raw_qty = row[11]
-            qty = str(int(raw_qty)) if isinstance(raw_qty, (int, float)) else str(raw_qty or '')
-            item = {
-                '廠商':'良級懸賞','關鍵字IP':kw,'編碼':code,'商品名稱':name,
-                '數量':qty,'成本':str(cost),'點數價':str(dot),
-                '20洞價格':str(p20),'40洞價格':str(p40),
-                '60洞價格':str(p60),'80洞價格':str(p80),
-                '備註':'','商品連結':link
-            }
-            self.data.append(item)
-            imported += 1
-        self.save_data()
-        self.refresh_table()
-        messagebox.showinfo('匯入完成', f'已匯入 {imported} 筆資料')
+        rule = pricing.rule_for(repricing.load_rules(self.store), '良級懸賞')
+        # 讀檔與寫入在背景執行緒；進度視窗為強制回應，匯入期間不能編輯商品
+        def work(job):
+            with span('inventory.batch_import') as s:
+                result = importer.import_workbook(path, self.store, self.data, rule=rule, job=job)
+                s.rows = len(result['inserted']) + len(result['updated']) + result['skipped']
+            return result
+
+        def done(result):
+            inserted = result['inserted']
+            self.repo.adopt_products(inserted)
+            self._reindex(inserted + result['updated'])
+            self.refresh_table()
+            msg = (f"新增 {len(inserted)} 筆、更新 {len(result['updated'])} 筆、"
+                   f"未變動 {result['skipped']} 筆")
+            if result['cancelled']:
+                msg = '已取消，以下為取消前已匯入的部分：\n' + msg
+            if result['errors']:
+                msg += f"\n錯誤 {len(result['errors'])} 列：\n" + '\n'.join(
+                    f'第 {n} 列：{err}' for n, err in result['errors'][:10])
+            messagebox.showinfo('匯入完成', msg)
+        export.run_with_progress(self.root, '匯入', work, done)
+
+    def open_reprice_dialog(self):
+        # 批次調價：選擇廠商/關鍵字IP 與定價規則，先預覽差異再套用
+        rules = repricing.load_rules(self.store)
+        dlg = tk.Toplevel(self.root)
+        dlg.title('批次調價')
+        dlg.geometry('900x500')
+
+        top = ttk.Frame(dlg)
+        top.pack(fill='x', padx=10, pady=5)
+        vendors = sorted({item.get('廠商','') for item in self.data if item.get('廠商')})
+        vendor_var, keyword_var = tk.StringVar(value='全部'), tk.StringVar()
+        ttk.Label(top, text='廠商：').pack(side='left')
+        cb = ttk.Combobox(top, textvariable=vendor_var, values=['全部'] + vendors, state='readonly', width=14)
+        cb.pack(side='left')
+        ttk.Label(top, text='關鍵字IP：').pack(side='left', padx=(10,0))
+        ttk.Entry(top, textvariable=keyword_var, width=14).pack(side='left')
+
+        rule_box = ttk.LabelFrame(dlg, text='定價規則')
+        rule_box.pack(fill='x', padx=10, pady=5)
+        rule_vars = {k: tk.StringVar() for k in ('markup', 'base_divisor', 'offset')}
+        for text, key in (('點數價＝成本 ×', 'markup'), ('20洞＝成本 ÷', 'base_divisor'),
+                          ('40/60/80洞＝(20洞 ＋', 'offset')):
+            ttk.Label(rule_box, text=text).pack(side='left', padx=(10,2))
+            ttk.Entry(rule_box, textvariable=rule_vars[key], width=6).pack(side='left')
+        ttk.Label(rule_box, text=') ÷ 2/3/4').pack(side='left', padx=2)
+
+        def rule_key():
+            # 「全部」編輯的是預設規則（未個別設定的廠商）
+            return '*' if vendor_var.get() == '全部' else vendor_var.get()
+
+        def show_rule(event=None):
+            rule = pricing.rule_for(rules, rule_key())
+            rule_box.config(text='預設定價規則' if rule_key() == '*' else f'{rule_key()} 定價規則')
+            for k, var in rule_vars.items():
+                var.set(f'{getattr(rule, k):g}')
+        cb.bind('<<ComboboxSelected>>', show_rule)
+        show_rule()
+
+        cols = ('編碼', '商品名稱') + pricing.PRICE_FIELDS
+        tree = VirtualTree(dlg, columns=cols, show='headings')
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=200 if c == '商品名稱' else 100, anchor='center')
+        tree.pack(fill='both', expand=True, padx=10, pady=5)
+
+        bottom = ttk.Frame(dlg)
+        bottom.pack(fill='x', padx=10, pady=5)
+        summary = tk.StringVar(value='設定規則後按「預覽」')
+        ttk.Label(bottom, textvariable=summary).pack(side='left')
+        state = {'changes': []}
+
+        def run_preview():
+            try:
+                rules[rule_key()] = pricing.PriceRule(**{k: float(v.get()) for k, v in rule_vars.items()})
+            except ValueError:
+                messagebox.showwarning('錯誤', '規則須為數字', parent=dlg)
+                return
+            if rules[rule_key()].base_divisor <= 0:
+                messagebox.showwarning('錯誤', '20洞除數須大於 0', parent=dlg)
+                return
+            vendor = None if vendor_var.get() == '全部' else vendor_var.get()
+            result = repricing.preview(self.data, rules, vendor, keyword_var.get())
+            state['changes'] = result['changes']
+            tree.set_rows(
+                (item['id'], [item.get('編碼',''), item.get('商品名稱','')] +
+                 [f'{diff[f][0]} → {diff[f][1]}' if f in diff else '' for f in pricing.PRICE_FIELDS])
+                for item, diff in result['changes'])
+            summary.set(f"掃描 {result['scanned']} 筆，{len(result['changes'])} 筆將變更，"
+                        f"成本格式錯誤 {len(result['errors'])} 筆")
+
+        def run_apply():
+            if not state['changes']:
+                messagebox.showinfo('批次調價', '沒有需要變更的商品', parent=dlg)
+                return
+            if not messagebox.askyesno('批次調價', f"確定更新 {len(state['changes'])} 筆商品價格？", parent=dlg):
+                return
+            repricing.save_rules(self.store, rules)
+            n = repricing.apply(self.repo, state['changes'])
+            for item, _ in state['changes']:
+                self.tree.update_row(item['id'], self._row_values(item))
+            dlg.destroy()
+            messagebox.showinfo('批次調價', f'已更新 {n} 筆商品價格')
+
+        ttk.Button(bottom, text='套用', command=run_apply).pack(side='right', padx=5)
+        ttk.Button(bottom, text='預覽', command=run_preview).pack(side='right', padx=5)
 
     def export_data(self):
         path = filedialog.asksaveasfilename(
-            defaultextension='.json', filetypes=[('JSON','*.json')]
+            defaultextension='.json', filetypes=[('JSON','*.json')] + export.FILETYPES[:2]
         )
         if not path:
             return
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-        messagebox.showinfo('匯出完成', f'已匯出到 {path}')
+        # 在主執行緒複製一份（之後的編輯不影響匯出內容），寫檔在背景執行
+        rows = [dict(item) for item in self.data]
+        def work(job):
+            with span('inventory.export_data', rows=len(rows)):
+                return export.write_records(path, rows, self.cols, job, len(rows), sheet='庫存')
+        export.run_with_progress(self.root, '匯出', work,
+                                 lambda n: messagebox.showinfo('匯出完成', f'已匯出 {n} 筆到 {path}'))
+
+    def poll_write_errors(self):
+        # 背景寫檔失敗時提示（寫入會自動重試，關班時仍失敗則不關閉）
+        for table, error in storage.write_errors():
+            messagebox.showwarning('存檔失敗', f'{table} 寫入失敗：{error}\n'
+                                   '系統會自動重試；請確認磁碟空間足夠、檔案沒有被其他程式開啟。')
+        self.root.after(POLL_MS, self.poll_write_errors)
+
+    def open_head_office(self):
+        import headoffice
+        headoffice.HeadOfficeView(self.root, self.store, self.repo.session())
 
     def on_close_shift(self):
         if not messagebox.askyesno('關班確認', '關班後將匯出今日交易與領取報表並關閉系統，是否繼續？'):
             return
         today = datetime.now().strftime('%Y-%m-%d')
         closing_dir = os.path.join(DATA_DIR, 'closing')
-        os.makedirs(closing_dir, exist_ok=True)
-
-        # 匯出交易日誌
-        logs_file = logs.LOG_FILE
-        logs_csv  = os.path.join(closing_dir, f'logs_{today}.csv')
-        with open(logs_file, 'r', encoding='utf-8') as f_in, \
-             open(logs_csv, 'w', newline='', encoding='utf-8') as f_out:
-            writer = csv.writer(f_out)
-            writer.writerow(['time','branch','staff','member','item','hole','抽數','大賞','小賞','cash','transfer','points','total','reason'])
-            for line in f_in:
-                try:
-                    rec = json.loads(line)
-                except:
-                    continue
-                if rec.get('time','')[:10] == today:
-                    writer.writerow([rec.get(k,'') for k in [
-                        'time','branch','staff','member','item','hole','抽數','大賞','小賞','cash','transfer','points','total','reason'
-                    ]])
-
-        # 匯出領取紀錄
-        recv_file = receive.RECEIVE_FILE
-        recv_csv  = os.path.join(closing_dir, f'receive_{today}.csv')
-        with open(recv_file, 'r', encoding='utf-8') as f_in, \
-             open(recv_csv, 'w', newline='', encoding='utf-8') as f_out:
-            writer = csv.writer(f_out)
-            writer.writerow(['日期','member','item','qty','expire','free','reason','已領取'])
-            text = f_in.read().strip()
-            all_data = []
-            if text.startswith('['):
-                try:
-                    all_data = json.loads(text)
-                except:
-                    all_data = []
-            else:
-                for line in text.splitlines():
+        start_cash = report.load_start_cash(self.repo.session())
+        shared = sync.shared_dir(self.repo.session())
+
+        def work(job):
+            with span('inventory.close_shift'):
+                # 單次掃描今日交易與領取紀錄，產生原本的 CSV 與彙總報表
+                job.progress(text='彙總今日紀錄…')
+                result = report.closing_report(today, start_cash, self.store)
+                report.write_closing_csvs(result, closing_dir, job)
+                # 背景排隊中的商品異動全部寫入檔案後才關閉
+                job.progress(text='寫入尚未存檔的異動…')
+                storage.flush()
+                if shared:
+                    # 送出今日異動到同步資料夾；資料夾暫時無法存取時留到下次同步，不影響關班
+                    job.progress(text='送出分店異動…')
                     try:
-                        all_data.append(json.loads(line))
-                    except:
-                        continue
-            for rec in all_data:
-                if rec.get('日期','')[:10] == today:
-                    writer.writerow([
-                        rec.get('日期',''),
-                        rec.get('member',''),
-                        rec.get('item',''),
-                        rec.get('inventory_qty', rec.get('qty','')),
-                        rec.get('expire', rec.get('到期日','')),
-                        rec.get('free',''),
-                        rec.get('reason',''),
-                        '✔' if rec.get('已領取') else ''
-                    ])
-
-        messagebox.showinfo('完成', f'已匯出今日報表至 {closing_dir}，系統即將關閉。')
-        self.root.destroy()
+                        sync.push(self.store, shared, self.repo.session())
+                    except OSError as e:
+                        print(f'[sync] 關班送出失敗：{e}')
+            return result
+
+        def done(result):
+            messagebox.showinfo('完成', f'{report.summary_text(result)}\n\n已匯出今日報表至 {closing_dir}，系統即將關閉。')
+            self.root.destroy()
+        # 取消或失敗時不關閉系統
+        export.run_with_progress(self.root, '關班', work, done)
 
 if __name__ == '__main__':
     root = tk.Tk()
@@ -0,0 +1,141 @@
+# journal.py｜良級懸賞 POS 系統 — 異動日誌（只附加）＋快照壓縮
+import os
+import json
+import threading
+from profiling import timed
+from recordio import iter_lines
+
+# 日誌累積到這個筆數後，背景將其併入快照
+COMPACT_EVERY = 500
+
+def read_events(path):
+    # 逐行讀取；略過標頭與寫到一半中斷的最後一行
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(iter_lines(f))
+
+def apply_events(rows, events):
+    # 依 id 重播；insert 視同 upsert，讓重播具冪等性（壓縮中斷後重播不會重複）
+    by_id = {r['id']: r for r in rows}
+    for ev in events:
+        op, rid = ev.get('op'), ev.get('id')
+        if op in ('insert', 'update'):
+            by_id[rid] = ev['rec']
+        elif op == 'delete':
+            by_id.pop(rid, None)
+    return list(by_id.values())
+
+class JournaledTable:
+    # 快照（完整資料）＋日誌（自快照後的異動）；每次異動只附加一行
+    # fold(events)：將一批異動併入快照，快照可只改寫受影響的部分（例如分段檔）
+    # header：新建日誌檔時寫在第一行的格式標頭（recordio.header）
+    def __init__(self, path, read_snapshot, write_snapshot, fold=None, compact_every=COMPACT_EVERY, header=None):
+        self.path           = path
+        self.pending        = self.path + '.compacting'
+        self.previous       = self.path + '.prev'   # 上次併入快照的日誌，留給追蹤中的讀取端讀完
+        self.read_snapshot  = read_snapshot
+        self.write_snapshot = write_snapshot
+        self.fold           = fold or (lambda events: write_snapshot(apply_events(read_snapshot(), events)))
+        self.compact_every  = compact_every
+        self.header         = header
+        self.lock           = threading.RLock()
+        self.count          = None
+        self.generation     = 0   # 整份覆寫次數
+        self.folds          = 0   # 併入快照的次數；鎖外讀快照期間有變動時重讀
+        self.compacting     = False
+
+    def load(self, read=None):
+        # read：只讀部分快照（例如某日期區段）時傳入，日誌仍全部重播
+        return self.snapshot(lambda events: apply_events((read or self.read_snapshot)(), events))
+
+    def snapshot(self, fn, tries=3):
+        # fn(events)：讀快照並套用日誌事件。日誌在鎖內讀，快照在鎖外讀（不擋住新增）；
+        # 期間有併入或覆寫（快照檔被換掉）時重讀，最後一次改在鎖內執行
+        for attempt in range(tries):
+            with self.lock:
+                pending = read_events(self.pending)
+                events  = read_events(self.path)
+                self.count = len(events)
+                stamp = (self.generation, self.folds)
+                if attempt == tries - 1:
+                    result = fn(pending + events)
+                    break
+            try:
+                result = fn(pending + events)
+            except (OSError, ValueError, KeyError, TypeError):
+                # 讀到一半快照被換掉（位移對不上）；沒有變動則是真的錯誤
+                with self.lock:
+                    if (self.generation, self.folds) == stamp:
+                        raise
+                continue
+            with self.lock:
+                if (self.generation, self.folds) == stamp:
+                    break
+        if pending or self.count >= self.compact_every:
+            self.compact_async()
+        return result
+
+    def append(self, events):
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if self.header and f.tell() == 0:
+                    f.write(json.dumps(self.header, ensure_ascii=False) + '\n')
+                for ev in events:
+                    f.write(json.dumps(ev, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if self.count is None:
+                self.count = len(read_events(self.path))
+            else:
+                self.count += len(events)
+            due = self.count >= self.compact_every
+        if due:
+            self.compact_async()
+
+    def replace(self, rows):
+        # 整份覆寫：直接寫新快照並清空日誌
+        with self.lock:
+            self.generation += 1
+            self.write_snapshot(rows)
+            for p in (self.path, self.pending, self.previous):
+                if os.path.exists(p):
+                    os.remove(p)
+            self.count = 0
+
+    def compact_async(self):
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    @timed('journal.compact')
+    def compact(self):
+        # 先把日誌改名為 .compacting（新異動寫入新日誌），再併入快照
+        with self.lock:
+            if self.compacting:
+                return
+            if not os.path.exists(self.pending):
+                if not os.path.exists(self.path):
+                    return
+                os.replace(self.path, self.pending)
+                self.count = 0
+            self.compacting = True
+            generation = self.generation
+        try:
+            events = read_events(self.pending)
+            with self.lock:
+                if generation != self.generation:
+                    return  # 期間已被整份覆寫，放棄這次結果
+                self.fold(events)
+                self.folds += 1
+                os.replace(self.pending, self.previous)
+        finally:
+            self.compacting = False
+
+    def stamp(self):
+        stamp = []
+        for p in (self.pending, self.path):
+            try:
+                st = os.stat(p)
+                stamp += [st.st_size, st.st_mtime]
+            except OSError:
+                stamp += [None, None]
+        return stamp
@@ -2,92 +2,282 @@
 import os
 import json
 import re
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
+import storage
+import events
+import records
+import pricing
+from repository import Repository
+from table import VirtualTree
+from datepicker import date_entry
+from profiling import timed
+import members
+import export
+import report
+from tail import POLL_MS
+from writer import WriteBehind
+from totals import DayTotals, SelectionSum
 
-try:
-    from tkcalendar import DateEntry
-except ImportError:
-    import subprocess, sys
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'tkcalendar'])
-    from tkcalendar import DateEntry
-
-BASE_DIR = os.path.dirname(__file__)
-LOG_DIR = os.path.join(BASE_DIR, 'logs')
-LOG_FILE = os.path.join(LOG_DIR, 'receive.json')
-INVENTORY_FILE = os.path.join(LOG_DIR, 'inventory.json')
-
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# 查詢最後單價
-def get_last_unit_price(idx, hole=None):
-    if not os.path.exists(LOG_FILE):
-        return None
-    with open(LOG_FILE, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    for line in reversed(lines):
-        try:
-            rec = json.loads(line)
-        except:
-            continue
-        if rec.get('idx') != idx:
-            continue
-        if hole is not None and rec.get('hole') != hole:
+LOG_DIR = storage.DATA_DIR
+
+PRICE_INDEX_FILE = os.path.join(LOG_DIR, 'price_index.json')
+PRICE_INDEX_VERSION = 2
+PRICE_HISTORY  = 3    # 每個 key 保留最近幾筆 [id, 單價]，最新一筆被刪除時退回前一筆
+CATCH_UP_EVERY = 60   # 查詢時距上次補讀超過這麼多秒，背景補讀其他收銀機新增的交易
+
+# 最後單價索引：'pid:hole' → [[id, unit_price], ...]（新到舊），hole 為 '*' 時對應任意洞數。
+# 本程式的新增/修改/刪除經 storage 的異動通知直接套用並排入背景存檔；
+# 水位 _price_applied 為已套用的最大交易 id，載入後只在背景補讀水位之後的交易
+_price_index   = None
+_price_ids     = {}      # id → 引用它的 key，刪除時用
+_price_applied = ''
+_price_deleted = set()   # 本次執行刪除的 id，補讀時不再加回
+_price_more    = set()   # 還有比保留的幾筆更早的交易的 key；保留的都被刪除時才需要回頭找
+_price_lock    = threading.RLock()
+_price_writer  = None
+_price_thread  = None
+_price_checked = 0.0
+_price_gen     = 0       # 整份重建時加一，進行中的補讀結果作廢
+
+def _price_key(pid, hole=None):
+    return f"{pid}:{'*' if hole is None else hole}"
+
+def _index_record(rec):
+    # 同一個 key 只保留 id 最大的幾筆；重複套用同一筆結果相同
+    global _price_applied
+    rid = rec.get('id') or ''
+    if rid > _price_applied:
+        _price_applied = rid
+    if not rec.get('pid') or rec.get('unit_price') is None or rid in _price_deleted:
+        return
+    keys = [_price_key(rec['pid'])]
+    if rec.get('hole') is not None:
+        keys.append(_price_key(rec['pid'], rec['hole']))
+    for key in keys:
+        history = [h for h in _price_index.get(key, []) if h[0] != rid]
+        i = next((i for i, h in enumerate(history) if h[0] < rid), len(history))
+        if i >= PRICE_HISTORY:
+            _price_more.add(key)
             continue
-        return rec.get('unit_price')
-    return None
+        history.insert(i, [rid, rec['unit_price']])
+        for old_id, _ in history[PRICE_HISTORY:]:
+            _unlink(old_id, key)
+            _price_more.add(key)
+        _price_index[key] = history[:PRICE_HISTORY]
+        _price_ids.setdefault(rid, set()).add(key)
+
+def _unlink(rid, key):
+    keys = _price_ids.get(rid)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del _price_ids[rid]
+
+def _unindex(rid):
+    # 只重算這筆交易所在的 key；回傳保留的幾筆都已刪除、但還有更早交易的 key
+    _price_deleted.add(rid)
+    emptied = []
+    for key in _price_ids.pop(rid, ()):
+        history = [h for h in _price_index.get(key, []) if h[0] != rid]
+        if history:
+            _price_index[key] = history
+        else:
+            _price_index.pop(key, None)
+            if key in _price_more:
+                emptied.append(key)
+    return emptied
+
+def _refill(keys):
+    # 背景執行緒：由新到舊逐月讀（只開該月分段），找到這些 key 最近的其餘交易即停止
+    wanted = set(keys)
+    try:
+        store = storage.get_backend()
+        for month in reversed(store.months('logs')):
+            rows = store.query('logs', month + '-01', month + '-31')
+            with _price_lock:
+                for rec in rows:
+                    _index_record(rec)
+                wanted = {k for k in wanted if k not in _price_index}
+            if not wanted:
+                break
+        with _price_lock:
+            _price_more.difference_update(wanted)   # 找遍仍沒有：已無其他交易
+        _save_price_index()
+    except Exception as e:
+        print(f'[logs] 最後單價索引回補失敗：{e}')
+
+def _write_price_index():
+    # 背景執行緒：複製後在鎖外序列化
+    with _price_lock:
+        data = {'version': PRICE_INDEX_VERSION, 'applied': _price_applied, 'more': sorted(_price_more),
+                'prices': {k: [list(h) for h in v] for k, v in _price_index.items()}}
+    tmp = PRICE_INDEX_FILE + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, PRICE_INDEX_FILE)
+
+def _save_price_index():
+    global _price_writer
+    if _price_writer is None:
+        _price_writer = WriteBehind()
+    _price_writer.submit('price_index', _write_price_index)
+
+def _load_price_index():
+    # 只讀索引檔；檔案遺失或為舊版時從空索引開始，由背景執行緒從頭建立
+    global _price_index, _price_ids, _price_applied, _price_more
+    with _price_lock:
+        if _price_index is not None:
+            return
+        try:
+            with open(PRICE_INDEX_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != PRICE_INDEX_VERSION:
+                raise ValueError('舊版索引')
+            _price_index, _price_applied = data['prices'], data.get('applied', '')
+            _price_more = set(data['more'])
+        except (OSError, ValueError, KeyError):
+            _price_index, _price_applied, _price_more = {}, '', set()
+        _price_ids = {}
+        for key, history in _price_index.items():
+            for rid, _ in history:
+                _price_ids.setdefault(rid, set()).add(key)
+    _catch_up()
+
+def _catch_up():
+    # 背景讀取水位之後的交易（水位為空時即整份重建）；回傳執行緒，已在執行時回傳 None
+    global _price_thread, _price_checked
+    with _price_lock:
+        _price_checked = time.monotonic()
+        if _price_thread is not None and _price_thread.is_alive():
+            return None
+        _price_thread = threading.Thread(target=_run_catch_up, name='price-index', daemon=True)
+        _price_thread.start()
+        return _price_thread
+
+@timed('logs.price_index.catch_up', rows=lambda result: result)
+def _run_catch_up():
+    try:
+        while True:
+            with _price_lock:
+                since, gen = _price_applied, _price_gen
+            day = f'{since[:4]}-{since[4:6]}-{since[6:8]}' if since[:8].isdigit() else None
+            rows = storage.get_backend().query('logs', day)
+            with _price_lock:
+                if gen != _price_gen:
+                    continue   # 讀取期間索引被重建，依新的水位重讀
+                # 水位當天整天重新套用（重複套用結果相同），其他收銀機時鐘稍慢寫入的 id 也不會漏掉
+                n = sum((rec.get('id') or '') > since for rec in rows)
+                for rec in rows:
+                    _index_record(rec)
+            if n or not since:
+                _save_price_index()
+            return n
+    except Exception as e:
+        print(f'[logs] 最後單價索引補讀失敗：{e}')
+        return 0
+
+def _on_logs_changed(table, events):
+    # storage 異動通知（在寫入的執行緒、storage 的鎖內執行）：只套用這幾筆
+    if _price_index is None:
+        _load_price_index()
+    emptied = []
+    with _price_lock:
+        for ev in events:
+            if ev.get('op') == 'delete':
+                emptied += _unindex(ev.get('id'))
+            elif ev.get('rec'):
+                _index_record(ev['rec'])
+    _save_price_index()
+    if emptied:
+        threading.Thread(target=_refill, args=(emptied,), name='price-refill', daemon=True).start()
+
+storage.add_feed(_on_logs_changed, ('logs',))
+
+def rebuild_price_index():
+    # 交易紀錄被整批改寫後（例如商品參照搬移）在背景從頭重建；回傳執行緒
+    global _price_index, _price_ids, _price_applied, _price_more, _price_gen
+    with _price_lock:
+        _price_index, _price_ids, _price_applied, _price_more = {}, {}, '', set()
+        _price_gen += 1
+    return _catch_up()
+
+# 查詢最後單價（O(1)，不讀取交易紀錄；補讀一律在背景執行緒）
+def get_last_unit_price(pid, hole=None):
+    if _price_index is None:
+        _load_price_index()
+    elif time.monotonic() - _price_checked > CATCH_UP_EVERY:
+        _catch_up()
+    history = _price_index.get(_price_key(pid, hole))
+    return history[0][1] if history else None
 
 class LogsFrame(ttk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, repo=None):
         super().__init__(master)
         self.pack(fill='both', expand=True)
-        self.all_logs = []
+        self.logs = []   # 目前查詢區段內的紀錄
+        self.repo = repo or Repository()
+        self.store = self.repo.store
         self.member_var = tk.StringVar()
-        self.load_all_logs()
 
         today = datetime.now().strftime('%Y-%m-%d')
         self.start_var = tk.StringVar(value=today)
         self.end_var = tk.StringVar(value=today)
+        self.selected = SelectionSum()
+        self._drag = None            # 滑鼠選取中：(起點列, 目前列)
+        self._mouse_select = False   # 按下到放開之間，加總由點選/拖曳的增減更新
+        # 每日合計：背景執行緒建立後由 poll_live 接手，之後依異動增減
+        self.totals = None
+        self._totals_built = None   # (世代, DayTotals)，背景執行緒寫入
+        self._totals_gen = 0
+        self._totals_building = False
+        self._totals_dirty = False  # 計算期間有異動
+        self._before = {}           # 本視窗修改/刪除前的紀錄，日誌事件回來時用來扣回舊金額
 
+        # 追蹤其他視窗/收銀機寫入的交易（只讀新附加的異動）
+        self.live = self.store.watch('logs')
         self.build_ui()
         self.refresh_logs()
+        self.rebuild_totals()
+        self._live_job = self.after(POLL_MS, self.poll_live)
+        for var in (self.start_var, self.end_var):
+            var.trace_add('write', lambda *a: self.update_range())
 
         master.bind('<Return>', lambda e: self.refresh_logs())
         self.tree.bind('<Double-1>', self.open_detail)
-        self.tree.bind('<<TreeviewSelect>>', lambda e: self.update_sum())
+        self.tree.bind('<<TreeviewSelect>>', lambda e: self._mouse_select or self.update_sum())
         self.tree.bind('<ButtonPress-1>', self.on_tree_click)
         self.tree.bind('<B1-Motion>', self.on_tree_drag)
+        self.tree.bind('<ButtonRelease-1>', self.on_tree_release)
         self.tree.bind('<Delete>', self.delete_selected)
-
-    def load_all_logs(self):
-        self.all_logs.clear()
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        self.all_logs.append(json.loads(line))
-                    except:
-                        continue
+        unsubscribe = events.subscribe(events.TRANSACTION_ADDED, self.on_transaction_added)
+        self.bind('<Destroy>', lambda e: (unsubscribe(), self.after_cancel(self._live_job)) if e.widget is self else None)
 
     def build_ui(self):
         top = ttk.Frame(self)
         top.pack(fill='x', pady=5)
         ttk.Label(top, text='起始：').pack(side='left')
-        self.start_cb = DateEntry(top, textvariable=self.start_var, date_pattern='yyyy-MM-dd', width=12)
+        self.start_cb = date_entry(top, textvariable=self.start_var, date_pattern='yyyy-MM-dd', width=12)
         self.start_cb.pack(side='left', padx=5)
         ttk.Label(top, text='結束：').pack(side='left')
-        self.end_cb = DateEntry(top, textvariable=self.end_var, date_pattern='yyyy-MM-dd', width=12)
+        self.end_cb = date_entry(top, textvariable=self.end_var, date_pattern='yyyy-MM-dd', width=12)
         self.end_cb.pack(side='left', padx=5)
         ttk.Label(top, text='會員ID：').pack(side='left', padx=(10,0))
         ttk.Entry(top, textvariable=self.member_var, width=10).pack(side='left')
         ttk.Button(top, text='查詢', command=self.refresh_logs).pack(side='left', padx=10)
+        ttk.Button(top, text='會員紀錄', command=self.open_member_history).pack(side='left')
+        ttk.Button(top, text='匯出', command=self.export_range).pack(side='left', padx=5)
 
         self.sum_var = tk.StringVar(value='應收加總：0')
         ttk.Label(top, textvariable=self.sum_var, foreground='blue').pack(side='right', padx=10)
+        self.range_var = tk.StringVar(value='期間合計：計算中…')
+        ttk.Label(self, textvariable=self.range_var).pack(anchor='e', padx=10)
 
         cols = ('time','member','item','mode','due')
-        self.tree = ttk.Treeview(self, columns=cols, show='headings', height=15)
+        self.tree = VirtualTree(self, columns=cols, show='headings', height=15)
         headings = ['日期','會員ID','商品','抽賞方式','此單應收']
         widths = [120,100,200,140,100]
         for c,h,w in zip(cols, headings, widths):
@@ -97,60 +287,247 @@ class LogsFrame(ttk.Frame):
 
     def on_tree_click(self, event):
         row = self.tree.identify_row(event.y)
+        self._mouse_select = True
+        self.selected.clear()
         if row:
-            self._drag_sel = {row}
-            self.tree.selection_set(self._drag_sel)
+            self._drag = (row, row)
+            self.tree.selection_set(row)
+            self.selected.add([row], self._due_of)
         else:
-            self._drag_sel = set()
+            self._drag = None
             self.tree.selection_remove(self.tree.selection())
-        self.update_sum()
+        self._show_sum()
 
     def on_tree_drag(self, event):
+        # 選取起點到目前列；只加減上一個位置與目前位置之間進出範圍的列
         row = self.tree.identify_row(event.y)
-        if row and hasattr(self, '_drag_sel') and row not in self._drag_sel:
-            self._drag_sel.add(row)
-            self.tree.selection_set(tuple(self._drag_sel))
+        if not row or not self._drag or row == self._drag[1]:
+            return
+        anchor, last = self._drag
+        a, old, new = (self.tree.row_index(iid) for iid in (anchor, last, row))
+        if None in (a, old, new):   # 拖曳中列被移除（其他視窗的異動）
+            self._drag = None
+            return
+        added, removed = [], []
+        lo = min(old, new)
+        for i, iid in enumerate(self.tree.row_ids(lo, max(old, new) + 1), lo):
+            was, now = min(a, old) <= i <= max(a, old), min(a, new) <= i <= max(a, new)
+            if now and not was:
+                added.append(iid)
+            elif was and not now:
+                removed.append(iid)
+        self._drag = (anchor, row)
+        if removed:
+            self.tree.selection_remove(removed)
+            self.selected.remove(removed)
+        if added:
+            self.tree.selection_add(added)
+            self.selected.add(added, self._due_of)
+        self._show_sum()
+
+    def on_tree_release(self, event):
+        # 放開後比對一次整份選取（Shift/Ctrl 點選由 Treeview 預設行為改變選取）
+        self._mouse_select = False
+        self._drag = None
         self.update_sum()
 
+    @timed('logs.refresh_logs', rows=lambda result, self: len(self.logs))
     def refresh_logs(self):
         start, end = self.start_var.get(), self.end_var.get()
         mem = self.member_var.get().strip()
-        self.tree.delete(*self.tree.get_children())
-        for idx, rec in enumerate(self.all_logs):
-            date = rec.get('time','')[:10]
-            if not (start <= date <= end):
-                continue
-            if mem and rec.get('member','') != mem:
-                continue
-            hole, draws = rec.get('hole',''), rec.get('抽數','')
-            mode_str = f"{hole}洞 x {draws}" if hole and draws else ''
-            due_str = rec.get('due','')
-            self.tree.insert('', 'end', iid=str(idx), values=(date, rec.get('member',''), rec.get('item',''), mode_str, due_str))
-        self.update_sum()
+        # 由儲存層依日期查詢，只讀取涵蓋的月份分段；之後的異動由 poll_live 接續
+        self.skip_pending()
+        self.logs = records.compact('logs', self.store.query('logs', start, end, mem or None))
+        self.tree.set_rows((rec['id'], self._row_values(rec)) for rec in self.logs)
+        self.update_sum(changed=True)
+
+    def skip_pending(self):
+        # 重新查詢前：尚未輪詢到的異動先計入每日合計（列表由查詢重新載入），再讓追蹤跳到目前位置
+        try:
+            reset, changes = self.live.poll()
+        except OSError:
+            reset, changes = True, []
+        if reset:
+            self.rebuild_totals()   # 無法得知跳過了哪些異動，重新計算
+        elif changes:
+            self.totals_changed(changes)
+        self.live.sync()
 
-    def update_sum(self):
-        total = 0
-        for iid in self.tree.selection():
-            val = self.tree.set(iid, 'due')
+    def export_range(self):
+        # 匯出起訖日期內所有分店的交易（有填會員ID時只匯出該會員），逐月讀取、背景寫檔
+        start, end = self.start_var.get(), self.end_var.get()
+        mem = self.member_var.get().strip() or None
+        try:
+            months = list(export.month_ranges(start, end))
+        except ValueError:
+            messagebox.showwarning('匯出', '日期格式應為 YYYY-MM-DD', parent=self)
+            return
+        path = filedialog.asksaveasfilename(
+            parent=self, initialfile=f'logs_{start}_{end}', defaultextension='.csv', filetypes=export.FILETYPES)
+        if not path:
+            return
+        total = self.totals.range(start, end)['count'] if self.totals and not mem else None
+        def work(job):
+            rows = export.iter_query(self.store, 'logs', start, end, job, member=mem)
+            return export.write_records(path, rows, report.LOG_COLUMNS + ['due'], job, total, sheet='交易紀錄')
+        export.run_with_progress(self, '匯出交易紀錄', work,
+                                 lambda n: messagebox.showinfo('匯出完成', f'已匯出 {n} 筆（{len(months)} 個月）到 {path}', parent=self))
+
+    def open_member_history(self):
+        # 優先用選取的紀錄的會員，否則用篩選欄的會員ID
+        sel = self.tree.selection()
+        member = self.tree.set(sel[0], 'member') if sel else self.member_var.get()
+        members.open_history(self, self.store, member)
+
+    def _matches(self, rec, start, end, mem):
+        date = rec.get('time','')[:10]
+        if not (start <= date <= end):
+            return False
+        if mem and rec.get('member','') != mem:
+            return False
+        return True
+
+    def on_transaction_added(self, rec):
+        # 結帳完成只加入這一筆，不重新載入檔案
+        if self._matches(rec, self.start_var.get(), self.end_var.get(), self.member_var.get().strip()):
+            rec = records.make('logs', rec)
+            self.logs.append(rec)
+            self.tree.insert_row(rec['id'], self._row_values(rec))
+        # 每日合計由日誌事件（poll_live）加入，這裡不重複計入
+
+    def poll_live(self):
+        try:
+            reset, changes = self.live.poll()
+        except OSError:
+            reset, changes = False, []
+        if reset:
+            self.refresh_logs()
+            self.rebuild_totals()   # 沒有事件可套用（整份覆寫或落後太多），重新計算
+        elif changes:
+            self.apply_changes(changes)
+        self.adopt_totals()
+        self._live_job = self.after(POLL_MS, self.poll_live)
+
+    # —— 每日合計
+    def rebuild_totals(self):
+        # 在背景執行緒取得每日合計（JSON 取分段 manifest 記錄的合計、只重算日誌未併入的月份；
+        # SQLite 依日期分組加總），不佔用 Tk 主執行緒；完成後由 adopt_totals 接手
+        self._totals_gen += 1
+        self._totals_building = True
+        self._totals_dirty = False
+        self._before = {}   # 重算結果已含本視窗的修改
+        gen = self._totals_gen
+        def run():
             try:
-                total += int(val)
-            except:
-                continue
-        self.sum_var.set(f'應收加總：{total}')
+                self._totals_built = (gen, DayTotals.from_days(self.store.day_totals('logs')))
+            except Exception as e:
+                print(f'[logs] 每日合計計算失敗：{e}')
+        threading.Thread(target=run, name='logs-totals', daemon=True).start()
+
+    def adopt_totals(self):
+        built, self._totals_built = self._totals_built, None
+        if not built or built[0] != self._totals_gen:
+            return
+        if self._totals_dirty:
+            self.rebuild_totals()   # 計算期間有異動，不確定是否已含在結果內
+            return
+        self.totals = built[1]
+        self._totals_building = False
+        self.update_range()
+
+    def totals_changed(self, changes):
+        # 依日誌事件增減每日合計；insert 必為新紀錄，update/delete 需要舊金額：
+        # 本視窗改過的取 _before，其餘取目前查詢結果；都沒有時整份重算
+        if self._totals_building:
+            self._totals_dirty = True
+        if self.totals is None:
+            return
+        current = {r['id']: r for r in self.logs}
+        for ev in changes:
+            op, rid = ev.get('op'), ev.get('id')
+            if op != 'insert':
+                old = self._before.pop(rid, None) or current.get(rid)
+                if old is None:
+                    self.totals = None
+                    self.range_var.set('期間合計：計算中…')
+                    self.rebuild_totals()
+                    return
+                self.totals.remove(old)
+            if op in ('insert', 'update') and ev.get('rec'):
+                self.totals.add(ev['rec'])
+                current[rid] = ev['rec']   # 同一批內同一筆再被修改時，以這次的內容為舊金額
+            else:
+                current.pop(rid, None)
+        self.update_range()
+
+    def update_range(self):
+        if self.totals is None:
+            return
+        t = self.totals.range(self.start_var.get(), self.end_var.get())
+        self.range_var.set(f"期間合計：{t['count']} 筆　應收 {t['due']}　現金 {t['cash']}"
+                           f"　匯款 {t['transfer']}　點數 {t['points']}")
+
+    def apply_changes(self, changes):
+        # changes：日誌事件 {op, id, rec}；依 id 套用，自己寫入的異動再套用一次結果相同
+        self.totals_changed(changes)
+        start, end, mem = self.start_var.get(), self.end_var.get(), self.member_var.get().strip()
+        pos = {r['id']: i for i, r in enumerate(self.logs)}
+        removed = set()
+        for ev in changes:
+            rid, rec = ev.get('id'), ev.get('rec') if ev.get('op') in ('insert', 'update') else None
+            if rec is not None and self._matches(rec, start, end, mem):
+                rec = records.make('logs', rec)
+                removed.discard(rid)
+                if rid in pos:
+                    self.logs[pos[rid]] = rec
+                    self.tree.update_row(rid, self._row_values(rec))
+                else:
+                    pos[rid] = len(self.logs)
+                    self.logs.append(rec)
+                    self.tree.insert_row(rid, self._row_values(rec))
+            elif rid in pos:
+                removed.add(rid)
+        if removed:
+            self.logs = [r for r in self.logs if r['id'] not in removed]
+            self.tree.delete_rows(removed)
+        self.update_sum(changed=True)
+
+    def _row_values(self, rec):
+        hole, draws = rec.get('hole',''), rec.get('抽數','')
+        mode_str = f"{hole}洞 x {draws}" if hole and draws else ''
+        return (rec.get('time','')[:10], rec.get('member',''), rec.get('item',''), mode_str, rec.get('due',''))
+
+    @timed('logs.update_sum')
+    def update_sum(self, changed=False):
+        # 只計算新選取/取消選取的列（值取自 VirtualTree 保存的資料列，不逐列呼叫 Tk）；
+        # changed：列的內容變了，整份選取重新計算
+        if changed:
+            self.selected.clear()
+        self.selected.update(self.tree.selection(), self._due_of)
+        self._show_sum()
+
+    def _show_sum(self):
+        self.sum_var.set(f'應收加總：{self.selected.total}')
+
+    def _due_of(self, iid):
+        values = self.tree.row_values(iid)
+        return values[4] if values else 0
 
     def delete_selected(self, event=None):
         sel = self.tree.selection()
         if sel and messagebox.askyesno('刪除確認','確定刪除此筆紀錄？'):
-            self.all_logs.pop(int(sel[0]))
-            self.save_all_logs()
-            self.refresh_logs()
+            self._before[sel[0]] = next((r for r in self.logs if r['id'] == sel[0]), None)
+            self.logs = [r for r in self.logs if r['id'] != sel[0]]
+            self.store.delete('logs', [sel[0]])   # 最後單價索引只重算這筆所在的 key
+            self.tree.delete_rows([sel[0]])
+            self.update_sum(changed=True)
 
+    @timed('logs.open_detail')
     def open_detail(self, event):
         sel = self.tree.selection()
         if not sel:
             return
-        idx = int(sel[0])
-        rec = self.all_logs[idx]
+        rec = next(r for r in self.logs if r['id'] == sel[0])
         detail = tk.Toplevel(self)
         detail.title('交易明細')
         detail.transient(self.master)
@@ -162,8 +539,7 @@ class LogsFrame(ttk.Frame):
         v_max1   = (detail.register(lambda P: P=='' or (P.isdigit() and int(P)<=1)), '%P')
 
         try:
-            inv = json.load(open(INVENTORY_FILE, 'r', encoding='utf-8'))
-            inv_price = int(inv[rec.get('idx',0)].get('點數價',0))
+            inv_price = int(self.repo.product(rec['pid']).get('點數價',0))
         except:
             inv_price = 0
         up = rec.get('unit_price', 0)
@@ -173,16 +549,26 @@ class LogsFrame(ttk.Frame):
         entries = {}
         snapshot = {}
 
+        def dis_count(field):
+            # 「大賞折點N，M點」→ N
+            return int(entries[field].get().split('，')[0].replace(field,'') or 0)
+
+        def detail_order():
+            # 以畫面目前的值組成訂單，折抵/應收/檢查皆由 pricing 計算
+            order = pricing.Order.from_record(rec, inv_price)
+            order.dis_big_cnt = dis_count('大賞折點')
+            order.dis_small_cnt = dis_count('小賞折點')
+            order.extra_dis = int(entries['額外折點'].get() or 0)
+            order.reason = entries['折抵原因'].get()
+            order.amount = int(entries['此單總金額'].get() or 0)
+            return order
+
         def update_discount():
-            db = int(entries['大賞折點'].get().split('，')[1].replace('點','')) if '，' in entries['大賞折點'].get() else 0
-            ds = int(entries['小賞折點'].get().split('，')[1].replace('點','')) if '，' in entries['小賞折點'].get() else 0
-            ed = int(entries['額外折點'].get() or 0)
-            tot_amt = int(entries['此單總金額'].get() or 0)
-            disc = db + ds + ed
+            order = detail_order()
             for k in ['折抵點數','此單應收']:
                 entries[k].config(state='normal')
-            entries['折抵點數'].delete(0,'end'); entries['折抵點數'].insert(0,str(disc))
-            entries['此單應收'].delete(0,'end'); entries['此單應收'].insert(0,str(tot_amt-disc))
+            entries['折抵點數'].delete(0,'end'); entries['折抵點數'].insert(0,str(order.discount))
+            entries['此單應收'].delete(0,'end'); entries['此單應收'].insert(0,str(order.due))
             for k in ['折抵點數','此單應收']:
                 entries[k].config(state='readonly')
 
@@ -193,7 +579,7 @@ class LogsFrame(ttk.Frame):
                 cnt = 0
             entries['此單總金額'].config(state='normal')
             entries['此單總金額'].delete(0,'end')
-            entries['此單總金額'].insert(0,str(cnt * up))
+            entries['此單總金額'].insert(0,str(pricing.order_total(cnt, up, free)))
             entries['此單總金額'].config(state='readonly')
             update_discount()
 
@@ -225,7 +611,7 @@ class LogsFrame(ttk.Frame):
             ('小賞', small, True),
             ('非洲人','免單' if free else '否', False),
             ('大賞折點', f"大賞折點{rec.get('dis_big_cnt',0)}，{rec.get('dis_big_cnt',0)*inv_price}點", True),
-            ('小賞折點', f"小賞折點{rec.get('dis_small_cnt',0)}，{rec.get('dis_small_cnt',0)*20}點", True),
+            ('小賞折點', f"小賞折點{rec.get('dis_small_cnt',0)}，{rec.get('dis_small_cnt',0)*pricing.SMALL_PRIZE_POINTS}點", True),
             ('額外折點', rec.get('extra_dis',0), True),
             ('折抵原因', rec.get('reason',''), True),
             ('此單總金額', rec.get('total',0), False),  # 鎖定此欄位
@@ -258,7 +644,7 @@ class LogsFrame(ttk.Frame):
                     ie.config(state='disabled'); ent.config(state='readonly')
                 else:
                     maxv = int(entries['大賞'].get()) if lbl=='大賞折點' else int(entries['小賞'].get())
-                    mul = inv_price if lbl=='大賞折點' else 20
+                    mul = inv_price if lbl=='大賞折點' else pricing.SMALL_PRIZE_POINTS
                     ttk.Button(detail,text='更新',command=make_update(lbl,mul,maxv)).grid(row=i,column=3)
                     ttk.Button(detail,text='復原',command=lambda f=lbl:restore(f)).grid(row=i,column=4)
 
@@ -280,30 +666,28 @@ class LogsFrame(ttk.Frame):
             except: messagebox.showwarning('錯誤','請輸入有效數字',parent=detail); return
             if a_big+a_small!=tot: messagebox.showwarning('錯誤','大賞+小賞須等於總抽數',parent=detail); return
             update_discount()
-            due_val=int(entries['此單應收'].get()); paid=0
+            order = detail_order()
+            order.big, order.small = a_big, a_small
+            pays = {}
             for fld in ('現金支付','匯款支付','點數支付'):
-                try: paid+=int(entries[fld].get())
+                try: pays[fld]=int(entries[fld].get())
                 except: messagebox.showwarning('錯誤',f'請輸入有效數字在{fld}',parent=detail); return
-            if paid!=due_val: messagebox.showwarning('錯誤',f'支付總和須等於應收{due_val}',parent=detail); return
-            extra=int(entries['額外折點'].get() or 0)
-            if extra>0 and not entries['折抵原因'].get().strip(): messagebox.showwarning('錯誤','額外折點大於0時須填寫折抵原因',parent=detail); return
+            order.cash, order.transfer, order.points = pays['現金支付'], pays['匯款支付'], pays['點數支付']
+            try: order.validate()
+            except pricing.PricingError as e: messagebox.showwarning('錯誤',str(e),parent=detail); return
+            self._before.setdefault(rec['id'], dict(rec))
             rec.update({
-                'member':entries['會員ID'].get(),'抽數':tot,'大賞':a_big,'小賞':a_small,
-                'dis_big_cnt':int(entries['大賞折點'].get().split('，')[0].replace('大賞折點','')),
-                'dis_small_cnt':int(entries['小賞折點'].get().split('，')[0].replace('小賞折點','')),
-                'extra_dis':extra,'reason':entries['折抵原因'].get(),
-                'discount':int(entries['折抵點數'].get()),
-                'total':int(entries['此單總金額'].get()),'due':due_val,
-                'cash':int(entries['現金支付'].get()),'transfer':int(entries['匯款支付'].get()),'points':int(entries['點數支付'].get())
+                'member':entries['會員ID'].get(),'抽數':order.draws,'大賞':order.big,'小賞':order.small,
+                'dis_big_cnt':order.dis_big_cnt,'dis_small_cnt':order.dis_small_cnt,
+                'extra_dis':order.extra_dis,'reason':order.reason,
+                'discount':order.discount,'total':order.total,'due':order.due,
+                'cash':order.cash,'transfer':order.transfer,'points':order.points
             })
-            self.save_all_logs(); self.refresh_logs(); messagebox.showinfo('成功','已儲存修改',parent=detail); detail.destroy()
+            # 明細不能改商品、洞數與單價，最後單價索引不受影響
+            self.store.update('logs', rec)
+            self.tree.update_row(sel[0], self._row_values(rec)); self.update_sum(changed=True); messagebox.showinfo('成功','已儲存修改',parent=detail); detail.destroy()
         ttk.Button(detail,text='儲存',command=save).grid(row=len(fields),column=0,columnspan=5,pady=10)
 
-    def save_all_logs(self):
-        with open(LOG_FILE,'w',encoding='utf-8') as f:
-            for rec in self.all_logs:
-                f.write(json.dumps(rec, ensure_ascii=False)+'\n')
-
 if __name__=='__main__':
     root = tk.Tk()
     root.title('交易紀錄測試')
@@ -1,9 +1,11 @@
 # main.py｜良級懸賞 POS 系統 — 開班功能（整數版）
+import startup
 import os
 import json
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from datetime import datetime
+import storage
 
 # 如果要顯示 LOGO，請先安裝 Pillow：pip install pillow
 try:
@@ -12,9 +14,9 @@ except ImportError:
     Image = None
     ImageTk = None
 
-# 檔案路徑設定
+# 檔案路徑設定（session.json 與其他模組相同，設定 POS_HOME 時在該資料目錄下）
 BASE_DIR    = os.path.dirname(__file__)
-SESSION_FILE= os.path.join(BASE_DIR, "session.json")
+SESSION_FILE= storage.SESSION_FILE
 ASSETS_DIR  = os.path.join(BASE_DIR, "assets")
 LOGO_PATH   = os.path.join(ASSETS_DIR, "良級logo_png.png")
 
@@ -193,64 +195,23 @@ class MainApp:
 
         self.save_session(branch, staff, cash_val)
         self.root.destroy()
+        startup.mark('shift_start')
         import inventory
+        startup.mark('inventory_imported')
         inv_root = tk.Tk()
         inventory.InventoryApp(inv_root)
+        startup.mark_when_idle(inv_root, 'inventory_ready', startup.report)
         inv_root.mainloop()
 
 if __name__ == "__main__":
     os.makedirs(ASSETS_DIR, exist_ok=True)
+    os.makedirs(storage.ROOT_DIR, exist_ok=True)
     if not os.path.exists(SESSION_FILE):
         with open(SESSION_FILE, "w", encoding="utf-8") as f:
             json.dump({"branch_list": [], "staff_list": []}, f, ensure_ascii=False, indent=2)
 
     root = tk.Tk()
     MainApp(root)
+    startup.mark_when_idle(root, 'main_ready')
     root.mainloop()
 
-
-# inventory.py｜良級懸賞 POS 系統 — 庫存管理功能（關班保留列表）
-import os, sys, subprocess, json, tkinter as tk, csv
-from tkinter import ttk, filedialog, messagebox
-import webbrowser
-from datetime import datetime
-import logs
-import receive
-
-# 確保 openpyxl 安裝
-try:
-    from openpyxl import load_workbook
-except ImportError:
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'openpyxl'])
-    from openpyxl import load_workbook
-
-# 資料儲存路徑
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'logs')
-os.makedirs(DATA_DIR, exist_ok=True)
-INVENTORY_FILE = os.path.join(DATA_DIR, 'inventory.json')
-
-class InventoryApp:
-    def __init__(self, root):
-        # ... 前略，保留原本所有功能 ...
-        self.root = root
-        self.root.title('良級懸賞 POS 系統')
-        # 略...
-        # (請參考之前完整版，on_close_shift 已修改以下部分)
-
-    # 關班按鈕回呼
-    def on_close_shift(self):
-        if not messagebox.askyesno('關班確認', '關班後將匯出今日交易與領取報表並關閉系統，是否繼續？'):
-            return
-        today = datetime.now().strftime('%Y-%m-%d')
-        closing_dir = os.path.join(DATA_DIR, 'closing')
-        os.makedirs(closing_dir, exist_ok=True)
-
-        # 匯出交易日誌 & 領取紀錄 (同之前實作)
-        # ...
-
-        # **不再刪除 session.json，保留分店/人員列表**
-
-        messagebox.showinfo('完成', f'已匯出今日報表至 {closing_dir}，系統即將關閉。')
-        self.root.destroy()
-
-# 其他方法與邏輯未變，請整合進您的完整 inventory.py 檔案中。
\ No newline at end of file
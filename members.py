@@ -0,0 +1,100 @@
+# members.py｜良級懸賞 POS 系統 — 會員消費紀錄（由會員索引查詢，不掃描全部交易）
+import tkinter as tk
+from tkinter import ttk, messagebox
+import records
+from profiling import timed
+
+def _int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return 0
+
+def is_pending(rec):
+    # 尚未領取/寄出的商品
+    if rec.get('已領取') or rec.get('picked_sent_date'):
+        return False
+    return rec.get('status', '') not in records.RECEIVE_DONE
+
+@timed('members.history', rows=lambda result, *a, **kw: len(result['logs']))
+def history(store, member):
+    # 回傳 {'logs', 'receive', 'pending', 'points', 'totals'}；points 為點數異動
+    # （點數支付為扣點，負數為加點），依時間排序並附累計
+    logs = sorted(records.compact('logs', store.query('logs', member=member)), key=lambda r: r.get('time', ''))
+    recv = sorted(records.compact('receive', store.query('receive', member=member)),
+                  key=lambda r: r.get('日期', '') or r.get('time', ''))
+    points, balance = [], 0
+    for rec in logs:
+        change = -_int(rec.get('points'))
+        if change:
+            balance += change
+            points.append((rec.get('time', ''), rec.get('item', ''), change, balance))
+    pending = [r for r in recv if is_pending(r)]
+    totals = {
+        'orders':   len(logs),
+        'spend':    sum(_int(r.get('due')) for r in logs),
+        'draws':    sum(_int(r.get('抽數')) for r in logs),
+        'cash':     sum(_int(r.get('cash')) for r in logs),
+        'transfer': sum(_int(r.get('transfer')) for r in logs),
+        'points':   balance,
+        'pending':  sum(_int(r.get('inventory_qty', r.get('qty'))) for r in pending),
+        'first':    logs[0].get('time', '')[:10] if logs else '',
+        'last':     logs[-1].get('time', '')[:10] if logs else '',
+    }
+    return {'logs': logs, 'receive': recv, 'pending': pending, 'points': points, 'totals': totals}
+
+class MemberHistory(tk.Toplevel):
+    # 會員消費總覽：累計消費、抽數、點數異動與待領取商品
+    def __init__(self, master, store, member):
+        super().__init__(master)
+        self.title(f'會員紀錄 — {member}')
+        self.geometry('760x520')
+        self.transient(master.winfo_toplevel())
+        self.build_ui(history(store, member), member)
+
+    def build_ui(self, data, member):
+        t = data['totals']
+        head = ttk.Frame(self)
+        head.pack(fill='x', padx=10, pady=8)
+        lines = (
+            f"會員ID：{member}　　交易 {t['orders']} 筆（{t['first']} ~ {t['last']}）",
+            f"累計應收：{t['spend']}　現金：{t['cash']}　匯款：{t['transfer']}　總抽數：{t['draws']}",
+            f"點數淨變動：{t['points']:+d}　待領取：{len(data['pending'])} 筆 / {t['pending']} 件",
+        )
+        for line in lines:
+            ttk.Label(head, text=line).pack(anchor='w')
+
+        nb = ttk.Notebook(self)
+        nb.pack(fill='both', expand=True, padx=10, pady=5)
+        self._table(nb, '交易紀錄', ('日期', '分店', '商品', '抽賞方式', '應收', '點數'), (140, 70, 220, 90, 70, 60),
+                    [(r.get('time', '')[:16].replace('T', ' '), r.get('branch', ''), r.get('item', ''),
+                      f"{r.get('hole', '')}洞 x {r.get('抽數', '')}", r.get('due', ''), r.get('points', ''))
+                     for r in reversed(data['logs'])])
+        self._table(nb, '點數異動', ('日期', '商品', '異動', '累計'), (140, 300, 80, 80),
+                    [(when[:16].replace('T', ' '), item, f'{change:+d}', balance)
+                     for when, item, change, balance in reversed(data['points'])])
+        self._table(nb, '待領取', ('日期', '商品', '數量', '狀態', '備註'), (100, 280, 60, 110, 160),
+                    [(r.get('日期', ''), r.get('item', ''), r.get('inventory_qty', r.get('qty', '')),
+                      r.get('status', '') or '未領取', r.get('notes', ''))
+                     for r in data['pending']])
+
+    def _table(self, nb, title, heads, widths, rows):
+        frame = ttk.Frame(nb)
+        nb.add(frame, text=f'{title}（{len(rows)}）')
+        tree = ttk.Treeview(frame, columns=heads, show='headings')
+        for h, w in zip(heads, widths):
+            tree.heading(h, text=h)
+            tree.column(h, width=w, anchor='center')
+        sb = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=sb.set)
+        tree.pack(side='left', fill='both', expand=True)
+        sb.pack(side='right', fill='y')
+        for values in rows:
+            tree.insert('', 'end', values=values)
+
+def open_history(master, store, member):
+    member = (member or '').strip()
+    if not member:
+        messagebox.showwarning('會員紀錄', '請輸入會員ID或先選取一筆紀錄', parent=master)
+        return None
+    return MemberHistory(master, store, member)
@@ -0,0 +1,151 @@
+# pricing.py｜良級懸賞 POS 系統 — 結帳計價（不依賴 Tk，結帳視窗與交易明細共用）
+from dataclasses import dataclass, asdict
+
+HOLES = (20, 40, 60, 80)
+SMALL_PRIZE_POINTS = 20   # 每個小賞折點折抵的點數（大賞折點則為商品點數價）
+
+class PricingError(ValueError):
+    pass
+
+# —— 商品定價規則：點數價與各洞價格由成本推算（新增商品、Excel 匯入、批次調價共用）
+PRICE_FIELDS = ('點數價', '20洞價格', '40洞價格', '60洞價格', '80洞價格')
+HOLE_DIVISORS = {40: 2, 60: 3, 80: 4}
+
+@dataclass
+class PriceRule:
+    markup: float = 1.2       # 點數價 = 成本 × markup
+    base_divisor: float = 7   # 20洞價格 = 成本 ÷ base_divisor
+    offset: float = 100       # 40/60/80洞價格 = (20洞價格 + offset) ÷ 2/3/4
+
+    def prices(self, cost):
+        p20 = int(cost / self.base_divisor)
+        prices = {'點數價': int(cost * self.markup), '20洞價格': p20}
+        for hole, div in HOLE_DIVISORS.items():
+            prices[f'{hole}洞價格'] = int((p20 + self.offset) / div)
+        return prices
+
+    def to_dict(self):
+        return asdict(self)
+
+DEFAULT_RULE = PriceRule()
+
+def rule_for(rules, vendor):
+    # rules：{廠商: PriceRule}，'*' 為其餘廠商的預設規則
+    return rules.get(vendor) or rules.get('*') or DEFAULT_RULE
+
+def unit_price(product, hole, last_price=None):
+    # 單抽價：優先沿用該商品此洞數最後一次成交價，否則為「{hole}洞價格」，再無則用點數價
+    if last_price is not None:
+        return int(last_price)
+    return int(product.get(f'{hole}洞價格', product.get('點數價', 0)))
+
+def order_total(draws, price, free=False):
+    # 非洲人免單：此單總金額為 0
+    return 0 if free else draws * price
+
+def discount_points(dis_big_cnt, dis_small_cnt, extra_dis, base_price):
+    return dis_big_cnt * base_price + dis_small_cnt * SMALL_PRIZE_POINTS + extra_dis
+
+@dataclass
+class Order:
+    pid: str
+    item: str = ''
+    hole: int = 20
+    unit_price: int = 0
+    base_price: int = 0     # 商品點數價
+    big: int = 0            # 大賞（每單最多 1）
+    small: int = 0          # 小賞
+    free: bool = False      # 非洲人免單
+    dis_big_cnt: int = 0
+    dis_small_cnt: int = 0
+    extra_dis: int = 0
+    reason: str = ''
+    cash: int = 0
+    transfer: int = 0
+    points: int = 0         # 可為負數
+    amount: int = None      # 此單總金額；None 時依抽數 × 單抽價計算（修改舊紀錄時沿用原金額）
+
+    @property
+    def draws(self):
+        return self.big + self.small
+
+    @property
+    def free_allowed(self):
+        # 只有抽完整組且只中 1 個大賞時可免單
+        return self.big == 1 and self.small == self.hole - 1
+
+    @property
+    def inventory_qty(self):
+        return self.big if self.free else self.draws
+
+    @property
+    def total(self):
+        if self.amount is not None:
+            return self.amount
+        return order_total(self.draws, self.unit_price, self.free)
+
+    @property
+    def max_dis_big(self):
+        return self.big
+
+    @property
+    def max_dis_small(self):
+        return 0 if self.free else self.small
+
+    @property
+    def discount(self):
+        return discount_points(self.dis_big_cnt, self.dis_small_cnt, self.extra_dis, self.base_price)
+
+    @property
+    def due(self):
+        return self.total - self.discount
+
+    @property
+    def paid(self):
+        return self.cash + self.transfer + self.points
+
+    def clamp_counts(self):
+        # 大賞 0~1、小賞不超過剩餘洞數；不符免單條件時取消免單
+        self.big = max(0, min(self.big, 1))
+        self.small = max(0, min(self.small, self.hole - self.big))
+        if not self.free_allowed:
+            self.free = False
+        return self
+
+    def validate(self):
+        if not 0 <= self.dis_big_cnt <= self.max_dis_big:
+            raise PricingError(f'大賞折點數量不可超過{self.max_dis_big}')
+        if not 0 <= self.dis_small_cnt <= self.max_dis_small:
+            raise PricingError(f'小賞折點數量不可超過{self.max_dis_small}')
+        if self.extra_dis > 0 and not self.reason.strip():
+            raise PricingError('額外折點大於0時須填寫折抵原因')
+        if self.paid != self.due:
+            raise PricingError(f'支付總和須等於應收{self.due}')
+        return self
+
+    def to_record(self, **context):
+        # context：time、branch、staff、member 等結帳當下資訊；欄位順序同原本的交易紀錄
+        rec = {'pid': self.pid}
+        rec.update(context)
+        rec.update({
+            'item': self.item, 'hole': self.hole,
+            '抽數': self.draws, '大賞': self.big, '小賞': self.small,
+            'free': self.free, 'inventory_qty': self.inventory_qty, 'total': self.total,
+            'dis_big_cnt': self.dis_big_cnt, 'dis_small_cnt': self.dis_small_cnt,
+            'extra_dis': self.extra_dis, 'discount': self.discount, 'reason': self.reason,
+            'due': self.due, 'cash': self.cash, 'transfer': self.transfer,
+            'points': self.points, 'unit_price': self.unit_price,
+        })
+        return rec
+
+    @classmethod
+    def from_record(cls, rec, base_price=0):
+        return cls(
+            pid=rec.get('pid', ''), item=rec.get('item', ''), hole=int(rec.get('hole') or 20),
+            unit_price=int(rec.get('unit_price') or 0), base_price=int(base_price or 0),
+            big=int(rec.get('大賞') or 0), small=int(rec.get('小賞') or 0), free=bool(rec.get('free')),
+            dis_big_cnt=int(rec.get('dis_big_cnt') or 0), dis_small_cnt=int(rec.get('dis_small_cnt') or 0),
+            extra_dis=int(rec.get('extra_dis') or 0), reason=rec.get('reason', '') or '',
+            cash=int(rec.get('cash') or 0), transfer=int(rec.get('transfer') or 0),
+            points=int(rec.get('points') or 0),
+        )
@@ -0,0 +1,55 @@
+# products.py｜良級懸賞 POS 系統 — 商品穩定 ID（pid）與索引
+import storage
+
+def build_index(items):
+    # pid → 商品；取代以清單位置 idx 參照商品
+    return {item['id']: item for item in items}
+
+def _resolver(items):
+    by_name = {}
+    dup = set()
+    for item in items:
+        name = item.get('商品名稱', '')
+        if name in by_name:
+            dup.add(name)
+        by_name[name] = item['id']
+
+    def resolve(rec):
+        # 舊紀錄的 idx 在商品被刪除後會錯位：先以唯一商品名稱對應，
+        # 名稱重複時才採用 idx 位置且名稱須相符
+        name = rec.get('item', '')
+        if name in by_name and name not in dup:
+            return by_name[name]
+        idx = rec.get('idx')
+        if isinstance(idx, int) and 0 <= idx < len(items) and items[idx].get('商品名稱') == name:
+            return items[idx]['id']
+        return ''
+    return resolve
+
+def migrate_product_refs(store=None, items=None):
+    # 一次性將 logs/receive 舊紀錄的 idx 改寫為 pid；已執行過則回傳 None
+    store = store or storage.get_backend()
+    if store.get_meta('product_refs'):
+        return None
+    resolve = _resolver(items if items is not None else store.load('inventory'))
+    counts = {'mapped': 0, 'unresolved': 0}
+    for table in ('logs', 'receive'):
+        changed = []
+        for rec in store.load(table):
+            if 'pid' in rec or 'idx' not in rec:
+                continue
+            rec['pid'] = resolve(rec)
+            if rec['pid']:
+                del rec['idx']
+                counts['mapped'] += 1
+            else:
+                counts['unresolved'] += 1  # 保留原 idx 以便人工查核
+            changed.append(rec)
+        if changed:
+            store.update_many(table, changed)
+    store.set_meta('product_refs', counts)
+    return counts
+
+if __name__ == '__main__':
+    result = migrate_product_refs()
+    print('已執行過' if result is None else f"已對應 {result['mapped']} 筆，無法對應 {result['unresolved']} 筆")
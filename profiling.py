@@ -0,0 +1,100 @@
+# profiling.py｜良級懸賞 POS 系統 — 熱點計時（讀寫檔、表格更新、結帳步驟的耗時與筆數，保留在記憶體環形緩衝區）
+# 用法：@timed('logs.refresh_logs', rows=lambda result, self: len(self.logs))
+#       with span('inventory.refresh_table') as s: ...; s.rows = len(items)
+# 名稱可含 {1}、{2}… 以呼叫參數代入，例如 'storage.load:{1}' → 'storage.load:logs'
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+from datetime import datetime
+
+CAPACITY = 5000   # 只保留最近這麼多筆
+SLOW_MS  = 200    # 超過即標記為 slow（收銀員感覺「卡住」的程度）
+
+_buffer = deque(maxlen=CAPACITY)
+_lock = threading.Lock()
+
+def record(name, seconds, rows=None, **extra):
+    entry = {'at': datetime.now().isoformat(timespec='milliseconds'), 'name': name,
+             'ms': round(seconds * 1000, 2), 'thread': threading.current_thread().name}
+    if rows is not None:
+        entry['rows'] = rows
+    if entry['ms'] >= SLOW_MS:
+        entry['slow'] = True
+    entry.update(extra)
+    with _lock:
+        _buffer.append(entry)
+    return entry
+
+class span:
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.t = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        extra = {'error': exc_type.__name__} if exc_type else {}
+        record(self.name, time.perf_counter() - self.t, self.rows, **extra)
+        return False
+
+def timed(name=None, rows=None):
+    # rows(result, *args, **kw) 回傳筆數；例外時仍會記錄耗時與例外名稱
+    def deco(fn):
+        label = name or fn.__qualname__
+        @functools.wraps(fn)
+        def wrapper(*args, **kw):
+            with span(label.format(*args) if '{' in label else label) as s:
+                result = fn(*args, **kw)
+                if rows:
+                    try:
+                        s.rows = rows(result, *args, **kw)
+                    except TypeError:   # 例如參數為產生器，無法取得筆數
+                        pass
+            return result
+        return wrapper
+    return deco
+
+def result_len(result, *args, **kw):
+    return len(result)
+
+def arg_len(index):
+    # 以第 index 個呼叫參數的長度作為筆數（方法的 self 為第 0 個）
+    return lambda result, *args, **kw: len(args[index])
+
+def entries():
+    with _lock:
+        return list(_buffer)
+
+def clear():
+    with _lock:
+        _buffer.clear()
+
+def summary():
+    # 依名稱彙總：次數、總計/最大/最近一次毫秒、慢的次數；總計大的在前
+    stats = {}
+    for e in entries():
+        s = stats.setdefault(e['name'], {'name': e['name'], 'count': 0, 'total_ms': 0.0,
+                                         'max_ms': 0.0, 'last_ms': 0.0, 'slow': 0})
+        s['count'] += 1
+        s['total_ms'] = round(s['total_ms'] + e['ms'], 2)
+        s['max_ms'] = max(s['max_ms'], e['ms'])
+        s['last_ms'] = e['ms']
+        s['slow'] += 1 if e.get('slow') else 0
+    return sorted(stats.values(), key=lambda s: -s['total_ms'])
+
+def dump(path=None):
+    # 寫出彙總與全部紀錄；預設為 logs/diagnostics/diag-YYYYmmdd-HHMMSS.json
+    if path is None:
+        import storage
+        folder = os.path.join(storage.DATA_DIR, 'diagnostics')
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, datetime.now().strftime('diag-%Y%m%d-%H%M%S.json'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'at': datetime.now().isoformat(timespec='seconds'), 'slow_ms': SLOW_MS,
+                   'summary': summary(), 'entries': entries()}, f, ensure_ascii=False, indent=1)
+    return path
@@ -1,104 +1,77 @@
-import os
-import sys
-import subprocess
-import json
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
-
-# 確保 tkcalendar 安裝
-try:
-    from tkcalendar import DateEntry
-except ImportError:
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'tkcalendar'])
-    from tkcalendar import DateEntry
+import storage
+import events
+import records
+from repository import Repository
+from table import VirtualTree
+from datepicker import date_entry
+from profiling import timed
+import members
+from tail import POLL_MS
 
 # 資料儲存路徑
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'logs')
-RECEIVE_FILE = os.path.join(DATA_DIR, 'receive.json')
-INVENTORY_FILE = os.path.join(DATA_DIR, 'inventory.json')
+DATA_DIR = storage.DATA_DIR
+INVENTORY_FILE = storage.INVENTORY_FILE
 
 class ReceiveFrame(ttk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, repo=None):
         super().__init__(master)
         self.pack(fill='both', expand=True)
         self.data = []
         self.inventory = []
+        self.repo = repo or Repository()
+        self.store = self.repo.store
         # 狀態選項
-        self.status_options = [
-            "已領取", "需回盒", "已回盒", "需叫貨", "已叫貨",
-            "維修中", "店面需寄出", "店面已寄出", "已通知倉庫寄送"
-        ]
+        self.status_options = list(records.RECEIVE_STATUSES)
         # 回盒負責人可編輯清單
         self.return_person_options = []
         # 領取方式選項
-        self.receive_method_options = ["自取", "寄送"]
-        self.load_data()
+        self.receive_method_options = list(records.RECEIVE_METHODS)
+        # 追蹤其他視窗/收銀機寫入的領取紀錄（只讀新附加的異動）
+        self.live = self.store.watch('receive')
         self.load_inventory()
         self.build_ui()
         self.refresh()
+        self._live_job = self.after(POLL_MS, self.poll_live)
+        unsubscribe = events.subscribe(events.RECEIVE_ADDED, self.on_receive_added)
+        self.bind('<Destroy>', lambda e: (unsubscribe(), self.after_cancel(self._live_job)) if e.widget is self else None)
 
-    def load_data(self):
-        self.data = []
-        if not os.path.exists(RECEIVE_FILE):
-            return
-        text = open(RECEIVE_FILE, 'r', encoding='utf-8').read().strip()
-        if not text:
-            return
-        if text.lstrip().startswith('['):
-            try:
-                arr = json.loads(text)
-                if isinstance(arr, list):
-                    self.data = arr
-                    return
-            except json.JSONDecodeError:
-                pass
-        for line in text.splitlines():
-            try:
-                obj = json.loads(line)
-                self.data.append(obj)
-            except:
-                continue
-        # 收集現有回盒負責人
-        persons = set(item.get('return_person', '') for item in self.data if item.get('return_person'))
-        self.return_person_options = list(persons)
+    @timed('receive.load_data', rows=lambda result, self, *a, **kw: len(self.data))
+    def load_data(self, start=None, end=None, member=None):
+        # 只查詢日期區段涵蓋的月份分段；有指定會員時改由會員索引只讀這些會員的紀錄
+        self.data = records.compact('receive', self.store.query('receive', start, end, member))
+        # 收集查詢到的回盒負責人
+        for item in self.data:
+            if item.get('return_person') and item['return_person'] not in self.return_person_options:
+                self.return_person_options.append(item['return_person'])
 
     def load_inventory(self):
-        if os.path.exists(INVENTORY_FILE):
-            with open(INVENTORY_FILE, 'r', encoding='utf-8') as f:
-                self.inventory = json.load(f)
-        else:
-            self.inventory = []
-
-    def save_data(self):
-        with open(RECEIVE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-
-    def save_inventory(self):
-        with open(INVENTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.inventory, f, ensure_ascii=False, indent=2)
+        self.inventory = self.repo.inventory()
 
     def build_ui(self):
         filter_frame = ttk.Frame(self)
         filter_frame.pack(fill='x', padx=10, pady=5)
 
         ttk.Label(filter_frame, text='起始:').pack(side='left', padx=5)
-        self.start_entry = DateEntry(filter_frame, date_pattern='yyyy-MM-dd')
+        self.start_entry = date_entry(filter_frame, date_pattern='yyyy-MM-dd')
         self.start_entry.pack(side='left', padx=5)
         ttk.Label(filter_frame, text='結束:').pack(side='left', padx=5)
-        self.end_entry = DateEntry(filter_frame, date_pattern='yyyy-MM-dd')
+        self.end_entry = date_entry(filter_frame, date_pattern='yyyy-MM-dd')
         self.end_entry.pack(side='left', padx=5)
 
         ttk.Label(filter_frame, text='會員ID:').pack(side='left', padx=5)
         self.member_entry = ttk.Entry(filter_frame)
         self.member_entry.pack(side='left', padx=5)
         ttk.Button(filter_frame, text='查詢', command=self.refresh).pack(side='left', padx=10)
+        ttk.Button(filter_frame, text='會員紀錄', command=self.open_member_history).pack(side='left')
 
         columns = [
             '日期', '會員ID', '商品名稱', '數量', '到期日', '廠商', '商品狀態',
             '回盒負責人', '回盒日期', '已取/寄日期', '領取方式', '備註'
         ]
-        self.tree = ttk.Treeview(
+        self.tree = VirtualTree(
             self,
             columns=columns,
             show='headings',
@@ -116,7 +89,12 @@ class ReceiveFrame(ttk.Frame):
         btns.pack(pady=5)
         ttk.Button(btns, text='刪除紀錄', command=self.delete_selected).pack(side='left', padx=10)
 
-    def refresh(self):
+    def open_member_history(self):
+        sel = self.tree.selection()
+        member = self.tree.set(sel[0], '會員ID') if sel else self.member_entry.get()
+        members.open_history(self, self.store, member)
+
+    def _filters(self):
         search_member = self.member_entry.get().strip().lower()
         try:
             start_date = datetime.strptime(self.start_entry.get(), '%Y-%m-%d').date()
@@ -126,40 +104,102 @@ class ReceiveFrame(ttk.Frame):
             end_date = datetime.strptime(self.end_entry.get(), '%Y-%m-%d').date()
         except:
             end_date = None
+        return search_member, start_date, end_date
 
-        self.tree.delete(*self.tree.get_children())
-        for idx, item in enumerate(self.data):
-            member = item.get('member', '').lower()
-            if search_member and search_member not in member:
-                continue
+    def _item_date(self, item):
+        try:
+            return datetime.strptime(item.get('日期', '').split()[0], '%Y-%m-%d').date()
+        except:
+            return None
 
-            # 處理日期與到期日
-            date_str = item.get('日期', '')
-            try:
-                item_date = datetime.strptime(date_str.split()[0], '%Y-%m-%d').date()
-            except:
-                item_date = None
-            if start_date and (not item_date or item_date < start_date): continue
-            if end_date and (not item_date or item_date > end_date): continue
-            expire = ''
-            if item_date:
-                expire = (item_date + timedelta(days=21)).strftime('%Y-%m-%d')
-
-            values = [
-                item.get('日期', ''),
-                item.get('member', ''),
-                item.get('item', ''),
-                str(item.get('inventory_qty', item.get('qty', ''))),
-                expire,
-                item.get('vendor', ''),
-                item.get('status', ''),
-                item.get('return_person', ''),
-                item.get('return_date', ''),
-                item.get('picked_sent_date', ''),
-                item.get('receive_method', ''),
-                item.get('notes', '')
-            ]
-            self.tree.insert('', 'end', iid=str(idx), values=values)
+    def _matches(self, item, filters):
+        search_member, start_date, end_date = filters
+        member = item.get('member', '').lower()
+        if search_member and search_member not in member:
+            return False
+        item_date = self._item_date(item)
+        if start_date and (not item_date or item_date < start_date): return False
+        if end_date and (not item_date or item_date > end_date): return False
+        return True
+
+    def _row_values(self, item):
+        # 處理日期與到期日
+        item_date = self._item_date(item)
+        expire = ''
+        if item_date:
+            expire = (item_date + timedelta(days=21)).strftime('%Y-%m-%d')
+        return [
+            item.get('日期', ''),
+            item.get('member', ''),
+            item.get('item', ''),
+            str(item.get('inventory_qty', item.get('qty', ''))),
+            expire,
+            item.get('vendor', ''),
+            item.get('status', ''),
+            item.get('return_person', ''),
+            item.get('return_date', ''),
+            item.get('picked_sent_date', ''),
+            item.get('receive_method', ''),
+            item.get('notes', '')
+        ]
+
+    @timed('receive.refresh')
+    def refresh(self):
+        filters = self._filters()
+        search_member, start_date, end_date = filters
+        matched = None
+        if search_member:
+            # 會員ID可輸入部分號碼：先比對會員清單，再只讀符合的會員
+            matched = {m for m in self.store.members('receive') if search_member in m.lower()}
+        self.live.sync()
+        self.load_data(start_date and start_date.isoformat(), end_date and end_date.isoformat(), matched)
+        rows = [(item['id'], self._row_values(item)) for item in self.data if self._matches(item, filters)]
+        self.tree.set_rows(rows)
+
+    def on_receive_added(self, item):
+        # 結帳完成只加入這一筆，不重新載入檔案
+        if item.get('return_person') and item['return_person'] not in self.return_person_options:
+            self.return_person_options.append(item['return_person'])
+        if self._matches(item, self._filters()):
+            item = records.make('receive', item)
+            self.data.append(item)
+            self.tree.insert_row(item['id'], self._row_values(item))
+
+    def poll_live(self):
+        try:
+            reset, changes = self.live.poll()
+        except OSError:
+            reset, changes = False, []
+        if reset:
+            self.refresh()
+        elif changes:
+            self.apply_changes(changes)
+        self._live_job = self.after(POLL_MS, self.poll_live)
+
+    def apply_changes(self, changes):
+        # changes：日誌事件 {op, id, rec}；依 id 套用，自己寫入的異動再套用一次結果相同
+        filters = self._filters()
+        pos = {item['id']: i for i, item in enumerate(self.data)}
+        removed = set()
+        for ev in changes:
+            rid, item = ev.get('id'), ev.get('rec') if ev.get('op') in ('insert', 'update') else None
+            if item is not None and self._matches(item, filters):
+                item = records.make('receive', item)
+                removed.discard(rid)
+                if item.get('return_person') and item['return_person'] not in self.return_person_options:
+                    self.return_person_options.append(item['return_person'])
+                if rid in pos:
+                    self.data[pos[rid]] = item
+                    self.tree.update_row(rid, self._row_values(item))
+                else:
+                    pos[rid] = len(self.data)
+                    self.data.append(item)
+                    self.tree.insert_row(rid, self._row_values(item))
+            elif rid in pos:
+                removed.add(rid)
+        if removed:
+            self.data = [item for item in self.data if item['id'] not in removed]
+            self.tree.delete_rows(removed)
 
     def delete_selected(self):
         sel = self.tree.selection()
@@ -167,10 +207,10 @@ class ReceiveFrame(ttk.Frame):
             return
         if not messagebox.askyesno('刪除紀錄', f'確定要刪除選中的 {len(sel)} 筆領取紀錄？'):
             return
-        for idx in sorted([int(i) for i in sel], reverse=True):
-            self.data.pop(idx)
-        self.save_data()
-        self.refresh()
+        removed = set(sel)
+        self.data = [item for item in self.data if item['id'] not in removed]
+        self.store.delete('receive', removed)
+        self.tree.delete_rows(removed)
 
     def on_double_click(self, event):
         region = self.tree.identify("region", event.x, event.y)
@@ -197,7 +237,7 @@ class ReceiveFrame(ttk.Frame):
             widget.bind("<<ComboboxSelected>>", lambda e: self.save_cell(rowid, col_name, widget))
             widget.bind("<FocusOut>", lambda e: self.save_cell(rowid, col_name, widget))
         elif col_name in ['回盒日期', '已取/寄日期']:
-            widget = DateEntry(self.tree, date_pattern='yyyy-MM-dd')
+            widget = date_entry(self.tree, date_pattern='yyyy-MM-dd')
             current = self.tree.set(rowid, col_name)
             try:
                 widget.set_date(datetime.strptime(current, '%Y-%m-%d').date())
@@ -219,7 +259,6 @@ class ReceiveFrame(ttk.Frame):
     def save_cell(self, rowid, col_name, widget):
         new_val = widget.get()
         self.tree.set(rowid, col_name, new_val)
-        idx = int(rowid)
         key_map = {
             '商品狀態': 'status',
             '回盒負責人': 'return_person',
@@ -230,11 +269,12 @@ class ReceiveFrame(ttk.Frame):
         }
         save_key = key_map.get(col_name)
         if save_key:
-            self.data[idx][save_key] = new_val
+            item = next(i for i in self.data if i['id'] == rowid)
+            item[save_key] = new_val
             # 新回盒負責人加入選項
             if col_name == '回盒負責人' and new_val not in self.return_person_options:
                 self.return_person_options.append(new_val)
-        self.save_data()
+            self.store.update('receive', item)
         widget.destroy()
 
 # 主程式示例
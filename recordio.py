@@ -0,0 +1,70 @@
+# recordio.py｜良級懸賞 POS 系統 — 紀錄檔格式：第一行為版本標頭的 JSONL，逐行串流讀取（相容舊版陣列/混合檔）
+import json
+
+FORMAT  = 'pos'
+VERSION = 1
+CHUNK   = 1 << 16   # 舊版陣列檔每次讀入的字元數
+
+def header(table, kind='records'):
+    # kind：records（分段快照）或 events（異動日誌）
+    return {'_format': FORMAT, 'version': VERSION, 'table': table, 'kind': kind}
+
+def header_line(table, kind='records'):
+    return (json.dumps(header(table, kind), ensure_ascii=False) + '\n').encode('utf-8')
+
+def is_header(row):
+    return isinstance(row, dict) and '_format' in row
+
+def _check(row):
+    if row.get('version', 0) > VERSION:
+        raise ValueError(f"紀錄檔格式版本 {row.get('version')} 較新（本程式支援 {VERSION}），請更新程式")
+
+def iter_lines(lines):
+    # 逐行解析（bytes 或 str 皆可）；略過標頭與寫到一半中斷的行
+    for line in lines:
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if is_header(row):
+            _check(row)
+            continue
+        yield row
+
+def _iter_array(f, buf):
+    # 舊版 JSON 陣列逐個元素解碼，不把整個檔讀成一個字串；陣列結束後若還有附加的 JSONL 一併讀出
+    decoder = json.JSONDecoder()
+    pos = 1   # buf 以 '[' 開頭
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buf) and buf[pos] == ']':
+            yield from iter_lines((buf[pos + 1:] + f.readline()).splitlines())
+            yield from iter_lines(f)
+            return
+        try:
+            if pos >= len(buf):
+                raise ValueError
+            row, pos = decoder.raw_decode(buf, pos)
+        except ValueError:
+            more = f.read(CHUNK)
+            if not more:
+                return   # 陣列不完整：保留已解出的元素
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield row
+
+def iter_file(path):
+    # 依檔案開頭判斷格式：'[' 為舊版陣列（或後面又附加 JSONL 的混合檔），其餘逐行讀取
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            more = f.read(1)
+            if not more:
+                return
+            if not more.isspace():
+                break
+        if more == '[':
+            yield from _iter_array(f, more + f.read(CHUNK))
+        else:
+            yield from iter_lines((more + f.readline()).splitlines())
+            yield from iter_lines(f)
@@ -0,0 +1,103 @@
+# records.py｜良級懸賞 POS 系統 — 精簡的交易/領取紀錄（__slots__ 取代 dict，重複字串共用）
+import sys
+from collections.abc import MutableMapping
+
+# checkout.post_confirm 寫入的交易欄位
+LOG_FIELDS = (
+    'id', 'pid', 'idx', 'time', 'branch', 'staff', 'member', 'item', 'hole',
+    '抽數', '大賞', '小賞', 'free', 'inventory_qty', 'total',
+    'dis_big_cnt', 'dis_small_cnt', 'extra_dis', 'discount', 'reason', 'due',
+    'cash', 'transfer', 'points', 'unit_price',
+)
+# 領取紀錄：沿用交易的部分欄位（舊資料含完整交易欄位），另加領取狀態
+RECEIVE_FIELDS = LOG_FIELDS + (
+    'txn_id', '日期', 'qty', 'expire', '到期日', 'vendor', 'status', 'return_person',
+    'return_date', 'picked_sent_date', 'receive_method', 'notes', '已領取',
+)
+# 結帳時從交易複製到領取紀錄的欄位（金額、折點只留在交易紀錄）
+RECEIVE_FROM_TXN = ('pid', 'time', 'branch', 'staff', 'member', 'item', 'hole',
+                    'free', 'inventory_qty', 'reason')
+
+# 領取紀錄的商品狀態與領取方式選項
+RECEIVE_STATUSES = ('已領取', '需回盒', '已回盒', '需叫貨', '已叫貨',
+                    '維修中', '店面需寄出', '店面已寄出', '已通知倉庫寄送')
+RECEIVE_METHODS = ('自取', '寄送')
+RECEIVE_DONE = ('已領取', '店面已寄出')   # 視為已完成領取的狀態
+
+# 重複率高的字串欄位，以 sys.intern 讓相同內容共用同一個物件
+INTERNED = frozenset(('pid', 'branch', 'staff', 'member', 'item', 'reason', '日期', 'vendor',
+                      'status', 'return_person', 'receive_method'))
+
+_MISSING = object()
+
+class Record(MutableMapping):
+    # 固定欄位存在 slot，沒設定的欄位視為不存在；其餘欄位放在 _extra
+    __slots__ = ('_extra',)
+    FIELDS = frozenset()
+
+    def __init__(self, data=(), **kw):
+        self._extra = None
+        self.update(data, **kw)
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        elif self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            if key in INTERNED and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.FIELDS:
+            if getattr(self, key, _MISSING) is _MISSING:
+                raise KeyError(key)
+            delattr(self, key)
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.ORDER:
+            if getattr(self, key, _MISSING) is not _MISSING:
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self)!r})'
+
+class LogRecord(Record):
+    __slots__ = LOG_FIELDS
+    ORDER  = LOG_FIELDS
+    FIELDS = frozenset(LOG_FIELDS)
+
+class ReceiveRecord(Record):
+    __slots__ = RECEIVE_FIELDS
+    ORDER  = RECEIVE_FIELDS
+    FIELDS = frozenset(RECEIVE_FIELDS)
+
+_CLASSES = {'logs': LogRecord, 'receive': ReceiveRecord}
+
+def make(table, rec):
+    cls = _CLASSES[table]
+    return rec if isinstance(rec, cls) else cls(rec)
+
+def compact(table, rows):
+    # 由儲存層讀出的 dict 轉為精簡紀錄；介面同 dict（get、[]、update、items…）
+    cls = _CLASSES[table]
+    return [rec if isinstance(rec, cls) else cls(rec) for rec in rows]
@@ -0,0 +1,126 @@
+# report.py｜良級懸賞 POS 系統 — 關班報表（單次掃描當班紀錄並彙總）
+import os
+import json
+from collections import defaultdict
+import storage
+import records
+import export
+from profiling import timed
+
+LOG_COLUMNS = ['time','branch','staff','member','item','hole','抽數','大賞','小賞','cash','transfer','points','total','reason']
+RECEIVE_COLUMNS = ['日期','member','item','qty','expire','free','reason','已領取']
+
+def _int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return 0
+
+def load_start_cash(session=None):
+    # session：已讀取的 session.json 內容（例如共用快取），未提供時才讀檔
+    if session is not None:
+        return _int(session.get('start_cash', 0))
+    try:
+        with open(storage.SESSION_FILE, 'r', encoding='utf-8') as f:
+            return _int(json.load(f).get('start_cash', 0))
+    except (OSError, ValueError):
+        return 0
+
+@timed('report.closing_report', rows=lambda result, *a, **kw: len(result['logs']))
+def closing_report(day, start_cash=0, store=None):
+    # 只讀取 day 當天的紀錄（由儲存層的日期索引取得），一次迴圈算完所有彙總
+    store = store or storage.get_backend()
+    logs_rows = records.compact('logs', store.query('logs', day, day))
+    recv_rows = records.compact('receive', store.query('receive', day, day))
+
+    totals = defaultdict(int)
+    by_reason = defaultdict(lambda: defaultdict(int))
+    by_hole = defaultdict(lambda: defaultdict(int))
+    by_staff = defaultdict(lambda: defaultdict(int))
+    for rec in logs_rows:
+        cash, transfer, points = _int(rec.get('cash')), _int(rec.get('transfer')), _int(rec.get('points'))
+        draws, discount = _int(rec.get('抽數')), _int(rec.get('discount'))
+        totals['orders']   += 1
+        totals['cash']     += cash
+        totals['transfer'] += transfer
+        totals['points']   += points
+        totals['total']    += _int(rec.get('total'))
+        totals['discount'] += discount
+        totals['due']      += _int(rec.get('due'))
+        totals['draws']    += draws
+        totals['free']     += 1 if rec.get('free') else 0
+
+        r = by_reason[rec.get('reason') or '（無）']
+        r['orders']    += 1
+        r['discount']  += discount
+        r['extra_dis'] += _int(rec.get('extra_dis'))
+
+        h = by_hole[str(rec.get('hole', ''))]
+        h['orders'] += 1
+        h['draws']  += draws
+        h['大賞']   += _int(rec.get('大賞'))
+        h['小賞']   += _int(rec.get('小賞'))
+        h['free']   += 1 if rec.get('free') else 0
+
+        s = by_staff[rec.get('staff') or '（未填）']
+        s['orders']   += 1
+        s['due']      += _int(rec.get('due'))
+        s['cash']     += cash
+        s['transfer'] += transfer
+        s['points']   += points
+
+    return {
+        'day': day,
+        'logs': logs_rows,
+        'receive': recv_rows,
+        'totals': dict(totals),
+        'by_reason': {k: dict(v) for k, v in by_reason.items()},
+        'by_hole': {k: dict(v) for k, v in by_hole.items()},
+        'by_staff': {k: dict(v) for k, v in by_staff.items()},
+        'drawer': {
+            'start_cash': start_cash,
+            'cash_sales': totals['cash'],
+            'expected':   start_cash + totals['cash'],
+        },
+    }
+
+def write_closing_csvs(report, closing_dir, job=None):
+    # 產生原本的 logs_/receive_ 報表，另加 summary_ 彙總；job 有提供時回報進度並可取消
+    os.makedirs(closing_dir, exist_ok=True)
+    day = report['day']
+    paths = {}
+
+    paths['logs'] = os.path.join(closing_dir, f'logs_{day}.csv')
+    export.write_records(paths['logs'], report['logs'], LOG_COLUMNS, job, len(report['logs']))
+
+    paths['receive'] = os.path.join(closing_dir, f'receive_{day}.csv')
+    export.write_table(paths['receive'], RECEIVE_COLUMNS, ([
+        rec.get('日期',''),
+        rec.get('member',''),
+        rec.get('item',''),
+        rec.get('inventory_qty', rec.get('qty','')),
+        rec.get('expire', rec.get('到期日','')),
+        rec.get('free',''),
+        rec.get('reason',''),
+        '✔' if rec.get('已領取') else ''
+    ] for rec in report['receive']), job, len(report['receive']))
+
+    def summary_rows():
+        for k, v in report['totals'].items():
+            yield ['合計', '', k, v]
+        for k, v in report['drawer'].items():
+            yield ['錢櫃', '', k, v]
+        for section, name in (('by_reason', '折抵原因'), ('by_hole', '洞數'), ('by_staff', '人員')):
+            for key, fields in report[section].items():
+                for k, v in fields.items():
+                    yield [name, key, k, v]
+    paths['summary'] = os.path.join(closing_dir, f'summary_{day}.csv')
+    export.write_table(paths['summary'], ['區塊', '項目', '欄位', '數值'], summary_rows(), job)
+    return paths
+
+def summary_text(report):
+    t, d = report['totals'], report['drawer']
+    return (f"交易 {t.get('orders', 0)} 筆，抽數 {t.get('draws', 0)}\n"
+            f"現金 {t.get('cash', 0)}、匯款 {t.get('transfer', 0)}、點數 {t.get('points', 0)}\n"
+            f"折抵 {t.get('discount', 0)} 點\n"
+            f"零用金 {d['start_cash']} + 現金 {d['cash_sales']} = 錢櫃應有 {d['expected']}")
@@ -0,0 +1,97 @@
+# repository.py｜良級懸賞 POS 系統 — 共用資料快取（結帳視窗與各分頁共用，資料異動時才重新載入）
+import os
+import json
+import storage
+import products
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+
+class Repository:
+    # 由 InventoryApp 建立並傳給 CheckoutApp、LogsFrame、ReceiveFrame；
+    # 每次取用只比對戳記（session.json 的大小/時間、儲存層的版本），未變動時不讀檔
+    def __init__(self, store=None):
+        self.store  = store or storage.get_backend()
+        self.items  = []   # 商品清單；重新載入時就地替換，持有者不需重新取得
+        self.by_id  = {}
+        self.stamps = {}
+        self._session = {}
+        self._reasons = []
+
+    # —— 商品
+    def inventory(self):
+        stamp = self.store.stamp('inventory')
+        if self.stamps.get('inventory') != stamp:
+            self.items[:] = self.store.load('inventory')
+            self.by_id.clear()
+            self.by_id.update(products.build_index(self.items))
+            self.stamps['inventory'] = stamp
+        return self.items
+
+    def products(self):
+        self.inventory()
+        return self.by_id
+
+    def product(self, pid):
+        return self.products().get(pid)
+
+    def _wrote(self, table):
+        # 自己寫入後更新戳記，不必重新載入
+        self.stamps[table] = self.store.stamp(table)
+
+    def add_products(self, items):
+        self.inventory()
+        items = self.store.insert_many('inventory', items)
+        self.adopt_products(items)
+        return items
+
+    def adopt_products(self, items):
+        # 已寫入儲存層的新商品（例如 Excel 匯入）併入快取
+        self.items.extend(items)
+        self.by_id.update(products.build_index(items))
+        self._wrote('inventory')
+
+    def save_products(self, items):
+        self.store.update_many('inventory', items)
+        for item in items:
+            if self.by_id.get(item['id']) is not item:
+                self.items[next(i for i, x in enumerate(self.items) if x['id'] == item['id'])] = item
+                self.by_id[item['id']] = item
+        self._wrote('inventory')
+
+    def remove_products(self, pids):
+        pids = set(pids)
+        self.store.delete('inventory', pids)
+        self.items[:] = [item for item in self.items if item['id'] not in pids]
+        for pid in pids:
+            self.by_id.pop(pid, None)
+        self._wrote('inventory')
+
+    # —— 開班資訊（session.json）
+    def session(self):
+        stamp = _file_stamp(storage.SESSION_FILE)
+        if self.stamps.get('session') != stamp:
+            try:
+                with open(storage.SESSION_FILE, 'r', encoding='utf-8') as f:
+                    self._session = json.load(f)
+            except (OSError, ValueError):
+                self._session = {}
+            self.stamps['session'] = stamp
+        return self._session
+
+    # —— 折抵原因
+    def reasons(self):
+        stamp = self.store.stamp('reasons')
+        if self.stamps.get('reasons') != stamp:
+            self._reasons = self.store.load('reasons')
+            self.stamps['reasons'] = stamp
+        return list(self._reasons)
+
+    def save_reasons(self, reasons):
+        self.store.save_all('reasons', reasons)
+        self._reasons = list(reasons)
+        self._wrote('reasons')
@@ -0,0 +1,79 @@
+# repricing.py｜良級懸賞 POS 系統 — 整批重新計算商品價格（可依廠商設定規則，套用前先預覽差異）
+import pricing
+
+# 選用：有 numpy 時以向量運算整批計算，否則逐筆計算（結果相同）
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RULES_META = 'price_rules'   # 儲存層 meta：{廠商: {markup, base_divisor, offset}}
+
+def load_rules(store):
+    raw = store.get_meta(RULES_META) or {}
+    return {vendor: pricing.PriceRule(**rule) for vendor, rule in raw.items()}
+
+def save_rules(store, rules):
+    store.set_meta(RULES_META, {vendor: rule.to_dict() for vendor, rule in rules.items()})
+
+def compute(costs, rule):
+    # costs：成本清單 → {欄位: [價格, ...]}；int() 與 astype 皆為向零取整
+    if np is not None:
+        cost = np.asarray(costs, dtype=np.float64)
+        p20 = (cost / rule.base_divisor).astype(np.int64)
+        cols = {'點數價': (cost * rule.markup).astype(np.int64), '20洞價格': p20}
+        for hole, div in pricing.HOLE_DIVISORS.items():
+            cols[f'{hole}洞價格'] = ((p20 + rule.offset) / div).astype(np.int64)
+        return {f: col.tolist() for f, col in cols.items()}
+    p20 = [int(c / rule.base_divisor) for c in costs]
+    cols = {'點數價': [int(c * rule.markup) for c in costs], '20洞價格': p20}
+    for hole, div in pricing.HOLE_DIVISORS.items():
+        cols[f'{hole}洞價格'] = [int((p + rule.offset) / div) for p in p20]
+    return cols
+
+def _selected(items, vendor=None, keyword=None):
+    keyword = (keyword or '').strip().lower()
+    for item in items:
+        if vendor and item.get('廠商', '') != vendor:
+            continue
+        if keyword and keyword not in str(item.get('關鍵字IP', '')).lower():
+            continue
+        yield item
+
+def preview(items, rules, vendor=None, keyword=None):
+    # 回傳 {'changes': [(item, {欄位: (舊, 新)})], 'errors': [(item, 訊息)], 'scanned': n}；不修改 items
+    groups, errors, scanned = {}, [], 0
+    for item in _selected(items, vendor, keyword):
+        scanned += 1
+        try:
+            cost = float(item.get('成本', ''))
+        except (TypeError, ValueError):
+            errors.append((item, f"成本格式錯誤：{item.get('成本', '')!r}"))
+            continue
+        bucket = groups.setdefault(item.get('廠商', ''), ([], []))
+        bucket[0].append(item)
+        bucket[1].append(cost)
+    changes = []
+    for vendor_name, (group, costs) in groups.items():
+        cols = compute(costs, pricing.rule_for(rules, vendor_name))
+        for i, item in enumerate(group):
+            diff = {}
+            for f in pricing.PRICE_FIELDS:
+                new = str(cols[f][i])
+                old = item.get(f, '')
+                if str(old) != new:
+                    diff[f] = (old, new)
+            if diff:
+                changes.append((item, diff))
+    return {'changes': changes, 'errors': errors, 'scanned': scanned}
+
+def apply(repo, changes):
+    # 將預覽結果寫回（透過共用快取，一次批次更新）
+    items = []
+    for item, diff in changes:
+        for f, (_, new) in diff.items():
+            item[f] = new
+        items.append(item)
+    if items:
+        repo.save_products(items)
+    return len(items)
@@ -0,0 +1,120 @@
+# search_index.py｜良級懸賞 POS 系統 — 商品搜尋倒排索引（英數字首 + 中日文 n-gram）
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache
+
+# 欄位權重：命中商品名稱排最前面
+FIELDS = {'商品名稱': 3, '關鍵字IP': 2, '編碼': 2, '廠商': 1, '備註': 1}
+
+_CJK  = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_WORD = re.compile(r'[0-9a-z]+')
+_BY_WEIGHT = sorted(FIELDS.items(), key=lambda kv: kv[1])
+_RANK = 1 << 40   # 排序鍵：分數優先，其次為加入順序
+
+def _grams(run):
+    # 中日文連續字串：單字與雙字 n-gram
+    return set(run) | {run[i:i+2] for i in range(len(run) - 1)}
+
+@lru_cache(maxsize=65536)
+def _tokenize(text):
+    # 廠商、IP 等欄位大量重複，快取斷詞結果
+    text = text.lower()
+    return frozenset(_WORD.findall(text)) | {g for run in _CJK.findall(text) for g in _grams(run)}
+
+def tokenize(text):
+    return _tokenize(str(text or ''))
+
+class SearchIndex:
+    def __init__(self, items=()):
+        self.postings = defaultdict(dict)   # token → {pid: 權重}
+        self.words    = []                  # 已排序的英數字 token，供字首查詢
+        self.docs     = {}                  # pid → (tokens, 小寫全文)
+        self.order    = {}                  # pid → 加入順序（同分時維持原清單順序）
+        self._seq     = 0
+        for item in items:
+            self.add(item, bulk=True)
+        self.words = sorted(tok for tok in self.postings if _WORD.fullmatch(tok))
+
+    def add(self, item, bulk=False):
+        pid = item['id']
+        if pid in self.docs:
+            self.remove(pid)
+        weights = {}
+        for field, w in _BY_WEIGHT:   # 權重由低到高，同一 token 留下最高權重
+            weights.update(dict.fromkeys(tokenize(item.get(field, '')), w))
+        for tok, w in weights.items():
+            if not bulk and not self.postings[tok] and _WORD.fullmatch(tok):
+                insort(self.words, tok)
+            self.postings[tok][pid] = w
+        text = ' '.join(str(item.get(f, '')) for f in FIELDS).lower()
+        self.docs[pid] = (set(weights), text)
+        if pid not in self.order:
+            self.order[pid] = self._seq
+            self._seq += 1
+
+    update = add
+
+    def remove(self, pid):
+        doc = self.docs.pop(pid, None)
+        if not doc:
+            return
+        for tok in doc[0]:
+            posting = self.postings.get(tok)
+            if posting is None:
+                continue
+            posting.pop(pid, None)
+            if not posting:
+                del self.postings[tok]
+                if _WORD.fullmatch(tok):
+                    i = bisect_left(self.words, tok)
+                    if i < len(self.words) and self.words[i] == tok:
+                        self.words.pop(i)
+
+    def _match_word(self, word):
+        # 字首比對：word 開頭的所有 token；完全相符多加 1 分
+        scores = {}
+        i = bisect_left(self.words, word)
+        while i < len(self.words) and self.words[i].startswith(word):
+            tok = self.words[i]
+            bonus = 1 if tok == word else 0
+            for pid, w in self.postings[tok].items():
+                scores[pid] = max(scores.get(pid, 0), w + bonus)
+            i += 1
+        return scores
+
+    def _match_cjk(self, run):
+        grams = [run] if len(run) == 1 else [run[i:i+2] for i in range(len(run) - 1)]
+        grams.sort(key=lambda g: len(self.postings.get(g, ())))
+        first = self.postings.get(grams[0])
+        if not first:
+            return {}
+        scores = dict(first)
+        for g in grams[1:]:
+            posting = self.postings.get(g, {})
+            scores = {pid: min(s, posting[pid]) for pid, s in scores.items() if pid in posting}
+            if not scores:
+                return {}
+        if len(run) > 2:
+            # 雙字 n-gram 交集可能誤中，最後以全文確認
+            scores = {pid: s for pid, s in scores.items() if run in self.docs[pid][1]}
+        return scores
+
+    def search(self, query, limit=None):
+        # 多個關鍵字以空白分隔，須全部命中（AND）；回傳依分數排序的 pid 清單
+        query = str(query or '').lower()
+        terms = _WORD.findall(query) + _CJK.findall(query)
+        if not terms:
+            return sorted(self.docs, key=self.order.get)[:limit]
+        total = None
+        for term in terms:
+            scores = self._match_cjk(term) if _CJK.fullmatch(term) else self._match_word(term)
+            if total is None:
+                total = scores
+            else:
+                total = {pid: s + scores[pid] for pid, s in total.items() if pid in scores}
+            if not total:
+                return []
+        order = self.order
+        ranked = sorted(total, key=lambda pid: order[pid] - total[pid] * _RANK)
+        return ranked[:limit]
@@ -0,0 +1,431 @@
+# segments.py｜良級懸賞 POS 系統 — 依月份分段的紀錄檔（manifest 記錄每段的日期與位移）
+import os
+import json
+import gzip
+import shutil
+import threading
+from journal import apply_events
+import recordio
+
+MANIFEST_VERSION = 2   # 2：分段檔第一行為 recordio 格式標頭
+NO_DATE = '0000-00'   # 沒有日期的紀錄放在這一段
+
+class _Runs:
+    # 累計 key（日期或會員）→ [[起始位移, 長度], ...]，同一 key 連續的列合併為一段
+    def __init__(self):
+        self.runs = {}
+
+    def add(self, key, offset, length):
+        runs = self.runs.setdefault(key, [])
+        if runs and runs[-1][0] + runs[-1][1] == offset:
+            runs[-1][1] += length
+        else:
+            runs.append([offset, length])
+
+class _MemberIndex:
+    # 會員 → 'YYYY-MM:位移.長度,位移.長度 …'（十六進位），只讀該會員的那幾列；
+    # 封存段無法依位移讀取，記為 'YYYY-MM:*'（整段讀出）。以字串存放以節省記憶體
+    # gens 記錄每個月份建立索引時該段的 gen，與 manifest 不同的月份重新建立
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.gens, self.members = data['gens'], data['members']
+        except (OSError, ValueError, KeyError):
+            self.gens, self.members = {}, {}
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'gens': self.gens, 'members': self.members},
+                      f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def drop(self, month):
+        prefix = month + ':'
+        for member, value in list(self.members.items()):
+            if prefix in value:
+                rest = ' '.join(p for p in value.split() if not p.startswith(prefix))
+                if rest:
+                    self.members[member] = rest
+                else:
+                    del self.members[member]
+        self.gens.pop(month, None)
+
+    def add(self, month, gen, runs):
+        # runs：{會員: [[位移, 長度], ...] 或 None（整段）}
+        for member, member_runs in runs.items():
+            piece = month + ':' + ('*' if member_runs is None else
+                                   ','.join(f'{o:x}.{n:x}' for o, n in member_runs))
+            value = self.members.get(member)
+            self.members[member] = f'{value} {piece}' if value else piece
+        self.gens[month] = gen
+
+    def shift(self, month, delta, gen):
+        # 分段檔前面插入 delta 位元組（格式標頭）時平移該月份的位移，不必重讀整段
+        prefix = month + ':'
+        for member, value in self.members.items():
+            if prefix not in value:
+                continue
+            pieces = value.split()
+            for i, piece in enumerate(pieces):
+                if piece.startswith(prefix) and not piece.endswith('*'):
+                    pieces[i] = prefix + ','.join(f'{int(o, 16) + delta:x}.{n}' for o, n in
+                                                  (r.split('.') for r in piece[len(prefix):].split(',')))
+            self.members[member] = ' '.join(pieces)
+        self.gens[month] = gen
+
+    def runs(self, member):
+        found = {}
+        for piece in self.members.get(member, '').split():
+            month, runs = piece.split(':')
+            found[month] = None if runs == '*' else [
+                [int(o, 16), int(n, 16)] for o, n in (r.split('.') for r in runs.split(','))]
+        return found
+
+def _read_lines(lines):
+    return list(recordio.iter_lines(lines))
+
+def _accumulate(sums, day, values):
+    if not day:
+        return
+    acc = sums.get(day)
+    if acc is None:
+        sums[day] = list(values)
+    else:
+        for i, v in enumerate(values):
+            acc[i] += v
+
+class SegmentStore:
+    # 目錄內每月一個 YYYY-MM.jsonl（封存後為 .jsonl.gz），manifest.json 記錄
+    # 各段筆數、首末日期與每天的位元組區段；查某日期區段只開對應月份、只讀那幾天
+    # member_of 有提供時另維護會員索引（members.json），查某位會員只讀他有紀錄的那幾天
+    # summarize(rec) 有提供時（回傳數字清單）manifest 另記每段每天的逐欄加總，合計不必讀紀錄
+    def __init__(self, directory, day_of, member_of=None, summarize=None):
+        self.dir  = directory
+        self.table = os.path.basename(directory)   # 目錄名即表名（寫入格式標頭）
+        self.day_of = day_of
+        self.member_of = member_of
+        self.summarize = summarize
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.lock = threading.RLock()
+        self._stale = []
+        self._members = None   # 第一次查會員時才載入
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def _load_manifest(self):
+        self._mstat = self._manifest_stat()
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'version': MANIFEST_VERSION, 'segments': {}}
+
+    def _manifest_stat(self):
+        try:
+            st = os.stat(self.manifest_path)
+            return (st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _refresh(self):
+        # 另一個行程（例如 storage.py archive）改過 manifest 時重新讀取
+        if self._manifest_stat() != self._mstat:
+            self.manifest = self._load_manifest()
+
+    def _save_manifest(self):
+        self.manifest['rev'] = self.manifest.get('rev', 0) + 1
+        self.manifest['version'] = MANIFEST_VERSION
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+        self._mstat = self._manifest_stat()
+        if self._members is not None:
+            self._members.save()
+        for name in self._stale:
+            if os.path.exists(os.path.join(self.dir, name)):
+                os.remove(os.path.join(self.dir, name))
+        self._stale = []
+
+    def month_of(self, rec):
+        return (self.day_of(rec) or '')[:7] or NO_DATE
+
+    def months(self, start=None, end=None):
+        segs = self.manifest['segments']
+        if not (start or end):
+            return sorted(segs)
+        return sorted(m for m in segs if m != NO_DATE
+                      and (not start or m >= start[:7]) and (not end or m <= end[:7]))
+
+    def _read_segment(self, month, start=None, end=None, runs=None, meta=None):
+        # runs：只讀這些位元組區段（會員查詢）；封存段沒有位移，整段讀出
+        # meta：鎖外讀取時傳入先前複製的 manifest 項目
+        meta = meta or self.manifest['segments'][month]
+        path = os.path.join(self.dir, meta['file'])
+        if meta.get('gz'):
+            with gzip.open(path, 'rb') as f:
+                return _read_lines(f)
+        with open(path, 'rb') as f:
+            if runs is None and not (start or end):
+                return _read_lines(f)
+            if runs is None:
+                runs = sorted(run for day, day_runs in meta['days'].items()
+                              if (not start or day >= start) and (not end or day <= end)
+                              for run in day_runs)
+            rows = []
+            for offset, length in runs:
+                f.seek(offset)
+                rows.extend(_read_lines(f.read(length).splitlines()))
+            return rows
+
+    def read(self, start=None, end=None):
+        # 封存段不含日期位移，整段讀出後由呼叫端依日期篩選。
+        # 分段檔只會整檔替換，鎖內只複製 manifest 項目，讀檔在鎖外（不擋住併入）；
+        # 內容改寫由呼叫端（JournaledTable.snapshot）偵測後重讀，讀檔時檔案已被換名/刪除則改在鎖內重讀該段
+        with self.lock:
+            self._refresh()
+            plan = [(month, dict(self.manifest['segments'][month])) for month in self.months(start, end)]
+        rows = []
+        for month, meta in plan:
+            try:
+                rows.extend(self._read_segment(month, start, end, meta=meta))
+            except OSError:
+                with self.lock:
+                    self._refresh()
+                    if month in self.manifest['segments']:
+                        rows.extend(self._read_segment(month, start, end))
+        return rows
+
+    def _write_segment(self, month, rows):
+        # 先寫好新檔再換掉舊檔；封存段被改寫時會還原為未壓縮
+        old = self.manifest['segments'].pop(month, None)
+        name = f'{month}.jsonl'
+        path = os.path.join(self.dir, name)
+        if old and (old['file'] != name or not rows):
+            self._stale.append(old['file'])   # manifest 存檔後才刪除
+        gen = self.manifest.get('rev', 0) + 1   # 即將存檔的 manifest 版本
+        if self.member_of:
+            self._member_index(reconcile=False).drop(month)
+        if not rows:
+            return
+        days, members, sums = _Runs(), _Runs(), {}
+        with open(path + '.tmp', 'wb') as f:
+            f.write(recordio.header_line(self.table))
+            for rec in rows:
+                line = (json.dumps(rec, ensure_ascii=False) + '\n').encode('utf-8')
+                days.add(self.day_of(rec), f.tell(), len(line))
+                if self.member_of and self.member_of(rec):
+                    members.add(self.member_of(rec), f.tell(), len(line))
+                if self.summarize:
+                    _accumulate(sums, self.day_of(rec), self.summarize(rec))
+                f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self.manifest['segments'][month] = {
+            'file': name, 'count': len(rows), 'gen': gen, 'format': recordio.VERSION,
+            'first': min(days.runs), 'last': max(days.runs), 'days': days.runs,
+        }
+        if self.summarize:
+            self.manifest['segments'][month]['totals'] = sums
+        if self.member_of:
+            self._members.add(month, gen, members.runs)
+
+    # —— 會員索引
+    def _scan_members(self, month):
+        meta = self.manifest['segments'][month]
+        path = os.path.join(self.dir, meta['file'])
+        if meta.get('gz'):
+            with gzip.open(path, 'rb') as f:
+                return {self.member_of(rec): None for rec in _read_lines(f) if self.member_of(rec)}
+        members, offset = _Runs(), 0
+        with open(path, 'rb') as f:
+            for line in f:
+                rec = _read_lines([line])
+                if rec and self.member_of(rec[0]):
+                    members.add(self.member_of(rec[0]), offset, len(line))
+                offset += len(line)
+        return members.runs
+
+    def _member_index(self, reconcile=True):
+        # 與 manifest 不一致的月份（舊版資料、其他行程寫過）讀該段重建
+        if self._members is None:
+            self._members = _MemberIndex(os.path.join(self.dir, 'members.json'))
+        index = self._members
+        if reconcile:
+            segs = self.manifest['segments']
+            changed = False
+            for month in set(index.gens) - set(segs):
+                index.drop(month)
+                changed = True
+            for month, meta in segs.items():
+                if month not in index.gens or index.gens[month] != meta.get('gen'):
+                    index.drop(month)
+                    index.add(month, meta.get('gen'), self._scan_members(month))
+                    changed = True
+            if changed:
+                index.save()
+        return index
+
+    def members(self):
+        with self.lock:
+            self._refresh()
+            return list(self._member_index().members)
+
+    def read_members(self, members, start=None, end=None):
+        # 只讀這些會員的紀錄（日期區段只篩到月份，由呼叫端再依日期篩選）
+        with self.lock:
+            self._refresh()
+            index = self._member_index()
+            by_month = {}
+            for member in members:
+                for month, runs in index.runs(member).items():
+                    if (start or end) and (month == NO_DATE or start and month < start[:7]
+                                           or end and month > end[:7]):
+                        continue
+                    if runs is None or by_month.get(month, []) is None:
+                        by_month[month] = None
+                    else:
+                        by_month.setdefault(month, []).extend(runs)
+            rows = []
+            for month, runs in sorted(by_month.items()):
+                if month in self.manifest['segments']:
+                    rows.extend(self._read_segment(month, runs=runs and sorted(runs)))
+            return rows
+
+    def _partition(self, rows):
+        parts = {}
+        for rec in rows:
+            parts.setdefault(self.month_of(rec), []).append(rec)
+        return parts
+
+    def write_all(self, rows):
+        with self.lock:
+            self._refresh()
+            parts = self._partition(rows)
+            for month in set(self.manifest['segments']) | set(parts):
+                self._write_segment(month, parts.get(month, []))
+            self._save_manifest()
+
+    def _month_of_id(self, rid):
+        # id 以時間開頭（YYYYMMDDhhmmss…），可直接推得月份
+        rid = str(rid or '')
+        return f'{rid[:4]}-{rid[4:6]}' if rid[:6].isdigit() else None
+
+    def read_ids(self, ids):
+        # 讀出這些 id 所在的月份（id 以時間開頭，可推得月份）；由呼叫端再依 id 篩選
+        with self.lock:
+            self._refresh()
+            months = {self._month_of_id(i) for i in ids} & set(self.manifest['segments'])
+            return [r for m in sorted(months) for r in self._read_segment(m)]
+
+    def _event_rows(self, events):
+        # 事件涉及的月份與這些月份的紀錄；找不到目標 id 時（例如日期被改到別的月份）才讀其他段
+        segs = self.manifest['segments']
+        months = set()
+        for ev in events:
+            if ev.get('rec'):
+                months.add(self.month_of(ev['rec']))
+            months.add(self._month_of_id(ev.get('id')))
+        months = {m for m in months if m in segs}
+        rows = [r for m in sorted(months) for r in self._read_segment(m)]
+        ids = {r['id'] for r in rows}
+        if any(ev.get('op') in ('update', 'delete') and ev.get('id') not in ids for ev in events):
+            others = sorted(set(segs) - months)
+            rows.extend(r for m in others for r in self._read_segment(m))
+            months |= set(others)
+        return months, rows
+
+    def fold(self, events):
+        # 只改寫事件涉及的月份
+        if not events:
+            return
+        with self.lock:
+            self._refresh()
+            months, rows = self._event_rows(events)
+            parts = self._partition(apply_events(rows, events))
+            for month in months | set(parts):
+                self._write_segment(month, parts.get(month, []))
+            self._save_manifest()
+
+    def day_totals(self, events=()):
+        # {日期: summarize 的逐欄加總}；manifest 記錄的合計直接取用，尚未併入的日誌事件（events）
+        # 只讀涉及的月份套用後重算。舊版沒有合計的月份讀該段補上並存檔（只發生一次）
+        sums = {}
+        with self.lock:
+            self._refresh()
+            segs = self.manifest['segments']
+            missing = [m for m, meta in segs.items() if 'totals' not in meta]
+            for month in missing:
+                totals = {}
+                for rec in self._read_segment(month):
+                    _accumulate(totals, self.day_of(rec), self.summarize(rec))
+                segs[month]['totals'] = totals
+            if missing:
+                self._save_manifest()
+            months, rows = self._event_rows(events) if events else (set(), [])
+            for month, meta in segs.items():
+                if month not in months:
+                    for day, values in meta['totals'].items():
+                        _accumulate(sums, day, values)
+        for rec in apply_events(rows, events):
+            _accumulate(sums, self.day_of(rec), self.summarize(rec))
+        return sums
+
+    def upgrade(self):
+        # 舊版分段（沒有格式標頭）逐月在檔頭補上標頭：整段以位元組複製，日期與會員索引的位移一併平移；
+        # 封存段照原樣保留（讀取時不需要標頭）
+        done = []
+        head = recordio.header_line(self.table)
+        with self.lock:
+            self._refresh()
+            gen = self.manifest.get('rev', 0) + 1
+            index = self._member_index(reconcile=False) if self.member_of else None
+            for month, meta in sorted(self.manifest['segments'].items()):
+                if meta.get('gz') or meta.get('format') == recordio.VERSION:
+                    continue
+                path = os.path.join(self.dir, meta['file'])
+                with open(path, 'rb') as src, open(path + '.tmp', 'wb') as out:
+                    out.write(head)
+                    shutil.copyfileobj(src, out)
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(path + '.tmp', path)
+                meta['days'] = {day: [[o + len(head), n] for o, n in runs] for day, runs in meta['days'].items()}
+                if index is not None and index.gens.get(month) == meta.get('gen'):
+                    index.shift(month, len(head), gen)
+                meta.update(gen=gen, format=recordio.VERSION)
+                done.append(month)
+            if done:
+                self._save_manifest()
+        return done
+
+    def archive(self, before):
+        # 將 before（YYYY-MM）之前的月份壓縮為 .jsonl.gz；回傳封存的月份
+        done = []
+        with self.lock:
+            self._refresh()
+            for month, meta in sorted(self.manifest['segments'].items()):
+                if month >= before or meta.get('gz'):
+                    continue
+                src = os.path.join(self.dir, meta['file'])
+                name = meta['file'] + '.gz'
+                with open(src, 'rb') as f, gzip.open(os.path.join(self.dir, name + '.tmp'), 'wb') as out:
+                    shutil.copyfileobj(f, out)
+                os.replace(os.path.join(self.dir, name + '.tmp'), os.path.join(self.dir, name))
+                meta.update(file=name, gz=True, gen=self.manifest.get('rev', 0) + 1)
+                meta.pop('days', None)   # 會員索引的位移也隨 gen 改變而重建
+                self._stale.append(os.path.basename(src))
+                self._save_manifest()
+                done.append(month)
+        return done
+
+    def stamp(self):
+        self._refresh()
+        return [self.manifest.get('rev', 0)]
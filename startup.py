@@ -0,0 +1,36 @@
+# startup.py｜良級懸賞 POS 系統 — 啟動計時（各階段距程式啟動的秒數，記錄到 logs/startup.jsonl）
+import os
+import sys
+import json
+import time
+from datetime import datetime
+
+T0 = time.perf_counter()   # 由 main.py 最先匯入，作為啟動時間起點
+_marks = {}
+
+def mark(name):
+    _marks[name] = round(time.perf_counter() - T0, 4)
+    return _marks[name]
+
+def mark_when_idle(widget, name, then=None):
+    # 視窗建好、事件迴圈第一次閒置時即為「可操作」
+    def done():
+        mark(name)
+        if then:
+            then()
+    widget.after_idle(done)
+
+def report():
+    # 每次開班附加一行；設定環境變數 POS_TIMING=1 時同時印出
+    import storage
+    entry = {'at': datetime.now().isoformat(timespec='seconds'),
+             'python': sys.version.split()[0],
+             'marks': dict(_marks)}
+    if 'shift_start' in _marks and 'inventory_ready' in _marks:
+        entry['shift_to_ready'] = round(_marks['inventory_ready'] - _marks['shift_start'], 4)
+    with open(os.path.join(storage.DATA_DIR, 'startup.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    if os.environ.get('POS_TIMING'):
+        for name, t in _marks.items():
+            print(f'{name:>20}: {t:.3f}s')
+    return entry
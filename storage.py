@@ -0,0 +1,589 @@
+# storage.py｜良級懸賞 POS 系統 — 資料儲存層（JSON 檔 / SQLite 可切換）
+import os
+import re
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from journal import JournaledTable, read_events, apply_events
+from segments import SegmentStore, NO_DATE
+from writer import WriteBehind
+from tail import TailReader, SeqReader, StampWatch
+import recordio
+import totals
+from profiling import timed, result_len, arg_len
+
+# 資料儲存路徑（可用 POS_HOME 指向另一份資料，例如壓測資料集）
+BASE_DIR       = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR       = os.environ.get('POS_HOME') or BASE_DIR
+SESSION_FILE   = os.path.join(ROOT_DIR, 'session.json')
+DATA_DIR       = os.path.join(ROOT_DIR, 'logs')
+INVENTORY_FILE = os.path.join(DATA_DIR, 'inventory.json')
+LOG_FILE       = os.path.join(DATA_DIR, 'logs.json')
+RECEIVE_FILE   = os.path.join(DATA_DIR, 'receive.json')
+REASON_FILE    = os.path.join(DATA_DIR, 'reasons.json')
+DB_FILE        = os.path.join(DATA_DIR, 'pos.db')
+META_FILE      = os.path.join(DATA_DIR, 'meta.json')
+SEGMENT_DIR    = os.path.join(DATA_DIR, 'segments')
+
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# inventory / logs / receive 為紀錄表（每筆有 id），reasons 為字串清單
+TABLES     = ('inventory', 'logs', 'receive', 'reasons')
+ROW_TABLES = ('inventory', 'logs', 'receive')
+
+def new_id(ts=None):
+    # 以時間開頭的 id，字典序即時間序；ts 可為 ISO 字串或 datetime
+    if isinstance(ts, datetime):
+        ts = ts.isoformat()
+    digits = re.sub(r'\D', '', ts or '')[:14] or datetime.now().strftime('%Y%m%d%H%M%S')
+    return digits.ljust(14, '0') + uuid.uuid4().hex[:8]
+
+def record_day(table, rec):
+    if table == 'receive':
+        return (rec.get('日期') or rec.get('time') or '')[:10]
+    if table == 'logs':
+        return (rec.get('time') or '')[:10]
+    return ''
+
+def record_product(table, rec):
+    if table == 'inventory':
+        return rec.get('編碼', '')
+    return str(rec.get('pid', rec.get('idx', '')))
+
+def _assign_ids(table, rows):
+    changed = False
+    for rec in rows:
+        if not rec.get('id'):
+            rec['id'] = new_id(rec.get('time') or rec.get('日期'))
+            changed = True
+    return changed
+
+_feeds = []   # [(tables, fn)]：異動寫入後呼叫 fn(table, events)，例如同步模組記錄待送出的異動
+
+def add_feed(fn, tables):
+    # 回傳取消訂閱的函式
+    entry = (tuple(tables), fn)
+    _feeds.append(entry)
+    return lambda: _feeds.remove(entry) if entry in _feeds else None
+
+def _emit(table, make_events):
+    # make_events()：有人訂閱這個表時才建立事件清單 [{op, id, rec}]
+    targets = [fn for tables, fn in _feeds if table in tables]
+    if targets:
+        events = make_events()
+        for fn in targets:
+            fn(table, events)
+
+def _match(table, rec, start=None, end=None, member=None):
+    # member 可為單一會員ID，或會員ID的集合（例如部分比對到的多位會員）
+    day = record_day(table, rec)
+    if start and day < start:
+        return False
+    if end and day > end:
+        return False
+    if member is not None:
+        value = rec.get('member', '')
+        if value != member if isinstance(member, str) else value not in member:
+            return False
+    return True
+
+class JsonBackend:
+    # inventory/reasons 為 JSON 陣列檔；logs/receive 依月份分段（segments/<table>/YYYY-MM.jsonl），
+    # 異動只附加到 segments/<table>/journal.jsonl，由 JournaledTable 於背景併回受影響的月份
+    name  = 'json'
+    FILES = {'inventory': INVENTORY_FILE, 'logs': LOG_FILE,
+             'receive': RECEIVE_FILE, 'reasons': REASON_FILE}
+    LINES = ('logs', 'receive')
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.segments = {
+            t: SegmentStore(os.path.join(SEGMENT_DIR, t), lambda rec, t=t: record_day(t, rec),
+                            lambda rec: rec.get('member'), totals.row if t == 'logs' else None)
+            for t in self.LINES
+        }
+        self.journals = {
+            t: JournaledTable(os.path.join(SEGMENT_DIR, t, 'journal.jsonl'),
+                              seg.read, seg.write_all, seg.fold, header=recordio.header(t, 'events'))
+            for t, seg in self.segments.items()
+        }
+        for t in self.LINES:
+            if not self.segments[t].exists():
+                self._split_legacy(t)
+            else:
+                self.segments[t].upgrade()
+        # inventory/reasons：異動先改記憶體中的資料列，由背景執行緒合併後整檔寫回
+        self.cache   = {}   # table → rows
+        self.pos     = {}   # table → {id: 位置}
+        self.version = {}   # table → 異動次數
+        self.written = {}   # table → 已寫入檔案的異動次數
+        self.stamps  = {}   # table → 上次讀寫後的檔案 [size, mtime]
+        self.loads   = {}   # table → 從檔案載入的次數
+        self.writer  = WriteBehind()
+
+    def _split_legacy(self, table):
+        # 舊版單一 logs.json/receive.json（及其 .journal）一次性拆成月份分段，原檔改名保留
+        legacy = self.FILES[table]
+        journal = os.path.splitext(legacy)[0] + '.journal'
+        rows = self._read(table)
+        _assign_ids(table, rows)
+        rows = apply_events(rows, read_events(journal + '.compacting') + read_events(journal))
+        self.segments[table].write_all(rows)
+        if os.path.exists(legacy):
+            os.replace(legacy, legacy + '.migrated')
+        for p in (journal, journal + '.compacting', os.path.splitext(legacy)[0] + '.days.json'):
+            if os.path.exists(p):
+                os.remove(p)
+
+    def get_meta(self, key):
+        try:
+            with open(META_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f).get(key)
+        except (OSError, ValueError):
+            return None
+
+    def set_meta(self, key, value):
+        with self.lock:
+            try:
+                with open(META_FILE, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+            meta[key] = value
+            with open(META_FILE + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            os.replace(META_FILE + '.tmp', META_FILE)
+
+    def _read(self, table):
+        # 串流讀取；相容陣列、JSONL 以及「陣列後面又被附加 JSONL」的混合檔
+        path = self.FILES[table]
+        if not os.path.exists(path):
+            return []
+        return list(recordio.iter_file(path))
+
+    @timed('storage.write:{1}', rows=arg_len(2))
+    def _write(self, table, rows):
+        path = self.FILES[table]
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @timed('storage.read:{1}', rows=result_len)
+    def _read_snapshot(self, table):
+        rows = self._read(table)
+        if table in ROW_TABLES and _assign_ids(table, rows):
+            self._write(table, rows)
+        return rows
+
+    def _file_stamp(self, table):
+        try:
+            st = os.stat(self.FILES[table])
+            return [st.st_size, st.st_mtime]
+        except OSError:
+            return None
+
+    def _rows(self, table):
+        # 沒有未寫出的異動、且檔案被其他程式改過時才重新讀檔
+        rows = self.cache.get(table)
+        clean = self.version.get(table, 0) == self.written.get(table, 0)
+        if rows is None or (clean and self._file_stamp(table) != self.stamps.get(table)):
+            rows = self.cache[table] = self._read_snapshot(table)
+            self.stamps[table] = self._file_stamp(table)
+            self.loads[table] = self.loads.get(table, 0) + 1
+            self._reindex(table)
+        return rows
+
+    def _reindex(self, table):
+        if table in ROW_TABLES:
+            self.pos[table] = {r.get('id'): i for i, r in enumerate(self.cache[table])}
+
+    def _changed(self, table):
+        self.version[table] = self.version.get(table, 0) + 1
+        self.writer.submit(table, lambda: self._write_behind(table))
+
+    def _write_behind(self, table):
+        # 背景執行緒：複製清單後在鎖外序列化；資料列只會被整筆替換，不會就地修改
+        with self.lock:
+            rows = list(self.cache[table])
+            version = self.version[table]
+        self._write(table, rows)
+        with self.lock:
+            self.written[table] = version
+            self.stamps[table] = self._file_stamp(table)
+
+    def flush(self):
+        self.writer.flush()
+
+    @timed('storage.load:{1}', rows=result_len)
+    def load(self, table):
+        if table in self.journals:
+            return self.journals[table].load()
+        with self.lock:
+            rows = self._rows(table)
+            return [dict(r) for r in rows] if table in ROW_TABLES else list(rows)
+
+    def insert(self, table, rec):
+        return self.insert_many(table, [rec])[0]
+
+    @timed('storage.insert:{1}', rows=arg_len(2))
+    def insert_many(self, table, recs):
+        with self.lock:
+            _assign_ids(table, recs)
+            if table in self.journals:
+                self.journals[table].append(
+                    [{'op': 'insert', 'id': r['id'], 'rec': dict(r)} for r in recs])
+            else:
+                rows = self._rows(table)
+                for r in recs:
+                    self.pos[table][r['id']] = len(rows)
+                    rows.append(dict(r))
+                self._changed(table)
+            _emit(table, lambda: [{'op': 'insert', 'id': r['id'], 'rec': dict(r)} for r in recs])
+            return recs
+
+    def update(self, table, rec):
+        self.update_many(table, [rec])
+
+    @timed('storage.update:{1}', rows=arg_len(2))
+    def update_many(self, table, recs):
+        with self.lock:
+            _emit(table, lambda: [{'op': 'update', 'id': r['id'], 'rec': dict(r)} for r in recs])
+            if table in self.journals:
+                self.journals[table].append(
+                    [{'op': 'update', 'id': r['id'], 'rec': dict(r)} for r in recs])
+                return
+            rows = self._rows(table)
+            for r in recs:
+                i = self.pos[table].get(r['id'])
+                if i is not None:
+                    rows[i] = dict(r)
+            self._changed(table)
+
+    @timed('storage.delete:{1}', rows=arg_len(2))
+    def delete(self, table, ids):
+        with self.lock:
+            _emit(table, lambda: [{'op': 'delete', 'id': i} for i in ids])
+            if table in self.journals:
+                self.journals[table].append([{'op': 'delete', 'id': i} for i in ids])
+                return
+            ids = set(ids)
+            self.cache[table] = [r for r in self._rows(table) if r.get('id') not in ids]
+            self._reindex(table)
+            self._changed(table)
+
+    @timed('storage.save_all:{1}', rows=arg_len(2))
+    def save_all(self, table, rows):
+        with self.lock:
+            if table in ROW_TABLES:
+                _assign_ids(table, rows)
+                # 整份覆寫視為逐筆新增（套用時為 upsert）；被拿掉的紀錄不會傳出
+                _emit(table, lambda: [{'op': 'insert', 'id': r['id'], 'rec': dict(r)} for r in rows])
+            if table in self.journals:
+                self.journals[table].replace([dict(r) for r in rows])
+                return
+            self.cache[table] = [dict(r) for r in rows] if table in ROW_TABLES else list(rows)
+            self._reindex(table)
+            self._changed(table)
+
+    @timed('storage.query:{1}', rows=result_len)
+    def query(self, table, start=None, end=None, member=None):
+        if table in self.journals and member is not None:
+            # 依會員索引只讀該會員有紀錄的日期
+            members = [member] if isinstance(member, str) else member
+            rows = self.journals[table].load(lambda: self.segments[table].read_members(members, start, end))
+        elif table in self.journals and (start or end):
+            # 只開啟日期區段涵蓋的月份分段；分段在鎖外讀取（日誌有自己的鎖），不擋住結帳寫入
+            rows = self.journals[table].load(lambda: self.segments[table].read(start, end))
+        else:
+            rows = self.load(table)
+        return [r for r in rows if _match(table, r, start, end, member)]
+
+    def watch(self, table):
+        # 追蹤其他視窗/行程的異動：交易/領取只讀日誌新附加的事件 {op, id, rec}
+        if table in self.journals:
+            journal = self.journals[table]
+            return TailReader(journal.path, (journal.pending, journal.previous))
+        return StampWatch(lambda: self.stamp(table))
+
+    def members(self, table):
+        # 出現過的會員ID（含尚未併入分段的日誌）
+        with self.lock:
+            found = set(self.segments[table].members())
+            found.update(r.get('member') for r in self.journals[table].load(lambda: []))
+        found.discard(None)
+        found.discard('')
+        return found
+
+    def months(self, table):
+        # 有紀錄的月份（YYYY-MM，舊到新）；交易/領取才有
+        with self.lock:
+            return [m for m in self.segments[table].months() if m != NO_DATE]
+
+    def day_totals(self, table):
+        # {日期: totals.row 的逐欄加總}：取 manifest 記錄的每日合計，只重算日誌尚未併入的月份
+        return self.journals[table].snapshot(self.segments[table].day_totals)
+
+    def stamp(self, table):
+        if table in self.journals:
+            return self.journals[table].stamp() + self.segments[table].stamp()
+        # 背景寫檔不改變戳記；只有異動或外部改檔（重新載入）才會變
+        with self.lock:
+            self._rows(table)
+            return [self.loads.get(table, 0), self.version.get(table, 0)]
+
+    def archive(self, table, before):
+        # 將 before（YYYY-MM）之前的月份分段壓縮封存；先併入日誌以免封存後又被改寫
+        self.journals[table].compact()
+        return self.segments[table].archive(before)
+
+CHANGE_TABLES = ('logs', 'receive')   # SQLite 另記異動序號，供分頁只讀新的異動
+CHANGES_KEEP  = 5000                  # 異動表保留最近這麼多筆，落後更多的讀取端整份重新查詢
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS reasons (pos INTEGER PRIMARY KEY, reason TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS changes (
+    seq   INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl   TEXT NOT NULL,
+    op    TEXT NOT NULL,
+    id    TEXT,
+    data  TEXT
+);
+''' + ''.join(f'''
+CREATE TABLE IF NOT EXISTS {t} (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    id      TEXT UNIQUE NOT NULL,
+    day     TEXT,
+    member  TEXT,
+    product TEXT,
+    data    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {t}_day ON {t}(day);
+CREATE INDEX IF NOT EXISTS {t}_member ON {t}(member);
+CREATE INDEX IF NOT EXISTS {t}_product ON {t}(product);
+''' for t in ROW_TABLES)
+
+class SqliteBackend:
+    # 單一 SQLite 檔（WAL 模式），逐列新增/修改，依日期、會員、商品建立索引
+    name = 'sqlite'
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        if self.get_meta('migrated') is None:
+            migrate_json(self)
+
+    def get_meta(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE key=?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                              (key, json.dumps(value, ensure_ascii=False)))
+
+    def _bump(self, table):
+        self.conn.execute("INSERT OR IGNORE INTO meta VALUES (?, '0')", ('rev:' + table,))
+        self.conn.execute('UPDATE meta SET value=value+1 WHERE key=?', ('rev:' + table,))
+
+    def _log_changes(self, table, events):
+        # 與資料同一個交易寫入異動表（同 JSON 日誌的 {op, id, rec}）；op 為 reset 表示整份覆寫
+        # rec 可能是 records.LogRecord 等（不是 dict），序列化前先轉成 dict
+        if table not in CHANGE_TABLES:
+            return
+        cur = self.conn.executemany(
+            'INSERT INTO changes (tbl, op, id, data) VALUES (?,?,?,?)',
+            [(table, ev['op'], ev.get('id'), json.dumps(dict(ev['rec']), ensure_ascii=False) if ev.get('rec') else None)
+             for ev in events])
+        last = self.conn.execute('SELECT max(seq) FROM changes').fetchone()[0] or 0
+        if last // 500 != (last - cur.rowcount) // 500:   # 約每 500 筆清除一次舊異動
+            self.conn.execute('DELETE FROM changes WHERE seq <= ?', (last - CHANGES_KEEP,))
+
+    def changes(self, table, after):
+        # 回傳 (仍保留的最小序號, [(序號, {op, id, rec})])
+        with self.lock:
+            oldest = self.conn.execute('SELECT min(seq) FROM changes').fetchone()[0]
+            rows = self.conn.execute('SELECT seq, op, id, data FROM changes WHERE seq > ? AND tbl = ? ORDER BY seq',
+                                     (after, table)).fetchall()
+        return oldest or 0, [(seq, {'op': op, 'id': rid, 'rec': json.loads(data) if data else None})
+                             for seq, op, rid, data in rows]
+
+    def last_change(self):
+        with self.lock:
+            return self.conn.execute('SELECT max(seq) FROM changes').fetchone()[0] or 0
+
+    def _row(self, table, rec):
+        return (rec['id'], record_day(table, rec), rec.get('member', ''),
+                record_product(table, rec), json.dumps(dict(rec), ensure_ascii=False))
+
+    @timed('storage.load:{1}', rows=result_len)
+    def load(self, table):
+        with self.lock:
+            if table == 'reasons':
+                return [r[0] for r in self.conn.execute('SELECT reason FROM reasons ORDER BY pos')]
+            return [json.loads(r[0]) for r in self.conn.execute(f'SELECT data FROM {table} ORDER BY seq')]
+
+    def insert(self, table, rec):
+        return self.insert_many(table, [rec])[0]
+
+    @timed('storage.insert:{1}', rows=arg_len(2))
+    def insert_many(self, table, recs):
+        with self.lock, self.conn:
+            _assign_ids(table, recs)
+            self.conn.executemany(
+                f'INSERT INTO {table} (id, day, member, product, data) VALUES (?,?,?,?,?)',
+                [self._row(table, r) for r in recs])
+            self._bump(table)
+            self._log_changes(table, [{'op': 'insert', 'id': r['id'], 'rec': r} for r in recs])
+            _emit(table, lambda: [{'op': 'insert', 'id': r['id'], 'rec': dict(r)} for r in recs])
+            return recs
+
+    def update(self, table, rec):
+        self.update_many(table, [rec])
+
+    @timed('storage.update:{1}', rows=arg_len(2))
+    def update_many(self, table, recs):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f'UPDATE {table} SET day=?, member=?, product=?, data=? WHERE id=?',
+                [self._row(table, r)[1:] + (r['id'],) for r in recs])
+            self._bump(table)
+            self._log_changes(table, [{'op': 'update', 'id': r['id'], 'rec': r} for r in recs])
+            _emit(table, lambda: [{'op': 'update', 'id': r['id'], 'rec': dict(r)} for r in recs])
+
+    @timed('storage.delete:{1}', rows=arg_len(2))
+    def delete(self, table, ids):
+        with self.lock, self.conn:
+            self.conn.executemany(f'DELETE FROM {table} WHERE id=?', [(i,) for i in ids])
+            self._bump(table)
+            self._log_changes(table, [{'op': 'delete', 'id': i} for i in ids])
+            _emit(table, lambda: [{'op': 'delete', 'id': i} for i in ids])
+
+    @timed('storage.save_all:{1}', rows=arg_len(2))
+    def save_all(self, table, rows):
+        with self.lock, self.conn:
+            self.conn.execute(f'DELETE FROM {table}')
+            if table == 'reasons':
+                self.conn.executemany('INSERT INTO reasons VALUES (?, ?)', list(enumerate(rows)))
+            else:
+                _assign_ids(table, rows)
+                self.conn.executemany(
+                    f'INSERT INTO {table} (id, day, member, product, data) VALUES (?,?,?,?,?)',
+                    [self._row(table, r) for r in rows])
+                _emit(table, lambda: [{'op': 'insert', 'id': r['id'], 'rec': dict(r)} for r in rows])
+            self._bump(table)
+            self._log_changes(table, [{'op': 'reset'}])
+
+    @timed('storage.query:{1}', rows=result_len)
+    def query(self, table, start=None, end=None, member=None):
+        sql, args = f'SELECT data FROM {table} WHERE 1=1', []
+        if start:
+            sql += ' AND day >= ?'; args.append(start)
+        if end:
+            sql += ' AND day <= ?'; args.append(end)
+        if isinstance(member, str):
+            sql += ' AND member = ?'; args.append(member)
+        elif member is not None:
+            sql += ' AND member IN (SELECT value FROM json_each(?))'; args.append(json.dumps(list(member)))
+        with self.lock:
+            return [json.loads(r[0]) for r in self.conn.execute(sql + ' ORDER BY seq', args)]
+
+    def watch(self, table):
+        # 交易/領取讀異動表中上次序號之後的異動（含本程式寫入的，套用結果相同）；其他表比對版本號
+        if table in CHANGE_TABLES:
+            return SeqReader(self.last_change, lambda after: self.changes(table, after))
+        return StampWatch(lambda: self.stamp(table))
+
+    def members(self, table):
+        with self.lock:
+            return {r[0] for r in self.conn.execute(f"SELECT DISTINCT member FROM {table} WHERE member != ''")
+                    if r[0]}
+
+    def months(self, table):
+        with self.lock:
+            return [r[0] for r in self.conn.execute(
+                f"SELECT DISTINCT substr(day, 1, 7) FROM {table} WHERE day != '' ORDER BY 1")]
+
+    def day_totals(self, table):
+        # 與 totals.row 相同的逐欄加總，由 SQLite 依 day 分組計算
+        sums = ''.join(f", coalesce(sum(CAST(json_extract(data, '$.{f}') AS INTEGER)), 0)" for f in totals.FIELDS)
+        with self.lock:
+            return {r[0]: list(r[1:]) for r in self.conn.execute(
+                f"SELECT day, count(*){sums} FROM {table} WHERE day != '' GROUP BY day")}
+
+    def stamp(self, table):
+        with self.lock:
+            return [self.get_meta('rev:' + table)]
+
+    def flush(self):
+        pass  # 每次異動即已提交
+
+def migrate_json(target, source=None):
+    # 一次性將 JSON/JSONL 檔內容搬入 target（通常為 SqliteBackend）
+    source = source or JsonBackend()
+    counts = {}
+    for table in TABLES:
+        rows = source.load(table)
+        target.save_all(table, rows)
+        counts[table] = len(rows)
+    target.set_meta('migrated', datetime.now().isoformat())
+    return counts
+
+def configured_engine():
+    # 優先順序：環境變數 POS_STORAGE → session.json 的 "storage" → 預設 json
+    engine = os.environ.get('POS_STORAGE')
+    if not engine:
+        try:
+            with open(SESSION_FILE, 'r', encoding='utf-8') as f:
+                engine = json.load(f).get('storage')
+        except (OSError, ValueError):
+            engine = None
+    return engine or 'json'
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = SqliteBackend() if configured_engine() == 'sqlite' else JsonBackend()
+    return _backend
+
+def flush():
+    # 關班/結束前確保背景寫入都已落地；仍寫不進去時丟出 writer.WriteError
+    if _backend is not None:
+        _backend.flush()
+
+def write_errors():
+    # 背景寫入失敗（每段連續失敗只回報一次）：[(表, 例外)]，由畫面定時取出提示；失敗的寫入會自動重試
+    writer = getattr(_backend, 'writer', None)
+    found = []
+    while writer is not None and not writer.errors.empty():
+        found.append(writer.errors.get_nowait())
+    return found
+
+if __name__ == '__main__':
+    # python storage.py migrate ：將現有 JSON 資料搬入 logs/pos.db
+    # python storage.py archive YYYY-MM ：將該月以前的交易/領取分段壓縮封存
+    import sys
+    if sys.argv[1:] == ['migrate']:
+        db = SqliteBackend()  # 新建資料庫時會自動搬移
+        for table in TABLES:
+            print(f'{table}: {len(db.load(table))} 筆')
+        print(f'已搬移至 {DB_FILE}；於 session.json 設定 "storage": "sqlite" 以啟用')
+    elif len(sys.argv) == 3 and sys.argv[1] == 'archive' and re.fullmatch(r'\d{4}-\d{2}', sys.argv[2]):
+        backend = JsonBackend()
+        for table in JsonBackend.LINES:
+            months = backend.archive(table, sys.argv[2])
+            print(f"{table}: 封存 {', '.join(months) or '（無）'}")
+    else:
+        print('用法：python storage.py migrate | archive YYYY-MM')
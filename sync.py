@@ -0,0 +1,311 @@
+# sync.py｜良級懸賞 POS 系統 — 多分店同步：經共用資料夾交換各收銀機的異動（只送上次同步之後的部分），依 id 合併成總部彙整資料
+# session.json 設定 "sync_dir"（或環境變數 POS_SYNC_DIR）後啟用。同步資料夾內每個來源（收銀機）一個子資料夾，
+# 每次送出一個 <序號>.jsonl.gz（recordio 標頭＋異動）；各端記住每個來源已合併到的序號（水位），只讀之後的檔
+import os
+import re
+import gzip
+import json
+import uuid
+import threading
+from datetime import datetime
+import storage
+import recordio
+from journal import JournaledTable
+from segments import SegmentStore
+from profiling import timed
+
+SYNC_TABLES  = ('logs', 'receive')
+SYNC_DIR     = os.path.join(storage.DATA_DIR, 'sync')
+OUTBOX_FILE  = os.path.join(SYNC_DIR, 'outbox.jsonl')
+CONSOLIDATED = os.path.join(SYNC_DIR, 'consolidated')
+CONFLICTS    = os.path.join(SYNC_DIR, 'conflicts.jsonl')
+AMOUNTS      = ('due', 'cash', 'transfer', 'points')
+
+_CHANGESET = re.compile(r'^(\d{8})\.jsonl\.gz$')
+
+def _now():
+    return datetime.now().isoformat(timespec='milliseconds')
+
+def _int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return 0
+
+def shared_dir(session=None):
+    # 同步資料夾；未設定時回傳 None（不啟用同步）
+    path = os.environ.get('POS_SYNC_DIR')
+    if not path:
+        if session is None:
+            try:
+                with open(storage.SESSION_FILE, 'r', encoding='utf-8') as f:
+                    session = json.load(f)
+            except (OSError, ValueError):
+                session = {}
+        path = session.get('sync_dir')
+    return path or None
+
+def source_id(store, session=None):
+    # 本機在同步資料夾內的名稱：開班分店＋隨機碼，第一次同步時產生並記在 meta
+    sid = store.get_meta('sync:source')
+    if not sid:
+        branch = (session or {}).get('selected_branch') or 'pos'
+        sid = re.sub(r'[\\/:*?"<>|\s]+', '_', branch) + '-' + uuid.uuid4().hex[:6]
+        store.set_meta('sync:source', sid)
+    return sid
+
+class Outbox:
+    # 本機待送出的異動（只附加，每行 {table, op, id, rec, at}）；送出時先改名為 .sending，
+    # 變更集寫好後才刪除，送出中斷時下次連同新的異動一起送
+    def __init__(self, path=OUTBOX_FILE):
+        self.path = path
+        self.sending = path + '.sending'
+        self.lock = threading.Lock()
+
+    def append(self, table, events):
+        at = _now()
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if f.tell() == 0:
+                    f.write(json.dumps(recordio.header('*', 'outbox'), ensure_ascii=False) + '\n')
+                for ev in events:
+                    f.write(json.dumps(dict(ev, table=table, at=at), ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def take(self):
+        with self.lock:
+            if not os.path.exists(self.sending) and os.path.exists(self.path):
+                os.replace(self.path, self.sending)
+        if not os.path.exists(self.sending):
+            return []
+        with open(self.sending, 'r', encoding='utf-8') as f:
+            return list(recordio.iter_lines(f))
+
+    def done(self):
+        if os.path.exists(self.sending):
+            os.remove(self.sending)
+
+_outbox = None
+
+def enable(session=None):
+    # 有設定同步資料夾時開始記錄本機 logs/receive 的異動；回傳 Outbox（未設定時為 None）
+    global _outbox
+    if _outbox is None and shared_dir(session):
+        _outbox = Outbox()
+        storage.add_feed(_outbox.append, SYNC_TABLES)
+    return _outbox
+
+def compact_events(events):
+    # 同一筆紀錄只送最後一次異動（套用時 insert/update 皆為 upsert）
+    last = {}
+    for ev in events:
+        key = (ev.get('table'), ev.get('id'))
+        last.pop(key, None)
+        last[key] = ev
+    return list(last.values())
+
+def write_change_set(path, source, seq, events):
+    tmp = path + '.tmp'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    head = dict(recordio.header('*', 'changes'), source=source, seq=seq, created=_now())
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps(head, ensure_ascii=False) + '\n')
+        for ev in events:
+            f.write(json.dumps(ev, ensure_ascii=False) + '\n')
+    os.replace(tmp, path)
+
+def read_change_set(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return list(recordio.iter_lines(f))
+
+def change_sets(shared, source, after=0):
+    # 該來源序號大於 after 的變更集 [(序號, 路徑)]；序號須連續，缺號時停在缺號之前（檔案可能還在複製）
+    try:
+        names = os.listdir(os.path.join(shared, source))
+    except OSError:
+        return []
+    found = sorted((int(m.group(1)), name) for name in names for m in [_CHANGESET.match(name)] if m)
+    result = []
+    for seq, name in found:
+        if seq <= after:
+            continue
+        if seq != after + len(result) + 1:
+            break
+        result.append((seq, os.path.join(shared, source, name)))
+    return result
+
+@timed('sync.push', rows=lambda result, *a, **kw: result['events'])
+def push(store, shared, session=None, outbox=None):
+    # 送出上次同步後的本機異動；第一次同步（沒有水位）送出目前全部紀錄
+    outbox = outbox or _outbox or Outbox()
+    source = source_id(store, session)
+    state = store.get_meta('sync:pushed')
+    events = outbox.take()
+    if state is None:
+        # 基準不是異動：at 用紀錄本身的時間並標記 baseline，合併時不會蓋過其他來源真正的修改
+        events = [{'table': t, 'op': 'insert', 'id': r['id'], 'rec': r, 'baseline': True,
+                   'at': (r.get('time') or r.get('日期') or '').replace(' ', 'T')}
+                  for t in SYNC_TABLES for r in store.load(t)]
+        state = {'seq': 0}
+    events = compact_events(events)
+    size = 0
+    if events:
+        seq = state['seq'] + 1
+        path = os.path.join(shared, source, f'{seq:08d}.jsonl.gz')
+        write_change_set(path, source, seq, events)
+        size = os.path.getsize(path)
+        state = {'seq': seq, 'at': _now(), 'events': len(events)}
+    store.set_meta('sync:pushed', state)
+    outbox.done()
+    return {'source': source, 'seq': state['seq'], 'events': len(events), 'bytes': size}
+
+def _content(rec):
+    return {k: v for k, v in rec.items() if k != '_origin'} if rec is not None else None
+
+def _priority(ev):
+    # 衝突時比較的順序：真正的異動一律優先於第一次同步的基準，同類再比異動時間
+    return (not ev.get('baseline'), ev.get('at', ''))
+
+class Consolidated:
+    # 總部彙整資料：各表為月份分段＋日誌（同 JsonBackend 的 logs/receive），每筆附 _origin {source, at}
+    def __init__(self, root=CONSOLIDATED):
+        self.segments = {
+            t: SegmentStore(os.path.join(root, t), lambda rec, t=t: storage.record_day(t, rec),
+                            lambda rec: rec.get('member'))
+            for t in SYNC_TABLES
+        }
+        self.journals = {
+            t: JournaledTable(os.path.join(root, t, 'journal.jsonl'), seg.read, seg.write_all, seg.fold,
+                              header=recordio.header(t, 'events'))
+            for t, seg in self.segments.items()
+        }
+        self.lock = threading.RLock()
+
+    def query(self, table, start=None, end=None):
+        with self.lock:
+            rows = self.journals[table].load(lambda: self.segments[table].read(start, end))
+        return [r for r in rows if (not start or storage.record_day(table, r) >= start)
+                and (not end or storage.record_day(table, r) <= end)]
+
+    def merge(self, source, events):
+        # 依 id 合併一個來源的異動，只讀這些 id 所在的月份。另一個來源改過且內容不同的紀錄為衝突：
+        # 保留 _priority 較高的版本（基準最低，其次異動時間較晚），兩個版本都記到 conflicts.jsonl。回傳衝突清單
+        conflicts = []
+        by_table = {}
+        for ev in events:
+            by_table.setdefault(ev.get('table'), []).append(ev)
+        for table, evs in by_table.items():
+            if table not in self.journals:
+                continue
+            ids = {ev['id'] for ev in evs}
+            with self.lock:
+                rows = self.journals[table].load(lambda: self.segments[table].read_ids(ids))
+                current = {r['id']: r for r in rows if r.get('id') in ids}
+                out = []
+                for ev in evs:
+                    rid, at = ev['id'], ev.get('at', '')
+                    incoming = ev.get('rec') if ev.get('op') != 'delete' else None
+                    old = current.get(rid)
+                    origin = (old or {}).get('_origin') or {}
+                    if old is not None and origin.get('source', source) != source and _content(old) != incoming:
+                        keep_new = _priority(ev) >= _priority(origin)
+                        conflicts.append({'at': _now(), 'table': table, 'id': rid,
+                                          'kept': source if keep_new else origin.get('source'),
+                                          'existing': old, 'incoming': dict(ev, source=source)})
+                        if not keep_new:
+                            continue
+                    if incoming is None:
+                        if old is not None:
+                            out.append({'op': 'delete', 'id': rid})
+                            current.pop(rid)
+                        continue
+                    rec = dict(incoming, _origin={'source': source, 'at': at})
+                    if ev.get('baseline'):
+                        rec['_origin']['baseline'] = True
+                    out.append({'op': 'update' if old is not None else 'insert', 'id': rid, 'rec': rec})
+                    current[rid] = rec
+                if out:
+                    self.journals[table].append(out)
+        if conflicts:
+            os.makedirs(os.path.dirname(CONFLICTS), exist_ok=True)
+            with open(CONFLICTS, 'a', encoding='utf-8') as f:
+                for c in conflicts:
+                    f.write(json.dumps(c, ensure_ascii=False) + '\n')
+        return conflicts
+
+_consolidated = None
+
+def get_consolidated():
+    # 同一行程共用一個彙整資料（各表的日誌/分段鎖在同一個實例上，背景同步與分店彙整視窗不會同時改寫）
+    global _consolidated
+    if _consolidated is None:
+        _consolidated = Consolidated()
+    return _consolidated
+
+@timed('sync.pull', rows=lambda result, *a, **kw: result['events'])
+def pull(store, shared, consolidated=None, job=None):
+    # 合併各來源序號大於水位的變更集；每合併一個檔就更新水位，中斷後從下一個檔繼續
+    consolidated = consolidated or get_consolidated()
+    seen = store.get_meta('sync:seen') or {}
+    try:
+        sources = sorted(d for d in os.listdir(shared) if os.path.isdir(os.path.join(shared, d)))
+    except OSError:
+        sources = []
+    pending = [(source, seq, path) for source in sources
+               for seq, path in change_sets(shared, source, seen.get(source, 0))]
+    result = {'files': 0, 'events': 0, 'conflicts': 0, 'sources': {}}
+    for i, (source, seq, path) in enumerate(pending):
+        if job is not None:
+            job.check()
+            job.progress(i, len(pending), f'合併 {source} #{seq}')
+        events = read_change_set(path)
+        conflicts = consolidated.merge(source, events)
+        seen[source] = seq
+        store.set_meta('sync:seen', seen)
+        result['files'] += 1
+        result['events'] += len(events)
+        result['conflicts'] += len(conflicts)
+        result['sources'][source] = seq
+    return result
+
+def sync_now(store, shared, session=None, job=None, consolidated=None):
+    # 先送出本機異動再合併所有來源（含本機剛送出的），回傳 {'push', 'pull'}
+    if job is not None:
+        job.progress(text='送出本機異動…')
+    pushed = push(store, shared, session)
+    return {'push': pushed, 'pull': pull(store, shared, consolidated, job)}
+
+def branch_totals(consolidated, start=None, end=None):
+    # 彙整資料依分店合計：{分店: {'count', 'due', 'cash', 'transfer', 'points'}}
+    totals = {}
+    for rec in consolidated.query('logs', start, end):
+        t = totals.setdefault(rec.get('branch') or '（未填）', dict.fromkeys(('count',) + AMOUNTS, 0))
+        t['count'] += 1
+        for f in AMOUNTS:
+            t[f] += _int(rec.get(f))
+    return totals
+
+if __name__ == '__main__':
+    # python sync.py [sync|push|pull] [同步資料夾]：同步（未指定資料夾時用 session.json 的 sync_dir）
+    # python sync.py report YYYY-MM-DD YYYY-MM-DD：彙整資料依分店合計
+    import sys
+    args = sys.argv[1:] or ['sync']
+    store = storage.get_backend()
+    if args[0] == 'report' and len(args) == 3:
+        for branch, t in sorted(branch_totals(get_consolidated(), args[1], args[2]).items()):
+            print(f"{branch}: {t['count']} 筆，應收 {t['due']}，現金 {t['cash']}，匯款 {t['transfer']}，點數 {t['points']}")
+    elif args[0] in ('sync', 'push', 'pull') and len(args) <= 2:
+        shared = args[1] if len(args) == 2 else shared_dir()
+        if not shared:
+            sys.exit('未設定同步資料夾：請在 session.json 設定 "sync_dir" 或指定資料夾')
+        if args[0] in ('sync', 'push'):
+            r = push(store, shared)
+            print(f"送出：{r['source']} #{r['seq']}，{r['events']} 筆異動，{r['bytes']} bytes")
+        if args[0] in ('sync', 'pull'):
+            r = pull(store, shared)
+            print(f"合併：{r['files']} 個檔，{r['events']} 筆異動，衝突 {r['conflicts']} 筆")
+        storage.flush()
+    else:
+        print('用法：python sync.py [sync|push|pull] [同步資料夾] | report YYYY-MM-DD YYYY-MM-DD')
@@ -0,0 +1,115 @@
+# table.py｜良級懸賞 POS 系統 — 分頁載入的 Treeview（只建立看得到的列）
+from tkinter import ttk
+
+PAGE_SIZE = 200
+
+class VirtualTree(ttk.Treeview):
+    # 資料列保存在 Python 端的 _rows，Treeview 只放已捲動到的前 _shown 列；
+    # 捲到接近底部時再補下一頁。其餘 Treeview 用法（selection/set/bind…）不變
+    def __init__(self, master, page_size=PAGE_SIZE, **kw):
+        self._yscroll = kw.pop('yscrollcommand', None)
+        super().__init__(master, yscrollcommand=self._on_yview, **kw)
+        self.page_size = page_size
+        self._rows  = []   # [(iid, values)]
+        self._pos   = {}   # iid → _rows 位置
+        self._shown = 0
+        self._pending = False
+
+    def configure(self, cnf=None, **kw):
+        if 'yscrollcommand' in kw:
+            self._yscroll = kw.pop('yscrollcommand')
+            if not kw and cnf is None:
+                return None
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def _on_yview(self, first, last):
+        if self._yscroll:
+            self._yscroll(first, last)
+        if float(last) >= 0.9 and self._shown < len(self._rows) and not self._pending:
+            self._pending = True
+            self.after_idle(self._load_more)
+
+    def _load_more(self, upto=None):
+        self._pending = False
+        end = min(len(self._rows), max(self._shown + self.page_size, upto or 0))
+        for iid, values in self._rows[self._shown:end]:
+            super().insert('', 'end', iid=iid, values=values)
+        self._shown = end
+
+    def _reindex(self, start=0):
+        for i in range(start, len(self._rows)):
+            self._pos[self._rows[i][0]] = i
+
+    def set_rows(self, rows):
+        # rows：可迭代的 (iid, values)；整份替換但只建立第一頁
+        super().delete(*super().get_children())
+        self._rows = list(rows)
+        self._pos = {}
+        self._reindex()
+        self._shown = 0
+        self._load_more()
+
+    def insert_row(self, iid, values, index='end'):
+        i = len(self._rows) if index == 'end' else index
+        self._rows.insert(i, (iid, values))
+        self._reindex(i)
+        if i < self._shown or self._shown == len(self._rows) - 1:
+            super().insert('', i, iid=iid, values=values)
+            self._shown += 1
+
+    def update_row(self, iid, values):
+        i = self._pos.get(iid)
+        if i is None:
+            return
+        self._rows[i] = (iid, values)
+        if i < self._shown:
+            super().item(iid, values=values)
+
+    def delete_rows(self, iids):
+        iids = set(iids)
+        shown = [iid for iid, _ in self._rows[:self._shown] if iid in iids]
+        if shown:
+            super().delete(*shown)
+        self._shown -= len(shown)
+        self._rows = [r for r in self._rows if r[0] not in iids]
+        self._pos = {}
+        self._reindex()
+
+    def row_values(self, iid):
+        i = self._pos.get(iid)
+        return self._rows[i][1] if i is not None else None
+
+    def row_count(self):
+        return len(self._rows)
+
+    def row_index(self, iid):
+        return self._pos.get(iid)
+
+    def row_ids(self, start, stop):
+        # 位置 start ~ stop-1 的 iid（拖曳選取時只取範圍變動的那幾列）
+        return [iid for iid, _ in self._rows[start:stop]]
+
+    def reveal(self, iid):
+        # 確保該列已建立並捲動到可見位置
+        i = self._pos.get(iid)
+        if i is None:
+            return
+        if i >= self._shown:
+            self._load_more(i + 1)
+        self.see(iid)
+
+    def set(self, item, column=None, value=None):
+        result = super().set(item, column, value)
+        if value is not None and item in self._pos:
+            self._rows[self._pos[item]] = (item, tuple(super().item(item, 'values')))
+        return result
+
+    def next(self, item):
+        # 鍵盤往下移到最後一列已建立的列時，先補下一頁
+        nxt = super().next(item)
+        if not nxt and self._shown < len(self._rows):
+            self._load_more()
+            nxt = super().next(item)
+        return nxt
@@ -0,0 +1,105 @@
+# tail.py｜良級懸賞 POS 系統 — 追蹤其他視窗/收銀機寫入的新紀錄（只讀新附加的行，不重讀整個檔）
+import os
+from recordio import iter_lines
+
+POLL_MS = 1000   # 畫面檢查新紀錄的間隔
+
+class TailReader:
+    # 記住檔案的 inode 與已讀位移，每次只解析之後附加的完整行；
+    # 日誌壓縮時原檔改名（rotated：壓縮中與上次壓縮完的檔名）：從改名後的檔讀完剩下的行，再從新日誌開頭接著讀。
+    # 檔案被換掉且找不到原檔（連續壓縮兩次或被整份覆寫）、刪除或截短時回報 reset，由呼叫端整份重新載入
+    def __init__(self, path, rotated=()):
+        self.path = path
+        self.rotated = rotated
+        self.sync()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_ino, st.st_size
+        except OSError:
+            return None, 0
+
+    def sync(self):
+        # 從目前檔尾開始追蹤（呼叫端剛整份載入過時使用）
+        self.inode, self.offset = self._stat()
+
+    def poll(self):
+        # 回傳 (reset, rows)；reset 為 True 時 rows 為空，追蹤位置已移到目前檔尾
+        inode, size = self._stat()
+        rows = []
+        if inode != self.inode and (self.inode is not None or self.offset):
+            rows = self._drain_rotated()
+            if rows is None:
+                self.sync()
+                return True, []
+            self.inode, self.offset = None, 0
+        if inode is None:
+            return False, rows
+        if self.inode is None:
+            self.inode = inode   # 檔案剛建立，從頭讀
+        if size < self.offset:
+            self.sync()
+            return True, []
+        if size == self.offset:
+            return False, rows
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        # 最後一行還沒寫完（沒有換行）時留到下次
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        return False, rows + list(iter_lines(data[:end].splitlines()))
+
+    def _drain_rotated(self):
+        # 原檔已改名時讀出剩下的完整行；找不到時回傳 None
+        if self.inode is None:
+            return None
+        for path in self.rotated:
+            try:
+                with open(path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_ino != self.inode:
+                        continue
+                    f.seek(self.offset)
+                    data = f.read()
+            except OSError:
+                continue
+            return list(iter_lines(data[:data.rfind(b'\n') + 1].splitlines()))
+        return None
+
+class SeqReader:
+    # SQLite：異動表以遞增序號記錄 {op, id, rec}，每次只取上次序號之後的列；
+    # 要讀的異動已被清除（落後太多）或遇到整份覆寫（op 為 reset）時回報 reset
+    def __init__(self, latest, fetch):
+        self.latest = latest   # () → 目前最大序號
+        self.fetch  = fetch    # (after) → (仍保留的最小序號, [(序號, 事件)])
+        self.sync()
+
+    def sync(self):
+        self.seq = self.latest()
+
+    def poll(self):
+        oldest, rows = self.fetch(self.seq)
+        if not rows:
+            return False, []
+        if oldest > self.seq + 1 or any(ev['op'] == 'reset' for _, ev in rows):
+            self.sync()
+            return True, []
+        self.seq = rows[-1][0]
+        return False, [ev for _, ev in rows]
+
+class StampWatch:
+    # 沒有可追蹤的附加檔時（SQLite），只比對戳記；變動即回報 reset
+    def __init__(self, stamp):
+        self.stamp = stamp
+        self.sync()
+
+    def sync(self):
+        self.last = self.stamp()
+
+    def poll(self):
+        current = self.stamp()
+        if current != self.last:
+            self.last = current
+            return True, []
+        return False, []
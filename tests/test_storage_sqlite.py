@@ -0,0 +1,42 @@
+# test_storage_sqlite.py｜良級懸賞 POS 系統 — SQLite 儲存層：以 records 物件修改紀錄
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+HOME = tempfile.mkdtemp()
+os.environ['POS_HOME'] = HOME
+os.makedirs(os.path.join(HOME, 'logs'), exist_ok=True)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import records
+import storage
+
+class SqliteUpdateRecordTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir=HOME)
+        self.store = storage.SqliteBackend(os.path.join(self.dir, 'pos.db'))
+        self.reader = self.store.watch('logs')
+        self.reader.sync()
+
+    def tearDown(self):
+        self.store.conn.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_update_with_record_object(self):
+        rec = self.store.insert('logs', {'time': '2025-06-01 10:00:00', 'member': 'M1', 'due': 100})
+        edited = records.make('logs', dict(rec, due=150))
+        self.store.update('logs', edited)
+        self.assertEqual(self.store.query('logs', '2025-06-01', '2025-06-01')[0]['due'], 150)
+        reset, changes = self.reader.poll()
+        self.assertFalse(reset)
+        self.assertEqual([(ev['op'], ev['rec']['due']) for ev in changes], [('insert', 100), ('update', 150)])
+
+    def test_update_receive_with_record_object(self):
+        rec = self.store.insert('receive', {'日期': '2025-06-01', 'member': 'M1', 'status': '待領取'})
+        self.store.update('receive', records.make('receive', dict(rec, status='已領取')))
+        self.assertEqual(self.store.query('receive', '2025-06-01', '2025-06-01')[0]['status'], '已領取')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# writer.py｜良級懸賞 POS 系統 — 背景寫檔（合併連續寫入，不佔用 Tk 主執行緒）
+import atexit
+import queue
+import threading
+import time
+import profiling
+
+DELAY     = 0.3   # 最後一次異動後等這麼久才寫檔，連續編輯只寫一次
+MAX_DELAY = 2.0   # 持續編輯時最久延後這麼久就先寫一次
+RETRY     = (1, 2, 5, 10, 30)   # 寫入失敗後依序等待這麼多秒重試，之後每 30 秒重試
+
+class WriteError(Exception):
+    # flush 後仍有寫不進去的工作；failures：{key: 例外}
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__('資料尚未寫入（' + '；'.join(f'{key}：{e}' for key, e in failures.items()) + '）')
+
+class WriteBehind:
+    # submit(key, fn)：同一 key 尚未執行的工作只保留最新一個；fn 在背景執行緒執行
+    # fn 失敗時保留在佇列中依 RETRY 延後重試（期間又有新工作則以新的為準）；
+    # 每段連續失敗的第一次放入 errors 佇列，由畫面以 after() 取出提示
+    def __init__(self, delay=DELAY, max_delay=MAX_DELAY):
+        self.delay     = delay
+        self.max_delay = max_delay
+        self.jobs      = {}   # key → [fn, 第一次提交時間, 最後提交時間, 可重試時間, 嘗試的 flush 輪次]
+        self.failed    = {}   # key → (例外, 連續失敗次數)
+        self.errors    = queue.Queue()
+        self.running   = 0
+        self.flushing  = 0
+        self.round     = 0    # 每次 flush 加一；flush 期間每個工作最多再試一次
+        self.cond      = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+        atexit.register(self._flush_at_exit)
+
+    def submit(self, key, fn):
+        now = time.monotonic()
+        with self.cond:
+            job = self.jobs.get(key)
+            if job:
+                job[0], job[2] = fn, now
+            else:
+                self.jobs[key] = [fn, now, now, 0, None]
+            self.cond.notify_all()
+
+    def _due(self, job):
+        if self.flushing:
+            return 0 if job[4] != self.round else None
+        return max(job[3], min(job[2] + self.delay, job[1] + self.max_delay))
+
+    def _next(self):
+        # 於鎖內等待到有工作到期（flush 時不等待，但同一輪已失敗的不再重試）
+        while True:
+            due = {k: self._due(job) for k, job in self.jobs.items()}
+            due = {k: t for k, t in due.items() if t is not None}
+            if not due:
+                self.cond.wait()
+                continue
+            key = min(due, key=due.get)
+            wait = due[key] - time.monotonic()
+            if wait <= 0:
+                return key, self.jobs.pop(key)
+            self.cond.wait(wait)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                key, job = self._next()
+                self.running += 1
+            try:
+                with profiling.span(f'writer:{key}'):
+                    job[0]()
+            except Exception as e:
+                with self.cond:
+                    self._failed(key, job, e)
+            else:
+                with self.cond:
+                    self.failed.pop(key, None)
+            finally:
+                with self.cond:
+                    self.running -= 1
+                    self.cond.notify_all()
+
+    def _failed(self, key, job, error):
+        # 放回佇列等待重試；期間已有新工作時保留新的（新工作寫的是較新的完整內容）
+        _, count = self.failed.get(key, (None, 0))
+        self.failed[key] = (error, count + 1)
+        if count == 0:
+            self.errors.put((key, error))
+        retry_at = time.monotonic() + RETRY[min(count, len(RETRY) - 1)]
+        newer = self.jobs.get(key)
+        if newer:
+            newer[3] = retry_at
+        else:
+            job[3], job[4] = retry_at, self.round if self.flushing else None
+            self.jobs[key] = job
+
+    def pending(self):
+        with self.cond:
+            return bool(self.jobs or self.running)
+
+    def flush(self, timeout=None):
+        # 立即寫出所有排隊中的工作並等待完成（關班、結束程式時呼叫）；
+        # 逾時回傳 False，仍有寫入失敗的工作時丟出 WriteError（工作留在佇列中繼續重試）
+        with self.cond:
+            self.flushing += 1
+            self.round += 1
+            current = self.round
+            self.cond.notify_all()
+            try:
+                done = self.cond.wait_for(
+                    lambda: not self.running and all((job[4] or 0) >= current for job in self.jobs.values()), timeout)
+                failures = {key: self.failed[key][0] for key in self.jobs if key in self.failed}
+            finally:
+                self.flushing -= 1
+                self.cond.notify_all()
+        if failures:
+            raise WriteError(failures)
+        return done
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except WriteError as e:
+            print(f'[writer] 結束時仍有資料未寫入：{e}')